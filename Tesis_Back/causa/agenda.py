@@ -0,0 +1,120 @@
+"""
+Agenda de vencimientos sobre la tabla desnormalizada `Vencimiento`.
+
+- `sincronizar_vencimientos`: mantiene las filas de uno o muchos eventos (upsert en lote).
+- `vencimientos` / `proximos_eventos`: consultas por rango sobre (usuario, fecha_vencimiento).
+- `exportar_ical` / `exportar_json`: export de la agenda.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from .models import Causa, EventoProcesal, Vencimiento
+
+
+def _filas(evento, usuario_id):
+    filas = [Vencimiento(usuario_id=usuario_id, causa_id=evento.causa_id, evento=evento,
+                         tipo=Vencimiento.FECHA, fecha_vencimiento=evento.fecha)]
+    if evento.plazo_limite:
+        filas.append(Vencimiento(usuario_id=usuario_id, causa_id=evento.causa_id, evento=evento,
+                                 tipo=Vencimiento.PLAZO, fecha_vencimiento=evento.plazo_limite))
+    return filas
+
+
+def sincronizar_vencimientos(eventos):
+    """
+    Upsert de las filas de agenda de `eventos` (ya guardados). Sirve tanto para el
+    signal de un evento como para los `bulk_create` de importaciones (que no disparan signals).
+    """
+    eventos = [e for e in eventos if e.pk]
+    if not eventos:
+        return
+    duenos = dict(
+        Causa.objects.filter(pk__in={e.causa_id for e in eventos}).values_list("id", "creado_por_id")
+    )
+    filas = [f for e in eventos for f in _filas(e, duenos[e.causa_id])]
+    Vencimiento.objects.bulk_create(
+        filas, batch_size=500,
+        update_conflicts=True,
+        unique_fields=["evento", "tipo"],
+        update_fields=["usuario", "causa", "fecha_vencimiento"],
+    )
+    sin_plazo = [e.pk for e in eventos if not e.plazo_limite]
+    if sin_plazo:
+        Vencimiento.objects.filter(evento_id__in=sin_plazo, tipo=Vencimiento.PLAZO).delete()
+
+
+def vencimientos(usuario, desde, hasta, causa_id=None, solo_con_plazo=False):
+    """Filas de agenda del usuario en [desde, hasta] (un range scan sobre el índice compuesto)."""
+    qs = Vencimiento.objects.filter(usuario=usuario, fecha_vencimiento__range=(desde, hasta))
+    if causa_id:
+        qs = qs.filter(causa_id=causa_id)
+    if solo_con_plazo:
+        qs = qs.filter(evento__plazo_limite__isnull=False)
+    return qs
+
+
+def proximos_eventos(usuario, desde, hasta, causa_id=None, solo_con_plazo=False):
+    """
+    Eventos cuya fecha o plazo_limite cae en [desde, hasta]: reemplaza el
+    `Q(fecha__range) | Q(plazo_limite__range)` sobre EventoProcesal.
+    """
+    ids = vencimientos(usuario, desde, hasta, causa_id, solo_con_plazo).values("evento_id")
+    return EventoProcesal.objects.filter(pk__in=ids).order_by("plazo_limite", "fecha", "id")
+
+
+def exportar_json(qs):
+    qs = qs.select_related("evento", "causa").order_by("fecha_vencimiento", "id")
+    return [
+        {
+            "fecha": v.fecha_vencimiento,
+            "tipo": v.tipo,
+            "evento_id": v.evento_id,
+            "titulo": v.evento.titulo,
+            "descripcion": v.evento.descripcion,
+            "causa_id": v.causa_id,
+            "numero_expediente": v.causa.numero_expediente,
+            "caratula": v.causa.caratula,
+        }
+        for v in qs
+    ]
+
+
+def _ical_texto(s):
+    return (s or "").replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def _ical_linea(linea):
+    """Las líneas de iCalendar no deben superar 75 octetos: se pliegan con CRLF + espacio."""
+    partes = []
+    while len(linea.encode("utf-8")) > 75:
+        corte = 74
+        while len(linea[:corte].encode("utf-8")) > 74:
+            corte -= 1
+        partes.append(linea[:corte])
+        linea = " " + linea[corte:]
+    partes.append(linea)
+    return "\r\n".join(partes)
+
+
+def exportar_ical(qs, nombre="Agenda judicial"):
+    """Calendario iCalendar (RFC 5545) con un evento de día completo por vencimiento."""
+    stamp = datetime.now(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    lineas = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//Tesis//Agenda judicial//ES",
+        "CALSCALE:GREGORIAN",
+        f"X-WR-CALNAME:{_ical_texto(nombre)}",
+    ]
+    for v in qs.select_related("evento", "causa").order_by("fecha_vencimiento", "id"):
+        prefijo = "Vence: " if v.tipo == Vencimiento.PLAZO else ""
+        lineas += [
+            "BEGIN:VEVENT",
+            f"UID:evento-{v.evento_id}-{v.tipo}@tesis",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART;VALUE=DATE:{v.fecha_vencimiento:%Y%m%d}",
+            f"SUMMARY:{_ical_texto(prefijo + v.evento.titulo)}",
+            f"DESCRIPTION:{_ical_texto(f'{v.causa.numero_expediente} - {v.causa.caratula}. {v.evento.descripcion}')}",
+            "END:VEVENT",
+        ]
+    lineas.append("END:VCALENDAR")
+    return "\r\n".join(_ical_linea(l) for l in lineas) + "\r\n"
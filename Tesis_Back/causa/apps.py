@@ -5,4 +5,6 @@ class CausaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'causa'
     def ready(self):
-        import causa.signals
\ No newline at end of file
+        import causa.signals
+        from tesis_api.cache import conectar_signals
+        conectar_signals()
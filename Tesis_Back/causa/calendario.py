@@ -0,0 +1,195 @@
+"""
+Calendario judicial: días hábiles por jurisdicción.
+
+Inhábiles: sábados, domingos, feriados nacionales (fijos, trasladables y
+los que dependen de Pascua) y las ferias judiciales de cada jurisdicción.
+
+Por jurisdicción se precalcula una vez (lru_cache) el array ordenado de días
+hábiles y, para cada día del rango, cuántos hábiles hay hasta él inclusive.
+Sumar N días hábiles es entonces un lookup O(1) en el array (vectorizado con
+NumPy para lotes), equivalente a `np.busday_offset` pero sin recorrer días.
+"""
+import unicodedata
+from datetime import date, timedelta
+from functools import lru_cache
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+ANIO_MIN, ANIO_MAX = 2000, 2050
+
+# Feriados inamovibles (MM-DD)
+FERIADOS_FIJOS = ["01-01", "03-24", "04-02", "05-01", "05-25", "06-20", "07-09", "12-08", "12-25"]
+# Trasladables (Ley 27.399): mar/mié -> lunes anterior; jue/vie -> lunes siguiente
+FERIADOS_TRASLADABLES = ["06-17", "08-17", "10-12", "11-20"]
+# Relativos a Pascua (días): lunes y martes de carnaval, jueves santo (asueto judicial), viernes santo
+FERIADOS_PASCUA = [-48, -47, -3, -2]
+
+# Ferias judiciales por jurisdicción (MM-DD inclusive). La de invierno la fija cada año
+# una acordada: se puede ajustar con settings.FERIAS_JUDICIALES.
+FERIAS_JUDICIALES = {
+    "nacional": [("01-01", "01-31"), ("07-14", "07-25")],
+    "caba": [("01-01", "01-31"), ("07-14", "07-25")],
+    "pba": [("01-01", "01-31"), ("07-21", "08-01")],
+}
+
+
+def _normalizar(texto):
+    t = unicodedata.normalize("NFKD", texto or "").encode("ascii", "ignore").decode().lower().strip()
+    return " ".join(t.split())
+
+
+def clave_jurisdiccion(jurisdiccion):
+    """Mapea el texto libre de `Causa.jurisdiccion` a una clave del calendario."""
+    j = _normalizar(jurisdiccion)
+    if not j:
+        return "nacional"
+    if j in FERIAS_JUDICIALES:
+        return j
+    if "caba" in j or "ciudad autonoma" in j or "ciudad de buenos aires" in j:
+        return "caba"
+    if "pba" in j or "provincia de buenos aires" in j or j == "buenos aires":
+        return "pba"
+    return "nacional"
+
+
+def _pascua(anio):
+    """Domingo de Pascua (algoritmo de Meeus/Jones/Butcher)."""
+    a, b, c = anio % 19, anio // 100, anio % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes = (h + l - 7 * m + 114) // 31
+    dia = ((h + l - 7 * m + 114) % 31) + 1
+    return date(anio, mes, dia)
+
+
+def _trasladar(d):
+    wd = d.weekday()  # 0 = lunes
+    if wd in (1, 2):
+        return d - timedelta(days=wd)
+    if wd in (3, 4):
+        return d + timedelta(days=7 - wd)
+    return d
+
+
+def feriados(anio, jurisdiccion="nacional"):
+    """Fechas inhábiles (además de fines de semana) del año para la jurisdicción."""
+    clave = clave_jurisdiccion(jurisdiccion)
+    dias = {date.fromisoformat(f"{anio}-{md}") for md in FERIADOS_FIJOS}
+    dias |= {_trasladar(date.fromisoformat(f"{anio}-{md}")) for md in FERIADOS_TRASLADABLES}
+    pascua = _pascua(anio)
+    dias |= {pascua + timedelta(days=n) for n in FERIADOS_PASCUA}
+
+    ferias = getattr(settings, "FERIAS_JUDICIALES", {}).get(clave) or FERIAS_JUDICIALES.get(clave, [])
+    for desde, hasta in ferias:
+        d, fin = date.fromisoformat(f"{anio}-{desde}"), date.fromisoformat(f"{anio}-{hasta}")
+        while d <= fin:
+            dias.add(d)
+            d += timedelta(days=1)
+
+    for extra in getattr(settings, "FERIADOS_EXTRA", []):  # ISO, p.ej. días no laborables puntuales
+        if extra.startswith(str(anio)):
+            dias.add(date.fromisoformat(extra))
+    return dias
+
+
+class CalendarioJudicial:
+    def __init__(self, jurisdiccion="nacional", anio_min=ANIO_MIN, anio_max=ANIO_MAX):
+        self.jurisdiccion = clave_jurisdiccion(jurisdiccion)
+        self.base = np.datetime64(f"{anio_min}-01-01", "D")
+        dias = np.arange(self.base, np.datetime64(f"{anio_max + 1}-01-01", "D"))
+        inhabiles = sorted(d for a in range(anio_min, anio_max + 1) for d in feriados(a, self.jurisdiccion))
+        self.habil = np.is_busday(dias, weekmask="1111100", holidays=np.array(inhabiles, dtype="datetime64[D]"))
+        self.habiles = dias[self.habil]                     # días hábiles ordenados
+        self.hasta = np.cumsum(self.habil)                  # hábiles hasta el día (inclusive)
+
+    def _indices(self, fechas):
+        idx = (np.asarray(fechas, dtype="datetime64[D]") - self.base).astype(np.int64)
+        if idx.size and (idx.min() < 0 or idx.max() >= len(self.habil)):
+            raise ValueError(f"Fecha fuera del calendario judicial ({ANIO_MIN}-{ANIO_MAX}).")
+        return idx
+
+    def sumar(self, fechas, n):
+        """
+        Vectorizado. n > 0: n-ésimo día hábil posterior a la fecha (el plazo empieza
+        a correr el día hábil siguiente). n < 0: n-ésimo hábil anterior. n == 0: la
+        misma fecha si es hábil, si no el próximo hábil.
+        """
+        idx = self._indices(fechas)
+        n = np.asarray(n, dtype=np.int64)
+        antes = self.hasta[idx] - self.habil[idx]           # hábiles estrictamente anteriores
+        pos = np.where(n > 0, self.hasta[idx] + n - 1, antes + n)
+        if pos.size and (pos.min() < 0 or pos.max() >= len(self.habiles)):
+            raise ValueError(f"Resultado fuera del calendario judicial ({ANIO_MIN}-{ANIO_MAX}).")
+        return self.habiles[pos]
+
+    def es_habil(self, fecha):
+        return bool(self.habil[self._indices([fecha])[0]])
+
+
+@lru_cache(maxsize=16)
+def calendario(jurisdiccion="nacional"):
+    return CalendarioJudicial(clave_jurisdiccion(jurisdiccion))
+
+
+def sumar_dias_habiles(fecha, n, jurisdiccion=""):
+    """Fecha (date) que resulta de sumar `n` días hábiles judiciales a `fecha`."""
+    return calendario(clave_jurisdiccion(jurisdiccion)).sumar([fecha], [n])[0].astype(date)
+
+
+def sumar_dias_habiles_lote(fechas, ns, jurisdiccion=""):
+    """Versión en lote: listas paralelas de fechas y cantidades -> lista de dates."""
+    if not len(fechas):
+        return []
+    return calendario(clave_jurisdiccion(jurisdiccion)).sumar(fechas, ns).astype(date).tolist()
+
+
+def es_dia_habil(fecha, jurisdiccion=""):
+    return calendario(clave_jurisdiccion(jurisdiccion)).es_habil(fecha)
+
+
+def recalcular_plazos(queryset=None, dry_run=False):
+    """
+    Recalcula `plazo_limite` de los eventos con plazo en días hábiles
+    (`plazo_desde` + `plazo_dias_habiles`), p.ej. después de cambiar el calendario.
+    Un cálculo vectorizado por jurisdicción y un bulk_update. Si la `fecha` del evento
+    era el propio vencimiento, se mueve junto con él. Devuelve la cantidad de eventos cambiados.
+    """
+    from .models import EventoProcesal
+    from .agenda import sincronizar_vencimientos
+
+    qs = queryset if queryset is not None else EventoProcesal.objects.all()
+    qs = qs.filter(plazo_desde__isnull=False, plazo_dias_habiles__isnull=False)
+
+    por_jurisdiccion = {}
+    for ev in qs.select_related("causa").only(
+        "id", "causa_id", "causa__jurisdiccion", "fecha", "plazo_limite", "plazo_desde", "plazo_dias_habiles"
+    ).iterator(chunk_size=2000):
+        por_jurisdiccion.setdefault(clave_jurisdiccion(ev.causa.jurisdiccion), []).append(ev)
+
+    cambiados = []
+    for clave, eventos in por_jurisdiccion.items():
+        nuevos = sumar_dias_habiles_lote(
+            [e.plazo_desde for e in eventos], [e.plazo_dias_habiles for e in eventos], clave
+        )
+        for ev, nuevo in zip(eventos, nuevos):
+            if ev.plazo_limite == nuevo:
+                continue
+            if ev.fecha == ev.plazo_limite:
+                ev.fecha = nuevo
+            ev.plazo_limite = max(nuevo, ev.fecha)
+            cambiados.append(ev)
+
+    if cambiados and not dry_run:
+        ahora = timezone.now()  # bulk_update no aplica auto_now
+        for ev in cambiados:
+            ev.actualizado_en = ahora
+        EventoProcesal.objects.bulk_update(cambiados, ["fecha", "plazo_limite", "actualizado_en"], batch_size=500)
+        sincronizar_vencimientos(cambiados)
+    return len(cambiados)
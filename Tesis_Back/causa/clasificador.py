@@ -0,0 +1,300 @@
+"""
+Servicio de clasificación de etapa procesal (vectorizer TF-IDF + clasificador).
+
+- Los modelos se cargan una vez por proceso, al arrancar (`CausaConfig.ready`);
+  con gunicorn `--preload` quedan en el master y los workers los comparten (copy-on-write).
+  Qué versión se carga lo decide el registro (`registro_modelos.py`).
+- Si existe la versión `.joblib` de un modelo se carga con `mmap_mode="r"`: los arrays
+  grandes de NumPy se mapean desde disco en vez de copiarse a memoria.
+- `classify_many(textos)`: un solo `transform` + un solo `predict_proba` por lote
+  (la etapa es el argmax de las probabilidades, no hace falta llamar a `predict`).
+- Resultados cacheados (LRU) por sha256 del texto normalizado.
+"""
+import hashlib
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+ML_MODELS_PATH = Path(__file__).parent / "ml_models"
+ARCHIVOS = {"vectorizer": "vectorizer", "clasificador": "clasificador"}
+
+ETAPA_DESCONOCIDA = "desconocido"
+
+
+def _normalizar(texto):
+    return (texto or "").lower()
+
+
+def clave_texto(texto):
+    return hashlib.sha256(_normalizar(texto).encode("utf-8")).hexdigest()
+
+
+def _cargar_artefacto(directorio, nombre, mmap=True):
+    """`<nombre>.joblib` (mmap) si existe; si no, el `.pkl` de siempre."""
+    ruta_joblib = directorio / f"{nombre}.joblib"
+    if ruta_joblib.exists():
+        import joblib
+
+        return joblib.load(ruta_joblib, mmap_mode="r" if mmap else None)
+    with open(directorio / f"{nombre}.pkl", "rb") as f:
+        return pickle.load(f)
+
+
+def exportar_joblib(directorio=ML_MODELS_PATH):
+    """Genera `<nombre>.joblib` junto a cada `.pkl` para poder cargarlos con mmap."""
+    import joblib
+
+    generados = []
+    for nombre in ARCHIVOS.values():
+        with open(directorio / f"{nombre}.pkl", "rb") as f:
+            modelo = pickle.load(f)
+        destino = directorio / f"{nombre}.joblib"
+        joblib.dump(modelo, destino)
+        generados.append(destino)
+    return generados
+
+
+class CacheLRU:
+    """LRU acotado y thread-safe: {sha256: resultado}."""
+
+    def __init__(self, maximo):
+        self.maximo = maximo
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def get(self, clave):
+        with self._lock:
+            valor = self._datos.get(clave)
+            if valor is None:
+                self.fallos += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return valor
+
+    def set(self, clave, valor):
+        if self.maximo <= 0:
+            return
+        with self._lock:
+            self._datos[clave] = valor
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+            self.aciertos = self.fallos = 0
+
+    def __len__(self):
+        return len(self._datos)
+
+
+class ClasificadorEtapas:
+    def __init__(self, directorio=ML_MODELS_PATH, cache_size=None, mmap=True):
+        self.directorio = Path(directorio)
+        self.version = None  # la asigna el registro (causa/registro_modelos.py)
+        self.mmap = mmap
+        self.vectorizer = None
+        self.clf = None
+        self.clases = None
+        self.segundos_carga = None
+        self.cache = CacheLRU(
+            cache_size if cache_size is not None else getattr(settings, "CLASIFICADOR_CACHE_SIZE", 4096)
+        )
+        self._lock = threading.Lock()
+
+    @property
+    def disponible(self):
+        return self.clf is not None
+
+    def cargar(self):
+        """Carga los modelos (idempotente). Devuelve False si no están en disco."""
+        if self.disponible:
+            return True
+        with self._lock:
+            if self.disponible:
+                return True
+            inicio = time.perf_counter()
+            try:
+                vectorizer = _cargar_artefacto(self.directorio, ARCHIVOS["vectorizer"], self.mmap)
+                clf = _cargar_artefacto(self.directorio, ARCHIVOS["clasificador"], self.mmap)
+            except FileNotFoundError:
+                logger.warning("Modelos ML no encontrados en %s", self.directorio)
+                return False
+            self.vectorizer, self.clases = vectorizer, np.asarray(clf.classes_)
+            self.clf = clf
+            self.segundos_carga = time.perf_counter() - inicio
+            logger.info("Modelos ML cargados en %.2fs (%s)", self.segundos_carga, self.directorio)
+            return True
+
+    @staticmethod
+    def sin_modelo(textos):
+        return [{"etapa": ETAPA_DESCONOCIDA, "confianza": 0.0} for _ in textos]
+
+    def classify_many(self, textos, usar_cache=True):
+        """
+        Clasifica un lote de textos. Devuelve una lista paralela de
+        {"etapa": str, "confianza": float}. Solo se vectorizan los textos que no están en cache
+        (y cada texto repetido dentro del lote, una sola vez).
+        """
+        if not self.cargar():
+            return self.sin_modelo(textos)
+
+        claves = [clave_texto(t) for t in textos]
+        resultados = [self.cache.get(c) if usar_cache else None for c in claves]
+
+        pendientes = {}  # clave -> texto, sin repetidos
+        for i, (c, r) in enumerate(zip(claves, resultados)):
+            if r is None:
+                pendientes.setdefault(c, textos[i])
+
+        if pendientes:
+            matriz = self.vectorizer.transform([_normalizar(t) for t in pendientes.values()])
+            proba = self.clf.predict_proba(matriz)
+            mejores = proba.argmax(axis=1)
+            nuevos = {
+                c: {"etapa": str(self.clases[j]), "confianza": float(proba[k, j])}
+                for k, (c, j) in enumerate(zip(pendientes, mejores))
+            }
+            for c, r in nuevos.items():
+                self.cache.set(c, r)
+            resultados = [r if r is not None else nuevos[c] for c, r in zip(claves, resultados)]
+
+        return [dict(r) for r in resultados]
+
+    def classify(self, texto, usar_cache=True):
+        return self.classify_many([texto], usar_cache=usar_cache)[0]
+
+
+def servicio():
+    """
+    Clasificador de la versión activa del registro (ver causa/registro_modelos.py):
+    misma interfaz (`cargar`, `classify`, `classify_many`), con recarga en caliente.
+    """
+    from .registro_modelos import registro
+
+    return registro()
+
+
+def precargar():
+    """
+    Se llama desde tesis_api/wsgi.py y asgi.py (settings.CLASIFICADOR_PRECARGAR): los
+    workers arrancan con los modelos en memoria.
+    `gc.freeze()` saca los objetos ya cargados del GC para que, después del fork,
+    las recolecciones no toquen sus páginas y se sigan compartiendo (copy-on-write).
+    """
+    import gc
+
+    try:
+        servicio().revisar(forzar=True)
+    except Exception:
+        logger.exception("No se pudieron precargar los modelos ML")
+    gc.freeze()
+
+
+# ---------- texto de documentos guardados ----------
+def texto_documento(doc, max_chars=50_000):
+    """Texto de un `Documento` (PDF, Word o texto plano) leído desde el storage."""
+    import io
+
+    nombre = (doc.archivo.name or "").lower()
+    mime = (doc.mime or "").lower()
+    with doc.archivo.open("rb") as f:
+        contenido = f.read()
+
+    if "pdf" in mime or nombre.endswith(".pdf"):
+        from pdfminer.high_level import extract_text
+
+        texto = extract_text(io.BytesIO(contenido))
+    elif "word" in mime or nombre.endswith(".docx"):
+        from docx import Document
+
+        texto = "\n".join(p.text for p in Document(io.BytesIO(contenido)).paragraphs)
+    elif "text" in mime or nombre.endswith(".txt"):
+        texto = contenido.decode("utf-8", errors="ignore")
+    else:
+        texto = ""
+    return (texto or "")[:max_chars]
+
+
+def reclasificar_documentos(queryset=None, tam_lote=64, hilos=8, dry_run=False, progreso=None):
+    """
+    Reclasifica documentos guardados en lotes: la extracción de texto (I/O contra el
+    storage) va en un pool de hilos, la clasificación es un `classify_many` por lote y
+    la escritura un `bulk_update`. Devuelve {documentos, actualizados, sin_texto, errores, segundos}.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from itertools import islice
+
+    from .models import Documento
+
+    qs = queryset if queryset is not None else Documento.objects.all()
+    qs = qs.only("id", "causa_id", "archivo", "mime", "titulo", "etapa_ml", "etapa_confianza").order_by("id")
+    clasificador = servicio()
+    reporte = {"documentos": 0, "actualizados": 0, "sin_texto": 0, "errores": 0}
+    causas_tocadas = set()
+    inicio = time.perf_counter()
+
+    def extraer(doc):
+        try:
+            return texto_documento(doc)
+        except Exception:
+            logger.exception("No se pudo leer el documento %s", doc.pk)
+            return None
+
+    docs = qs.iterator(chunk_size=tam_lote * 4)
+    with ThreadPoolExecutor(max_workers=max(1, hilos)) as pool:
+        while True:
+            lote = list(islice(docs, tam_lote))
+            if not lote:
+                break
+            reporte["documentos"] += len(lote)
+            textos = list(pool.map(extraer, lote))
+
+            con_texto = []
+            for doc, texto in zip(lote, textos):
+                if texto is None:
+                    reporte["errores"] += 1
+                elif not texto.strip():
+                    reporte["sin_texto"] += 1
+                else:
+                    con_texto.append((doc, texto))
+
+            resultados = clasificador.classify_many([t for _, t in con_texto])
+            cambiados = []
+            ahora = timezone.now()  # bulk_update no aplica auto_now
+            for (doc, _), r in zip(con_texto, resultados):
+                if doc.etapa_ml != r["etapa"] or doc.etapa_confianza != r["confianza"]:
+                    doc.etapa_ml, doc.etapa_confianza = r["etapa"], r["confianza"]
+                    doc.actualizado_en = ahora
+                    cambiados.append(doc)
+            if cambiados and not dry_run:
+                Documento.objects.bulk_update(cambiados, ["etapa_ml", "etapa_confianza", "actualizado_en"], batch_size=500)
+                causas_tocadas.update(d.causa_id for d in cambiados)
+            reporte["actualizados"] += len(cambiados)
+            if progreso:
+                progreso(reporte)
+
+    if causas_tocadas:
+        # bulk_update no dispara signals: se invalida a mano el cache de respuestas
+        from tesis_api.cache import GRUPO_CAUSAS, invalidar
+        from .models import Causa
+
+        duenios = Causa.objects.filter(pk__in=causas_tocadas).order_by().values_list("creado_por_id", flat=True).distinct()
+        for uid in duenios:
+            invalidar(GRUPO_CAUSAS, uid)
+
+    reporte["segundos"] = round(time.perf_counter() - inicio, 3)
+    return reporte
@@ -0,0 +1,157 @@
+"""
+Importación masiva de causas desde CSV o JSONL.
+
+- El archivo se lee en streaming (línea a línea) y se valida por lotes.
+- Cada lote se escribe en una sola transacción; cada fila usa un savepoint,
+  así un error de BD en una fila no descarta el resto del lote.
+- Grafo y trazabilidad se difieren a `causa.tasks.post_importacion_causas`
+  (una tarea por lote, encolada al commit). Ojo: con CELERY_TASK_ALWAYS_EAGER
+  (el default sin CELERY_BROKER_URL) la tarea corre en el mismo hilo, dentro del
+  on_commit: el request/comando espera igual ese trabajo. Para diferirlo de verdad
+  hace falta un broker y un worker.
+"""
+import csv
+import json
+import time
+from itertools import islice
+
+from django.db import transaction
+
+from .models import Causa
+from .serializers import CausaFullCreateSerializer
+from .tasks import post_importacion_causas
+from .utils import grafos_suspendidos
+
+TAM_LOTE = 200
+MAX_ERRORES_REPORTADOS = 1000
+
+# Columnas CSV que contienen un array JSON (mismo formato que POST /api/causas/full/)
+COLUMNAS_JSON = ("partes", "profesionales", "documentos", "eventos", "grafo")
+
+
+def inferir_formato(nombre, formato=None):
+    formato = (formato or "").lower().strip()
+    if formato in ("csv", "jsonl"):
+        return formato
+    nombre = (nombre or "").lower()
+    if nombre.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    if nombre.endswith(".csv"):
+        return "csv"
+    raise ValueError("Formato no soportado. Enviá un .csv o .jsonl (o `formato=csv|jsonl`).")
+
+
+def _lineas(archivo):
+    """Itera el archivo (UploadedFile o binario) línea a línea, sin cargarlo entero."""
+    for linea in archivo:
+        yield linea.decode("utf-8-sig") if isinstance(linea, bytes) else linea
+
+
+def leer_filas(archivo, formato):
+    """
+    Genera (nro_fila, dict | Exception). En CSV la fila 1 es el encabezado,
+    así que la primera fila de datos es la 2 (como la ve el usuario en una planilla).
+    """
+    if formato == "jsonl":
+        for nro, linea in enumerate(_lineas(archivo), start=1):
+            if not linea.strip():
+                continue
+            try:
+                yield nro, json.loads(linea)
+            except json.JSONDecodeError as e:
+                yield nro, e
+        return
+
+    reader = csv.DictReader(_lineas(archivo))
+    for nro, fila in enumerate(reader, start=2):
+        fila = {k.strip(): (v.strip() if isinstance(v, str) else v) for k, v in fila.items() if k}
+        try:
+            for col in COLUMNAS_JSON:
+                if fila.get(col):
+                    fila[col] = json.loads(fila[col])
+                else:
+                    fila.pop(col, None)
+            # Vacío en CSV = no informado
+            fila = {k: v for k, v in fila.items() if v not in ("", None)}
+            yield nro, fila
+        except json.JSONDecodeError as e:
+            yield nro, e
+
+
+def _claves_existentes(user, filas):
+    """Triple-clave (expediente, fuero, jurisdicción) ya cargada por el usuario: una query por lote."""
+    expedientes = {f.get("numero_expediente") for _, f in filas if f.get("numero_expediente")}
+    if not expedientes:
+        return set()
+    return set(
+        Causa.objects.filter(creado_por=user, numero_expediente__in=expedientes)
+        .values_list("numero_expediente", "fuero", "jurisdiccion")
+    )
+
+
+def importar_causas(archivo, formato, user, tam_lote=TAM_LOTE):
+    """
+    Importa todas las filas del archivo y devuelve el reporte:
+    {filas, creadas, duplicadas, con_error, errores: [{fila, errores}], segundos, causas_por_segundo}
+    """
+    inicio = time.perf_counter()
+    reporte = {"formato": formato, "filas": 0, "creadas": 0, "duplicadas": 0, "con_error": 0, "errores": []}
+
+    def error(nro, detalle):
+        reporte["con_error"] += 1
+        if len(reporte["errores"]) < MAX_ERRORES_REPORTADOS:
+            reporte["errores"].append({"fila": nro, "errores": detalle})
+
+    filas = leer_filas(archivo, formato)
+    while True:
+        lote = list(islice(filas, tam_lote))
+        if not lote:
+            break
+        reporte["filas"] += len(lote)
+
+        # 1) Validación del lote (sin escribir)
+        validas = []
+        for nro, fila in lote:
+            if isinstance(fila, Exception):
+                error(nro, {"detail": f"JSON inválido: {fila}"})
+                continue
+            if not isinstance(fila, dict):
+                error(nro, {"detail": "Cada fila debe ser un objeto."})
+                continue
+            fila.pop("idempotency_key", None)
+            ser = CausaFullCreateSerializer(data=fila, context={"user": user, "diferir_grafo": True})
+            if ser.is_valid():
+                validas.append((nro, ser))
+            else:
+                error(nro, ser.errors)
+
+        # 2) Escritura del lote en una transacción (savepoint por fila)
+        existentes = _claves_existentes(user, [(n, s.validated_data) for n, s in validas])
+        creadas = []
+        with grafos_suspendidos(), transaction.atomic():
+            for nro, ser in validas:
+                vd = ser.validated_data
+                clave = (vd.get("numero_expediente"), vd.get("fuero", ""), vd.get("jurisdiccion", ""))
+                if clave in existentes:
+                    reporte["duplicadas"] += 1
+                    continue
+                try:
+                    with transaction.atomic():
+                        causa = ser.save()
+                except Exception as e:
+                    error(nro, {"detail": str(e)})
+                    continue
+                existentes.add(clave)
+                creadas.append(causa.id)
+
+            if creadas:
+                transaction.on_commit(
+                    lambda ids=tuple(creadas): post_importacion_causas.delay(list(ids), user.id)
+                )
+        reporte["creadas"] += len(creadas)
+
+    reporte["segundos"] = round(time.perf_counter() - inicio, 3)
+    reporte["causas_por_segundo"] = (
+        round(reporte["creadas"] / reporte["segundos"], 2) if reporte["segundos"] else None
+    )
+    return reporte
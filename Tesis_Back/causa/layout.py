@@ -0,0 +1,178 @@
+"""
+Layout del grafo de la causa calculado en el servidor.
+
+- Eventos: layout por capas sobre la línea de tiempo (una columna por fecha).
+- Resto (partes, profesionales, documentos y nodos del front): Fruchterman-Reingold
+  vectorizado con NumPy, con los eventos como anclas fijas.
+
+Las posiciones quedan guardadas en `CausaGrafo.data` junto con `layout_hash`
+(hash de ids de nodos + aristas); mientras la estructura no cambie no se recalcula,
+y cuando cambia solo se ubican los nodos nuevos (los ya posicionados quedan fijos).
+"""
+import hashlib
+import json
+
+import numpy as np
+
+DX = 220          # separación horizontal entre columnas de la línea de tiempo
+DY = 90           # separación vertical dentro de una columna
+ITERACIONES = 60
+
+# Banda vertical preferida por tipo (negativo = arriba de la línea de tiempo)
+BANDAS = {
+    "parte": -320.0,
+    "profesional": -520.0,
+    "documento": 320.0,
+}
+BANDA_DEFAULT = 520.0
+
+
+def hash_estructura(data):
+    """Hash del conjunto de nodos y aristas (no de las posiciones ni labels)."""
+    nodos = sorted(str(n.get("id")) for n in data.get("nodes", []))
+    aristas = sorted(
+        f"{e.get('source', e.get('from'))}>{e.get('target', e.get('to'))}"
+        for e in data.get("edges", [])
+    )
+    raw = json.dumps([nodos, aristas], separators=(",", ":"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _layout_eventos(eventos):
+    """Capas por fecha: x = índice de la fecha, y = posición dentro de la misma fecha."""
+    pos = {}
+    eventos = sorted(eventos, key=lambda n: ((n.get("data") or {}).get("fecha") or "", len(str(n["id"])), str(n["id"])))
+    col, fila, fecha_prev = -1, 0, object()
+    for n in eventos:
+        fecha = (n.get("data") or {}).get("fecha")
+        if fecha != fecha_prev:
+            col, fila, fecha_prev = col + 1, 0, fecha
+        else:
+            fila += 1
+        # alterna arriba/abajo del eje para que los eventos del mismo día no se apilen de un lado
+        offset = ((fila + 1) // 2) * DY * (1 if fila % 2 else -1)
+        pos[n["id"]] = (col * DX, offset * 0.5)
+    return pos
+
+
+def _fruchterman_reingold(pos, fijos, aristas, banda, ancho, iteraciones=ITERACIONES):
+    """
+    pos: (N,2) posiciones iniciales; fijos: máscara (N,) de nodos que no se mueven;
+    aristas: (E,2) índices; banda: (N,) y preferida de cada nodo.
+    Solo se calculan fuerzas para los nodos libres (F×N en vez de N×N).
+    """
+    libres = np.flatnonzero(~fijos)
+    if len(libres) == 0:
+        return pos
+    pos = pos.astype(np.float32)
+    k = np.float32(DX * 0.75)      # distancia ideal entre nodos
+    t = DX * 2.0                   # "temperatura" inicial (desplazamiento máximo por iteración)
+    enfriamiento = t / (iteraciones + 1)
+    filas = np.arange(len(libres))
+
+    for _ in range(iteraciones):
+        dx = pos[libres, 0][:, None] - pos[None, :, 0]           # (F,N)
+        dy = pos[libres, 1][:, None] - pos[None, :, 1]
+        d2 = np.maximum(dx * dx + dy * dy, 1e-2)
+        d2[filas, libres] = np.inf                                # sin auto-repulsión
+        # Repulsión k²/d en la dirección (dx,dy)/d  ->  k² * (dx,dy) / d²
+        f = (k * k) / d2
+        disp = np.stack([(dx * f).sum(axis=1), (dy * f).sum(axis=1)], axis=1)
+        full = np.zeros_like(pos)
+        full[libres] = disp
+
+        # Atracción d²/k sobre las aristas
+        if len(aristas):
+            a, b = aristas[:, 0], aristas[:, 1]
+            d = pos[a] - pos[b]
+            l = np.maximum(np.linalg.norm(d, axis=1), 1e-2)
+            fa = d * (l / k)[:, None]
+            np.add.at(full, a, -fa)
+            np.add.at(full, b, fa)
+
+        # Gravedad hacia la banda del tipo (y) y hacia el ancho de la línea de tiempo (x)
+        full[:, 1] += (banda - pos[:, 1]) * 2.0
+        full[:, 0] += (np.clip(pos[:, 0], 0, ancho) - pos[:, 0]) * 2.0
+
+        largo = np.maximum(np.linalg.norm(full, axis=1), 1e-2)
+        paso = full / largo[:, None] * np.minimum(largo, t)[:, None]
+        paso[fijos] = 0.0
+        pos = pos + paso
+        t = max(t - enfriamiento, 1.0)
+    return pos.astype(np.float64)
+
+
+def calcular_posiciones(nodes, edges, seed=0, fijas=None):
+    """
+    Devuelve {node_id: {"x": float, "y": float}} para todos los nodos con id.
+    `fijas` ({node_id: {"x", "y"}}): posiciones ya guardadas; esos nodos no se mueven
+    y los demás se acomodan alrededor.
+    """
+    fijas = fijas or {}
+    nodes = [n for n in nodes if n.get("id") is not None]
+    if not nodes:
+        return {}
+    eventos = [n for n in nodes if n.get("type") == "evento"]
+    pos_eventos = _layout_eventos(eventos)
+    n_cols = max((x for x, _ in pos_eventos.values()), default=0) / DX + 1
+    ancho = max(n_cols * DX, 600.0)
+
+    ids = [n["id"] for n in nodes]
+    idx = {i: k for k, i in enumerate(ids)}
+    rng = np.random.default_rng(seed)
+
+    pos = np.zeros((len(nodes), 2), dtype=np.float64)
+    fijos = np.zeros(len(nodes), dtype=bool)
+    banda = np.empty(len(nodes), dtype=np.float64)
+    for k, n in enumerate(nodes):
+        if n["id"] in fijas:
+            pos[k] = (float(fijas[n["id"]].get("x") or 0), float(fijas[n["id"]].get("y") or 0))
+            fijos[k] = True
+            banda[k] = pos[k, 1]
+        elif n["id"] in pos_eventos:
+            pos[k] = pos_eventos[n["id"]]
+            fijos[k] = True
+            banda[k] = pos[k, 1]
+        else:
+            banda[k] = BANDAS.get(n.get("type"), BANDA_DEFAULT)
+            pos[k] = (rng.uniform(0, ancho), banda[k] + rng.uniform(-DY, DY))
+
+    aristas = np.array(
+        [(idx[s], idx[t]) for s, t in (
+            (e.get("source", e.get("from")), e.get("target", e.get("to"))) for e in edges
+        ) if s in idx and t in idx and s != t],
+        dtype=np.intp,
+    ).reshape(-1, 2)
+
+    pos = _fruchterman_reingold(pos, fijos, aristas, banda, ancho)
+    return {i: {"x": round(float(x), 1), "y": round(float(y), 1)} for i, (x, y) in zip(ids, pos)}
+
+
+def _posicion(n):
+    """La posición guardada del nodo, o None si no tiene (falta o quedó en 0,0)."""
+    p = n.get("position")
+    return p if isinstance(p, dict) and (p.get("x") or p.get("y")) else None
+
+
+def aplicar_layout(data, forzar=False):
+    """
+    Si cambió la estructura, calcula posiciones para los nodos que no tienen y sella
+    el hash. Las posiciones ya guardadas (las que movió el front o de un layout
+    anterior) se respetan como fijas; con `forzar` se recalculan todas.
+    Los nodos sin id se ignoran. Devuelve True si `data` cambió.
+    """
+    if not isinstance(data, dict) or "nodes" not in data:
+        return False
+    h = hash_estructura(data)
+    if not forzar and data.get("layout_hash") == h:
+        return False
+
+    nodes = [n for n in data.get("nodes") or [] if isinstance(n, dict) and n.get("id") is not None]
+    fijas = {} if forzar else {n["id"]: p for n in nodes if (p := _posicion(n))}
+    if len(fijas) < len(nodes):
+        posiciones = calcular_posiciones(nodes, data.get("edges") or [], fijas=fijas)
+        for n in nodes:
+            if n["id"] not in fijas:
+                n["position"] = posiciones[n["id"]]
+    data["layout_hash"] = h
+    return True
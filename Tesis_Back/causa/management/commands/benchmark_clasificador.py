@@ -0,0 +1,66 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from causa.clasificador import ClasificadorEtapas, ML_MODELS_PATH, exportar_joblib
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark del clasificador de etapas: docs/s clasificando de a uno (como antes), "
+        "en lote con classify_many y con la cache caliente. Textos sintéticos a partir del vocabulario."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--docs", type=int, default=2000)
+        parser.add_argument("--palabras", type=int, default=400, help="Palabras por documento sintético")
+        parser.add_argument("--tam-lote", type=int, default=256)
+        parser.add_argument("--exportar-joblib", action="store_true",
+                            help="Generar antes los .joblib (carga con mmap) junto a los .pkl")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def _medir(self, nombre, n, fn):
+        inicio = time.perf_counter()
+        fn()
+        seg = time.perf_counter() - inicio
+        self.stdout.write(f"{nombre:<28} {n / seg:>10.1f} docs/s  ({seg:.3f}s)")
+        return seg
+
+    def handle(self, *args, **opts):
+        if opts["exportar_joblib"]:
+            for ruta in exportar_joblib():
+                self.stdout.write(f"Generado {ruta.name}")
+
+        clf = ClasificadorEtapas(ML_MODELS_PATH, cache_size=opts["docs"] * 2)
+        if not clf.cargar():
+            raise CommandError("Modelos ML no disponibles en causa/ml_models/")
+        self.stdout.write(f"Carga de modelos: {clf.segundos_carga:.3f}s")
+
+        rng = random.Random(opts["seed"])
+        vocab = [t for t in clf.vectorizer.get_feature_names_out() if " " not in t]
+        textos = [" ".join(rng.choices(vocab, k=opts["palabras"])) for _ in range(opts["docs"])]
+        n, lote = len(textos), opts["tam_lote"]
+
+        def uno_a_uno():
+            # Lo que hacía la vista: transform + predict + predict_proba por documento
+            for t in textos:
+                m = clf.vectorizer.transform([t.lower()])
+                clf.clf.predict(m)
+                clf.clf.predict_proba(m)
+
+        def en_lote():
+            for i in range(0, n, lote):
+                clf.classify_many(textos[i:i + lote], usar_cache=False)
+
+        def con_cache():
+            for i in range(0, n, lote):
+                clf.classify_many(textos[i:i + lote])
+
+        base = self._medir("uno a uno (predict+proba)", n, uno_a_uno)
+        batch = self._medir(f"classify_many (lote {lote})", n, en_lote)
+        clf.classify_many(textos)  # calienta la cache
+        cache = self._medir("classify_many (cache)", n, con_cache)
+        self.stdout.write(self.style.SUCCESS(
+            f"Listo. lote x{base / batch:.1f}, cache x{base / cache:.1f} sobre uno a uno."
+        ))
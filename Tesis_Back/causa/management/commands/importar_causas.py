@@ -0,0 +1,35 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from causa.importacion import importar_causas, inferir_formato, TAM_LOTE
+
+
+class Command(BaseCommand):
+    help = "Importa causas desde un CSV/JSONL (mismo formato que POST /api/causas/importar/)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo")
+        parser.add_argument("--usuario", required=True, help="email del usuario dueño de las causas")
+        parser.add_argument("--formato", choices=["csv", "jsonl"])
+        parser.add_argument("--tam-lote", type=int, default=TAM_LOTE)
+
+    def handle(self, *args, **opts):
+        User = get_user_model()
+        user = User.objects.filter(**{User.USERNAME_FIELD: opts["usuario"]}).first()
+        if user is None:
+            raise CommandError(f"No existe el usuario {opts['usuario']}")
+        try:
+            formato = inferir_formato(opts["archivo"], opts["formato"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        with open(opts["archivo"], "rb") as fh:
+            reporte = importar_causas(fh, formato, user, tam_lote=opts["tam_lote"])
+
+        for err in reporte["errores"]:
+            self.stdout.write(self.style.ERROR(f"[ERR] fila {err['fila']}: {err['errores']}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Listo. filas={reporte['filas']} creadas={reporte['creadas']} "
+            f"duplicadas={reporte['duplicadas']} con_error={reporte['con_error']} "
+            f"({reporte['causas_por_segundo']} causas/s)"
+        ))
@@ -0,0 +1,31 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.urls import get_resolver
+
+from tesis_api import cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Aciertos (L1 local / L2 compartido), fallos y tasa de aciertos del cache de respuestas "
+        "por vista (ver tesis_api/cache.py). Los contadores viven en el cache compartido."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reiniciar", action="store_true", help="Poner los contadores en cero")
+        parser.add_argument("--json", action="store_true")
+
+    def handle(self, *args, **opts):
+        get_resolver().url_patterns  # importa las vistas: registra las que usan @cachear_respuesta
+        if opts["reiniciar"]:
+            cache.reiniciar_metricas()
+            self.stdout.write(self.style.SUCCESS("Contadores reiniciados."))
+            return
+        res = cache.metricas()
+        if opts["json"]:
+            self.stdout.write(json.dumps(res, ensure_ascii=False))
+            return
+        for vista, m in res.items():
+            tasa = "-" if m["tasa"] is None else f"{m['tasa']:.1%}"
+            self.stdout.write(f"{vista:45s} l1={m['l1']} l2={m['l2']} fallos={m['fallos']} tasa={tasa}")
@@ -0,0 +1,81 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from causa import registro_modelos as reg
+from causa.clasificador import ML_MODELS_PATH
+
+
+class Command(BaseCommand):
+    help = (
+        "Registro de modelos ML: listar | publicar <dir> | activar <version> | "
+        "shadow <version>|--quitar | verificar <version> | metricas"
+    )
+
+    def add_arguments(self, parser):
+        sub = parser.add_subparsers(dest="accion", required=True)
+        sub.add_parser("listar")
+
+        p = sub.add_parser("publicar", help="Registra una versión nueva con checksums (no la activa)")
+        p.add_argument("origen", nargs="?", default=str(ML_MODELS_PATH),
+                       help="Directorio con vectorizer/clasificador (.pkl o .joblib)")
+        p.add_argument("--version")
+        p.add_argument("--notas", default="")
+        p.add_argument("--activar", action="store_true")
+        p.add_argument("--shadow", action="store_true", help="Publicarla directamente en sombra")
+
+        p = sub.add_parser("activar", help="Swap atómico de CURRENT (los procesos la toman sin reiniciar)")
+        p.add_argument("version")
+
+        p = sub.add_parser("shadow", help="Evaluar una versión en sombra junto a la activa")
+        p.add_argument("version", nargs="?")
+        p.add_argument("--quitar", action="store_true")
+
+        p = sub.add_parser("verificar")
+        p.add_argument("version")
+
+        p = sub.add_parser("metricas", help="Latencia y confianza por versión (activa vs shadow)")
+        p.add_argument("--version")
+
+    def handle(self, *args, **opts):
+        try:
+            getattr(self, f"_{opts['accion']}")(opts)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+    def _listar(self, opts):
+        activa, shadow = reg.version_activa(), reg.version_shadow()
+        self.stdout.write(f"activa: {activa}   shadow: {shadow or '-'}")
+        for m in reg.listar_versiones():
+            marca = "*" if m["version"] == activa else ("s" if m["version"] == shadow else " ")
+            self.stdout.write(f" {marca} {m['version']:<20} {m.get('creado_en', '')}  {m.get('notas', '')}")
+
+    def _publicar(self, opts):
+        m = reg.publicar(opts["origen"], version=opts["version"], notas=opts["notas"])
+        self.stdout.write(self.style.SUCCESS(f"Publicada {m['version']}: {', '.join(m['archivos'])}"))
+        if opts["activar"]:
+            self._activar({"version": m["version"]})
+        elif opts["shadow"]:
+            self._shadow({"version": m["version"], "quitar": False})
+
+    def _activar(self, opts):
+        anterior = reg.activar(opts["version"])
+        self.stdout.write(self.style.SUCCESS(f"Activa: {opts['version']} (antes {anterior})"))
+
+    def _shadow(self, opts):
+        if opts["quitar"]:
+            reg.fijar_shadow(None)
+            self.stdout.write(self.style.SUCCESS("Sin versión en sombra."))
+            return
+        if not opts["version"]:
+            raise CommandError("Indicá una versión o --quitar")
+        reg.fijar_shadow(opts["version"])
+        self.stdout.write(self.style.SUCCESS(f"Shadow: {opts['version']}"))
+
+    def _verificar(self, opts):
+        reg.verificar(opts["version"])
+        self.stdout.write(self.style.SUCCESS(f"{opts['version']}: checksums OK"))
+
+    def _metricas(self, opts):
+        for fila in reg.resumen_metricas(version=opts["version"]):
+            self.stdout.write(json.dumps(fila, ensure_ascii=False))
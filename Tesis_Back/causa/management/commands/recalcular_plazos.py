@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from causa.calendario import recalcular_plazos
+from causa.models import EventoProcesal
+from tesis_api.cache import GRUPO_CAUSAS, invalidar
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula plazo_limite de los eventos con plazo en días hábiles (plazo_desde + plazo_dias_habiles) "
+        "con el calendario judicial vigente. Correr después de cambiar feriados o ferias."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--causa", type=int, action="append", help="Limitar a estas causas (repetible)")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **opts):
+        qs = EventoProcesal.objects.all()
+        if opts["causa"]:
+            qs = qs.filter(causa_id__in=opts["causa"])
+        n = recalcular_plazos(qs, dry_run=opts["dry_run"])
+        if not opts["dry_run"]:
+            # bulk_update no dispara signals: se invalida a mano el cache de respuestas
+            for uid in qs.order_by().values_list("causa__creado_por_id", flat=True).distinct():
+                invalidar(GRUPO_CAUSAS, uid)
+        sufijo = " (dry-run, sin guardar)" if opts["dry_run"] else ""
+        self.stdout.write(self.style.SUCCESS(f"Listo. {n} eventos con plazo recalculado{sufijo}."))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from causa.clasificador import reclasificar_documentos, servicio
+from causa.models import Documento
+
+
+class Command(BaseCommand):
+    help = "Reclasifica la etapa procesal (etapa_ml / etapa_confianza) de los documentos guardados, en lotes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--causa", type=int, action="append", help="Limitar a estas causas (repetible)")
+        parser.add_argument("--solo-pendientes", action="store_true", help="Solo documentos sin etapa_ml")
+        parser.add_argument("--tam-lote", type=int, default=64)
+        parser.add_argument("--hilos", type=int, default=8, help="Hilos para leer/extraer texto del storage")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **opts):
+        if not servicio().cargar():
+            raise CommandError("Modelos ML no disponibles en causa/ml_models/")
+
+        qs = Documento.objects.all()
+        if opts["causa"]:
+            qs = qs.filter(causa_id__in=opts["causa"])
+        if opts["solo_pendientes"]:
+            qs = qs.filter(etapa_ml="")
+
+        def progreso(r):
+            self.stdout.write(f"  {r['documentos']} documentos, {r['actualizados']} actualizados...")
+
+        r = reclasificar_documentos(
+            qs, tam_lote=opts["tam_lote"], hilos=opts["hilos"], dry_run=opts["dry_run"], progreso=progreso
+        )
+        sufijo = " (dry-run, sin guardar)" if opts["dry_run"] else ""
+        docs_s = round(r["documentos"] / r["segundos"], 2) if r["segundos"] else None
+        self.stdout.write(self.style.SUCCESS(
+            f"Listo. documentos={r['documentos']} actualizados={r['actualizados']} "
+            f"sin_texto={r['sin_texto']} errores={r['errores']} ({docs_s} docs/s){sufijo}"
+        ))
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.5 on 2026-10-19 07:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('causa', '0015_remove_causa_uniq_expediente_fuero_jurisdiccion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Vencimiento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('fecha', 'Fecha del evento'), ('plazo_limite', 'Plazo límite')], max_length=12)),
+                ('fecha_vencimiento', models.DateField()),
+                ('causa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vencimientos', to='causa.causa')),
+                ('evento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vencimientos', to='causa.eventoprocesal')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vencimientos', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['fecha_vencimiento', 'id'],
+                'indexes': [models.Index(fields=['usuario', 'fecha_vencimiento'], name='venc_usuario_fecha_idx')],
+                'constraints': [models.UniqueConstraint(fields=('evento', 'tipo'), name='uniq_vencimiento_evento_tipo')],
+            },
+        ),
+        # Backfill de la agenda con los eventos existentes
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO causa_vencimiento (usuario_id, causa_id, evento_id, tipo, fecha_vencimiento)
+                SELECT c.creado_por_id, e.causa_id, e.id, 'fecha', e.fecha
+                FROM causa_eventoprocesal e JOIN causa_causa c ON c.id = e.causa_id;
+
+                INSERT INTO causa_vencimiento (usuario_id, causa_id, evento_id, tipo, fecha_vencimiento)
+                SELECT c.creado_por_id, e.causa_id, e.id, 'plazo_limite', e.plazo_limite
+                FROM causa_eventoprocesal e JOIN causa_causa c ON c.id = e.causa_id
+                WHERE e.plazo_limite IS NOT NULL;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
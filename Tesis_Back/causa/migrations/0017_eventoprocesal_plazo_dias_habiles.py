@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 07:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('causa', '0016_vencimiento'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventoprocesal',
+            name='plazo_desde',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='eventoprocesal',
+            name='plazo_dias_habiles',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 07:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('causa', '0017_eventoprocesal_plazo_dias_habiles'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documento',
+            name='etapa_confianza',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='documento',
+            name='etapa_ml',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.5 on 2026-10-19 07:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('causa', '0018_documento_etapa_ml'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricaModeloML',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.CharField(max_length=60)),
+                ('rol', models.CharField(choices=[('activo', 'Activo'), ('shadow', 'Shadow')], max_length=10)),
+                ('pid', models.IntegerField()),
+                ('desde', models.DateTimeField()),
+                ('hasta', models.DateTimeField()),
+                ('predicciones', models.PositiveIntegerField()),
+                ('coincidencias', models.PositiveIntegerField(blank=True, null=True)),
+                ('latencia_media_ms', models.FloatField()),
+                ('latencia_hist', models.JSONField(default=list)),
+                ('confianza_hist', models.JSONField(default=list)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['version', 'rol', 'desde'], name='causa_metri_version_a0f8fd_idx')],
+            },
+        ),
+    ]
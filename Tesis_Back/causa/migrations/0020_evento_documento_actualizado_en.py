@@ -0,0 +1,24 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('causa', '0019_metricamodeloml'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documento',
+            name='actualizado_en',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='eventoprocesal',
+            name='actualizado_en',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
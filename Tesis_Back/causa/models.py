@@ -123,6 +123,10 @@ class Documento(models.Model):
     creado_en = models.DateTimeField(auto_now_add=True)
     mime = models.CharField(max_length=120, blank=True, default="")  # opcional, para guardar el tipo MIME
     size = models.IntegerField(null=True, blank=True) # ej: 1048576 (en bytes)
+    # Etapa procesal según el clasificador ML (ver causa/clasificador.py)
+    etapa_ml = models.CharField(max_length=40, blank=True, default="")
+    etapa_confianza = models.FloatField(null=True, blank=True)
+    actualizado_en = models.DateTimeField(auto_now=True)  # entra en el ETag de la causa (tesis_api/etag.py)
     class Meta:
         indexes = [models.Index(fields=["causa"]),
                    models.Index(fields=["creado_en"])]
@@ -145,7 +149,11 @@ class EventoProcesal(models.Model):
     descripcion = models.TextField(blank=True, default="")
     fecha = models.DateField()
     plazo_limite = models.DateField(null=True, blank=True)
+    # Plazo en días hábiles judiciales: plazo_limite = plazo_desde + N hábiles (ver causa.calendario)
+    plazo_desde = models.DateField(null=True, blank=True)
+    plazo_dias_habiles = models.PositiveSmallIntegerField(null=True, blank=True)
     creado_en = models.DateTimeField(auto_now_add=True)
+    actualizado_en = models.DateTimeField(auto_now=True)  # entra en el ETag de la causa (tesis_api/etag.py)
     class Meta:
         indexes = [
             models.Index(fields=["fecha"]),
@@ -161,6 +169,32 @@ class EventoProcesal(models.Model):
         ]
 
 
+class Vencimiento(models.Model):
+    """
+    Agenda desnormalizada: una fila por cada fecha relevante de un evento
+    (su `fecha` y, si tiene, su `plazo_limite`) con el dueño de la causa.
+    "Qué vence en los próximos N días en todas mis causas" es un único range
+    scan sobre (usuario, fecha_vencimiento). Se mantiene desde causa.signals.
+    """
+    FECHA, PLAZO = "fecha", "plazo_limite"
+    TIPOS = [(FECHA, "Fecha del evento"), (PLAZO, "Plazo límite")]
+
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="vencimientos")
+    causa = models.ForeignKey(Causa, on_delete=models.CASCADE, related_name="vencimientos")
+    evento = models.ForeignKey(EventoProcesal, on_delete=models.CASCADE, related_name="vencimientos")
+    tipo = models.CharField(max_length=12, choices=TIPOS)
+    fecha_vencimiento = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["evento", "tipo"], name="uniq_vencimiento_evento_tipo")
+        ]
+        indexes = [models.Index(fields=["usuario", "fecha_vencimiento"], name="venc_usuario_fecha_idx")]
+        ordering = ["fecha_vencimiento", "id"]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.fecha_vencimiento} (evento #{self.evento_id})"
+
 
 class DocumentoEvento(models.Model):
     documento = models.ForeignKey(Documento, on_delete=models.CASCADE, related_name="en_eventos")
@@ -179,4 +213,29 @@ class CausaGrafo(models.Model):
     actualizado_en = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"Grafo de causa #{self.causa_id}"
\ No newline at end of file
+        return f"Grafo de causa #{self.causa_id}"
+
+
+class MetricaModeloML(models.Model):
+    """
+    Métricas de predicción de una versión del clasificador, volcadas por cada proceso
+    cada tanto (ver causa/registro_modelos.py). Append-only: el resumen se agrega al leer.
+    """
+    ROLES = [("activo", "Activo"), ("shadow", "Shadow")]
+
+    version = models.CharField(max_length=60)
+    rol = models.CharField(max_length=10, choices=ROLES)
+    pid = models.IntegerField()
+    desde = models.DateTimeField()
+    hasta = models.DateTimeField()
+    predicciones = models.PositiveIntegerField()
+    coincidencias = models.PositiveIntegerField(null=True, blank=True)  # shadow: misma etapa que la activa
+    latencia_media_ms = models.FloatField()
+    latencia_hist = models.JSONField(default=list)
+    confianza_hist = models.JSONField(default=list)
+
+    class Meta:
+        indexes = [models.Index(fields=["version", "rol", "desde"])]
+
+    def __str__(self):
+        return f"{self.version} ({self.rol}) {self.predicciones} predicciones"
@@ -0,0 +1,438 @@
+"""
+Registro versionado de modelos ML (causa/ml_models).
+
+Estructura en disco:
+
+    ml_models/
+      versiones/<version>/vectorizer.pkl|.joblib, clasificador.pkl|.joblib, manifest.json
+      CURRENT   -> nombre de la versión activa
+      SHADOW    -> (opcional) versión que se evalúa en sombra
+
+- `publicar`: copia los artefactos a un directorio temporal, escribe el manifest
+  (sha256 de cada archivo) y lo renombra a `versiones/<version>` (atómico).
+- `activar` / `fijar_shadow`: verifican checksums y reemplazan el puntero con `os.replace`
+  (atómico): ningún proceso ve nunca un puntero a medio escribir.
+- Cada proceso carga la versión activa de forma perezosa y revisa el puntero como
+  mucho cada `ML_RECARGA_SEGUNDOS` (leer un archivo chico); si cambió, el hilo que lo
+  nota carga la nueva (los demás siguen con la anterior) y hace el swap de la referencia.
+  Sin reinicios.
+- Si no hay CURRENT se usan los `.pkl` sueltos de `ml_models/` (versión "legacy").
+- Latencia y confianza se registran por versión (histogramas) y se vuelcan a
+  `MetricaModeloML` desde un hilo aparte (fuera del request); la versión shadow clasifica los mismos textos en un hilo aparte
+  y se mide cuánto coincide con la activa.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from .clasificador import ARCHIVOS, ClasificadorEtapas, ML_MODELS_PATH
+
+logger = logging.getLogger(__name__)
+
+VERSION_LEGACY = "legacy"
+ACTIVO, SHADOW = "activo", "shadow"
+
+# Bordes de los histogramas (el último bucket es "mayor al último borde")
+BORDES_LATENCIA_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000]
+BORDES_CONFIANZA = [round(0.1 * i, 1) for i in range(1, 10)]
+
+
+def _raiz():
+    return Path(getattr(settings, "ML_MODELS_DIR", "") or ML_MODELS_PATH)
+
+
+def _dir_version(version):
+    return _raiz() if version == VERSION_LEGACY else _raiz() / "versiones" / version
+
+
+def _sha256(ruta):
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def _leer_puntero(nombre):
+    try:
+        return (_raiz() / nombre).read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _escribir_puntero(nombre, valor):
+    """Escribe a un temporal en el mismo directorio y `os.replace` (atómico en POSIX)."""
+    destino = _raiz() / nombre
+    if valor is None:
+        destino.unlink(missing_ok=True)
+        return
+    fd, tmp = tempfile.mkstemp(dir=_raiz(), prefix=f".{nombre}.")
+    with os.fdopen(fd, "w") as f:
+        f.write(valor + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, destino)
+
+
+# ---------- administración de versiones ----------
+def manifest(version):
+    if version == VERSION_LEGACY:
+        return {"version": VERSION_LEGACY, "archivos": {}}
+    with open(_dir_version(version) / "manifest.json") as f:
+        return json.load(f)
+
+
+def listar_versiones():
+    base = _raiz() / "versiones"
+    versiones = sorted(p.name for p in base.iterdir() if (p / "manifest.json").exists()) if base.exists() else []
+    return [manifest(v) for v in versiones]
+
+
+def verificar(version):
+    """Lanza ValueError si falta un artefacto o no coincide su sha256 con el manifest."""
+    if version == VERSION_LEGACY:
+        return True
+    directorio = _dir_version(version)
+    if not (directorio / "manifest.json").exists():
+        raise ValueError(f"No existe la versión {version}")
+    for nombre, esperado in manifest(version)["archivos"].items():
+        ruta = directorio / nombre
+        if not ruta.exists():
+            raise ValueError(f"{version}: falta {nombre}")
+        if _sha256(ruta) != esperado:
+            raise ValueError(f"{version}: checksum inválido en {nombre}")
+    return True
+
+
+def publicar(origen, version=None, notas=""):
+    """
+    Registra una versión nueva con los artefactos de `origen` (directorio con
+    vectorizer/clasificador en .pkl y/o .joblib). No la activa.
+    """
+    origen = Path(origen)
+    version = version or datetime.now(dt_timezone.utc).strftime("v%Y%m%d%H%M%S")
+    destino = _dir_version(version)
+    if destino.exists():
+        raise ValueError(f"La versión {version} ya existe")
+
+    archivos = [
+        origen / f"{nombre}{ext}"
+        for nombre in ARCHIVOS.values() for ext in (".pkl", ".joblib")
+        if (origen / f"{nombre}{ext}").exists()
+    ]
+    for nombre in ARCHIVOS.values():
+        if not any(a.stem == nombre for a in archivos):
+            raise ValueError(f"Falta {nombre}.pkl/.joblib en {origen}")
+
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(dir=destino.parent, prefix=f".{version}."))
+    try:
+        for a in archivos:
+            shutil.copy2(a, tmp / a.name)
+        datos = {
+            "version": version,
+            "creado_en": datetime.now(dt_timezone.utc).isoformat(),
+            "notas": notas,
+            "archivos": {a.name: _sha256(tmp / a.name) for a in archivos},
+        }
+        with open(tmp / "manifest.json", "w") as f:
+            json.dump(datos, f, indent=2)
+        os.rename(tmp, destino)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return datos
+
+
+def activar(version):
+    verificar(version)
+    anterior = version_activa()
+    _escribir_puntero("CURRENT", version)
+    if _leer_puntero("SHADOW") == version:
+        _escribir_puntero("SHADOW", None)
+    return anterior
+
+
+def fijar_shadow(version):
+    """`version=None` quita la versión en sombra."""
+    if version is not None:
+        verificar(version)
+    _escribir_puntero("SHADOW", version)
+
+
+def version_activa():
+    return _leer_puntero("CURRENT") or VERSION_LEGACY
+
+
+def version_shadow():
+    return _leer_puntero("SHADOW")
+
+
+# ---------- métricas por versión ----------
+class EstadisticasVersion:
+    """Histogramas de latencia (ms por documento) y confianza; thread-safe."""
+
+    def __init__(self, version, rol):
+        self.version, self.rol = version, rol
+        self._lock = threading.Lock()
+        self._reiniciar()
+
+    def _reiniciar(self):
+        self.desde = datetime.now(dt_timezone.utc)
+        self.n = 0
+        self.coincidencias = 0
+        self.latencia = np.zeros(len(BORDES_LATENCIA_MS) + 1, dtype=np.int64)
+        self.confianza = np.zeros(len(BORDES_CONFIANZA) + 1, dtype=np.int64)
+        self.suma_latencia_ms = 0.0
+
+    def registrar(self, resultados, segundos, referencia=None):
+        if not resultados:
+            return
+        ms = segundos * 1000 / len(resultados)
+        conf = np.fromiter((r["confianza"] for r in resultados), dtype=np.float64, count=len(resultados))
+        with self._lock:
+            self.n += len(resultados)
+            self.suma_latencia_ms += ms * len(resultados)
+            self.latencia[np.searchsorted(BORDES_LATENCIA_MS, ms, side="right")] += len(resultados)
+            np.add.at(self.confianza, np.searchsorted(BORDES_CONFIANZA, conf, side="right"), 1)
+            if referencia is not None:
+                self.coincidencias += sum(r["etapa"] == ref["etapa"] for r, ref in zip(resultados, referencia))
+
+    def volcar(self):
+        """Guarda lo acumulado en `MetricaModeloML` y reinicia (append-only, sin contención)."""
+        from .models import MetricaModeloML
+
+        with self._lock:
+            if not self.n:
+                return None
+            fila = MetricaModeloML(
+                version=self.version,
+                rol=self.rol,
+                pid=os.getpid(),
+                desde=self.desde,
+                hasta=datetime.now(dt_timezone.utc),
+                predicciones=self.n,
+                coincidencias=self.coincidencias if self.rol == SHADOW else None,
+                latencia_media_ms=self.suma_latencia_ms / self.n,
+                latencia_hist=self.latencia.tolist(),
+                confianza_hist=self.confianza.tolist(),
+            )
+            self._reiniciar()
+        fila.save()
+        return fila
+
+
+# ---------- registro por proceso ----------
+class Registro:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._activo = None          # ClasificadorEtapas con .version
+        self._shadow = None
+        self._revisado = 0.0
+        self._volcado = time.monotonic()
+        self._shadow_pool = None
+        self._metricas_pool = None
+        self._metricas_lock = threading.Lock()  # `stats` lo tocan los requests y el hilo shadow
+        self.stats = {}
+
+    def _intervalo(self):
+        return float(getattr(settings, "ML_RECARGA_SEGUNDOS", 10))
+
+    def _cargar(self, version):
+        verificar(version)
+        clf = ClasificadorEtapas(_dir_version(version))
+        if not clf.cargar():
+            raise ValueError(f"No se pudieron cargar los artefactos de {version}")
+        clf.version = version
+        return clf
+
+    def _stats(self, version, rol):
+        clave = (version, rol)
+        st = self.stats.get(clave)
+        if st is None:
+            with self._metricas_lock:
+                st = self.stats.setdefault(clave, EstadisticasVersion(version, rol))
+        return st
+
+    def revisar(self, forzar=False):
+        """Relee los punteros (como mucho cada ML_RECARGA_SEGUNDOS) y hace el swap si cambiaron."""
+        ahora = time.monotonic()
+        if not forzar and self._revisado and ahora - self._revisado < self._intervalo():
+            return
+        with self._lock:
+            if not forzar and self._revisado and ahora - self._revisado < self._intervalo():
+                return
+            self._revisado = ahora
+            activa, shadow = version_activa(), version_shadow()
+
+            if self._activo is None or self._activo.version != activa:
+                try:
+                    nuevo = self._cargar(activa)
+                except Exception:
+                    logger.exception("No se pudo cargar la versión %s; sigue %s", activa,
+                                     getattr(self._activo, "version", None))
+                else:
+                    if self._activo is not None:
+                        logger.info("Modelo ML: %s -> %s", self._activo.version, activa)
+                    self._activo = nuevo
+
+            if shadow is None or shadow == activa:
+                self._shadow = None
+            elif self._shadow is None or self._shadow.version != shadow:
+                try:
+                    self._shadow = self._cargar(shadow)
+                except Exception:
+                    logger.exception("No se pudo cargar la versión shadow %s", shadow)
+                    self._shadow = None
+
+    def activo(self):
+        self.revisar()
+        return self._activo
+
+    def cargar(self):
+        """Misma interfaz que `ClasificadorEtapas.cargar`: True si hay una versión activa cargada."""
+        return self.activo() is not None
+
+    def classify_many(self, textos):
+        clf = self.activo()
+        if clf is None:
+            return ClasificadorEtapas.sin_modelo(textos)
+        inicio = time.perf_counter()
+        resultados = clf.classify_many(textos)
+        self._stats(clf.version, ACTIVO).registrar(resultados, time.perf_counter() - inicio)
+
+        shadow = self._shadow
+        if shadow is not None and textos:
+            self._pool().submit(self._evaluar_shadow, shadow, list(textos), resultados)
+        self._volcar_si_corresponde()
+        return resultados
+
+    def classify(self, texto):
+        return self.classify_many([texto])[0]
+
+    def _pool(self):
+        if self._shadow_pool is None:
+            with self._metricas_lock:
+                if self._shadow_pool is None:
+                    self._shadow_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ml-shadow")
+        return self._shadow_pool
+
+    def _evaluar_shadow(self, shadow, textos, referencia):
+        try:
+            inicio = time.perf_counter()
+            resultados = shadow.classify_many(textos, usar_cache=False)
+            self._stats(shadow.version, SHADOW).registrar(resultados, time.perf_counter() - inicio, referencia)
+        except Exception:
+            logger.exception("Falló la evaluación shadow de %s", shadow.version)
+
+    def _volcar_si_corresponde(self):
+        """Cada ML_METRICAS_SEGUNDOS encarga el volcado a un hilo aparte: el request no escribe en la BD."""
+        intervalo = float(getattr(settings, "ML_METRICAS_SEGUNDOS", 300))
+        if time.monotonic() - self._volcado < intervalo:
+            return
+        with self._metricas_lock:
+            if time.monotonic() - self._volcado < intervalo:
+                return  # otro hilo ya lo encargó
+            self._volcado = time.monotonic()
+            if self._metricas_pool is None:
+                self._metricas_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ml-metricas")
+        self._metricas_pool.submit(self._volcar_en_segundo_plano)
+
+    def _volcar_en_segundo_plano(self):
+        from django.db import connection
+
+        try:
+            self.volcar_metricas()
+        finally:
+            connection.close()  # la conexión de este hilo no vuelve a usarse hasta el próximo volcado
+
+    def volcar_metricas(self):
+        with self._metricas_lock:
+            self._volcado = time.monotonic()
+            pendientes = list(self.stats.values())
+        filas = []
+        for st in pendientes:
+            try:
+                fila = st.volcar()
+            except Exception:
+                logger.exception("No se pudieron guardar las métricas de %s", st.version)
+                continue
+            if fila is not None:
+                filas.append(fila)
+        return filas
+
+
+_registro = None
+_registro_lock = threading.Lock()
+
+
+def registro():
+    """Registro único por proceso (se crea antes del fork si hay precarga)."""
+    global _registro
+    if _registro is None:
+        with _registro_lock:
+            if _registro is None:
+                _registro = Registro()
+    return _registro
+
+
+def resumen_metricas(version=None, rol=None):
+    """Agrega las filas de `MetricaModeloML` por (versión, rol) para comparar activa vs shadow."""
+    from .models import MetricaModeloML
+
+    qs = MetricaModeloML.objects.all()
+    if version:
+        qs = qs.filter(version=version)
+    if rol:
+        qs = qs.filter(rol=rol)
+    agregado = {}
+    for m in qs.order_by("desde"):
+        a = agregado.setdefault((m.version, m.rol), {
+            "version": m.version, "rol": m.rol, "predicciones": 0, "coincidencias": 0,
+            "suma_latencia_ms": 0.0,
+            "latencia_hist": np.zeros(len(BORDES_LATENCIA_MS) + 1, dtype=np.int64),
+            "confianza_hist": np.zeros(len(BORDES_CONFIANZA) + 1, dtype=np.int64),
+        })
+        a["predicciones"] += m.predicciones
+        a["coincidencias"] += m.coincidencias or 0
+        a["suma_latencia_ms"] += m.latencia_media_ms * m.predicciones
+        a["latencia_hist"] += np.asarray(m.latencia_hist, dtype=np.int64)
+        a["confianza_hist"] += np.asarray(m.confianza_hist, dtype=np.int64)
+
+    salida = []
+    for a in agregado.values():
+        n = a["predicciones"] or 1
+        salida.append({
+            "version": a["version"],
+            "rol": a["rol"],
+            "predicciones": a["predicciones"],
+            "latencia_media_ms": round(a["suma_latencia_ms"] / n, 3),
+            "latencia_p95_ms": _percentil(a["latencia_hist"], BORDES_LATENCIA_MS, 0.95),
+            "confianza_hist": dict(zip(_etiquetas(BORDES_CONFIANZA), a["confianza_hist"].tolist())),
+            "acuerdo_con_activo": round(a["coincidencias"] / n, 4) if a["rol"] == SHADOW else None,
+        })
+    return salida
+
+
+def _etiquetas(bordes):
+    return [f"<{bordes[0]}"] + [f"{a}-{b}" for a, b in zip(bordes, bordes[1:])] + [f">={bordes[-1]}"]
+
+
+def _percentil(hist, bordes, q):
+    """Cota superior del bucket donde cae el percentil q."""
+    total = hist.sum()
+    if not total:
+        return None
+    i = int(np.searchsorted(np.cumsum(hist), q * total))
+    return bordes[i] if i < len(bordes) else f">{bordes[-1]}"
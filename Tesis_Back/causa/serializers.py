@@ -94,9 +94,29 @@ class DocumentoSerializer(serializers.ModelSerializer):
 class EventoProcesalSerializer(serializers.ModelSerializer):
     class Meta:
         model = EventoProcesal
-        fields = ["id", "titulo", "descripcion", "fecha", "plazo_limite", "creado_en", "causa"]
+        fields = ["id", "titulo", "descripcion", "fecha", "plazo_limite", "plazo_desde", "plazo_dias_habiles",
+                  "creado_en", "causa"]
         read_only_fields = ["id", "creado_en"]
 
+    def validate(self, attrs):
+        # Si viene el plazo en días hábiles, plazo_limite se calcula con el calendario judicial
+        n = attrs.get("plazo_dias_habiles")
+        if n is not None:
+            from .calendario import sumar_dias_habiles
+            inst = self.instance
+            fecha = attrs.get("fecha") or (inst.fecha if inst else None)
+            desde = attrs.get("plazo_desde") or fecha
+            causa = attrs.get("causa") or (inst.causa if inst else None)
+            try:
+                plazo = sumar_dias_habiles(desde, n, causa.jurisdiccion if causa else "")
+            except ValueError as e:
+                raise serializers.ValidationError({"plazo_dias_habiles": str(e)})
+            if fecha and plazo < fecha:
+                raise serializers.ValidationError({"plazo_desde": "El plazo calculado es anterior a la fecha del evento."})
+            attrs["plazo_desde"] = desde
+            attrs["plazo_limite"] = plazo
+        return attrs
+
 class CausaParteSerializer(serializers.ModelSerializer):
     causa = serializers.PrimaryKeyRelatedField(queryset=Causa.objects.all(), required=True)
     parte = serializers.PrimaryKeyRelatedField(queryset=Parte.objects.all(), required=True)
@@ -118,6 +138,19 @@ class CausaProfesionalSerializer(serializers.ModelSerializer):
         model = CausaProfesional
         fields = ["id", "causa", "profesional", "rol_profesional"]
 
+def validar_grafo_data(value):
+    """{nodes: [...], edges: [...]}: cada nodo tiene que ser un objeto con `id` (lo usan el layout y los deltas)."""
+    if not isinstance(value, dict):
+        raise serializers.ValidationError("El grafo debe ser un objeto {nodes, edges}.")
+    nodes, edges = value.get("nodes", []), value.get("edges", [])
+    if not isinstance(nodes, list) or not isinstance(edges, list):
+        raise serializers.ValidationError("`nodes` y `edges` deben ser listas.")
+    sin_id = [i for i, n in enumerate(nodes) if not isinstance(n, dict) or n.get("id") in (None, "")]
+    if sin_id:
+        raise serializers.ValidationError(f"Nodos sin `id` (posiciones {sin_id[:10]}).")
+    return value
+
+
 class CausaGrafoSerializer(serializers.ModelSerializer):
     data = serializers.JSONField()  # <— ¡no read_only!
 
@@ -126,6 +159,9 @@ class CausaGrafoSerializer(serializers.ModelSerializer):
         fields = ["id", "causa", "data", "actualizado_en"]
         read_only_fields = ["id", "causa", "actualizado_en"]
 
+    def validate_data(self, value):
+        return validar_grafo_data(value)
+
     def update(self, instance, validated_data):
         # Sólo actualizamos el JSON del grafo
         if "data" in validated_data:
@@ -190,7 +226,7 @@ class CausaSerializer(serializers.ModelSerializer):
                 
             return {
                 'id': str(trazability.id),
-                'causa_id': trazability.causa.id,
+                'causa_id': trazability.causa_id,
                 'moves': moves_serializer.data
             }
         except Trazability.DoesNotExist:
@@ -412,10 +448,159 @@ class EventoInSerializer(serializers.Serializer):
     descripcion = serializers.CharField(required=False, allow_blank=True, default="")
     fecha = serializers.DateField()
     plazo_limite = serializers.DateField(required=False, allow_null=True)
+    # Alternativa a plazo_limite: N días hábiles desde `fecha` (calendario judicial de la causa)
+    plazo_dias_habiles = serializers.IntegerField(required=False, allow_null=True, min_value=0)
 
 class GrafoInSerializer(serializers.Serializer):
     data = serializers.JSONField(required=False)
 
+    def validate_data(self, value):
+        # Si no es un objeto se ignora y el grafo se genera desde la BD (ver create)
+        return validar_grafo_data(value) if isinstance(value, dict) else value
+
+# ── BULK UPSERT (una query de búsqueda por tipo de clave) ──────────────────────
+PARTE_PATCH_FIELDS = ["tipo_persona", "telefono", "email", "documento", "cuit_cuil"]
+PROFESIONAL_PATCH_FIELDS = ["nombre", "apellido", "email", "telefono"]
+
+
+def _patch_vacios(obj, data, fields):
+    """Completa en `obj` los campos vacíos con lo que venga en `data`. Devuelve True si cambió."""
+    changed = False
+    for f in fields:
+        v = data.get(f)
+        if v not in (None, "") and getattr(obj, f) in (None, ""):
+            setattr(obj, f, v)
+            changed = True
+    return changed
+
+
+def upsert_partes_bulk(items):
+    """
+    Versión en lote de ParteWriteSerializer.get_or_create para datos ya validados.
+    Claves (prioridad): id, documento, cuit/cuil, (nombre+email). Hace una query por
+    tipo de clave, completa campos vacíos con bulk_update e inserta las faltantes con
+    bulk_create. Devuelve las Partes en el mismo orden que `items`.
+    """
+    if not items:
+        return []
+    ids = {d["id"] for d in items if d.get("id")}
+    docs = {d["documento"] for d in items if d.get("documento")}
+    cuits = {d["cuit_cuil"] for d in items if d.get("cuit_cuil")}
+    pares = {(d["nombre_razon_social"], d["email"]) for d in items
+             if d.get("nombre_razon_social") and d.get("email")}
+
+    por_id = Parte.objects.in_bulk(ids) if ids else {}
+    faltan = ids - por_id.keys()
+    if faltan:
+        raise serializers.ValidationError({"partes": f"No existen las partes con id {sorted(faltan)}."})
+    por_doc, por_cuit, por_par = {}, {}, {}
+    if docs:
+        for p in Parte.objects.filter(documento__in=docs).order_by("id"):
+            por_doc.setdefault(p.documento, p)
+    if cuits:
+        for p in Parte.objects.filter(cuit_cuil__in=cuits).order_by("id"):
+            por_cuit.setdefault(p.cuit_cuil, p)
+    if pares:
+        qs = Parte.objects.filter(
+            nombre_razon_social__in={n for n, _ in pares}, email__in={e for _, e in pares}
+        ).order_by("id")
+        for p in qs:
+            por_par.setdefault((p.nombre_razon_social, p.email), p)
+
+    resultado, a_parchear, nuevas = [], {}, []
+    for d in items:
+        if d.get("id"):
+            resultado.append(por_id[d["id"]])
+            continue
+        obj = (por_doc.get(d.get("documento")) or por_cuit.get(d.get("cuit_cuil"))
+               or por_par.get((d.get("nombre_razon_social"), d.get("email"))))
+        if obj is None:
+            obj = Parte(
+                tipo_persona=d.get("tipo_persona") or Parte.FISICA,
+                nombre_razon_social=d.get("nombre_razon_social") or "",
+                documento=d.get("documento"),
+                cuit_cuil=d.get("cuit_cuil"),
+                email=d.get("email", ""),
+                telefono=d.get("telefono", ""),
+                domicilio=d.get("domicilio") or "",
+            )
+            nuevas.append(obj)
+            # Dos items del payload con la misma clave resuelven a la misma Parte nueva
+            if obj.documento:
+                por_doc[obj.documento] = obj
+            if obj.cuit_cuil:
+                por_cuit[obj.cuit_cuil] = obj
+            if obj.nombre_razon_social and obj.email:
+                por_par[(obj.nombre_razon_social, obj.email)] = obj
+        elif obj.pk and _patch_vacios(obj, d, PARTE_PATCH_FIELDS):
+            a_parchear[obj.pk] = obj
+        resultado.append(obj)
+
+    if a_parchear:
+        Parte.objects.bulk_update(list(a_parchear.values()), PARTE_PATCH_FIELDS)
+    if nuevas:
+        Parte.objects.bulk_create(nuevas)
+    return resultado
+
+
+def upsert_profesionales_bulk(items):
+    """
+    Versión en lote de ProfesionalWriteSerializer.get_or_create para datos ya validados.
+    Claves: id, matrícula (única), (apellido+nombre+email). Devuelve los Profesionales
+    en el mismo orden que `items`.
+    """
+    if not items:
+        return []
+    ids = {d["id"] for d in items if d.get("id")}
+    matriculas = {d["matricula"] for d in items if d.get("matricula")}
+    ternas = {(d["apellido"], d["nombre"], d["email"]) for d in items
+              if d.get("apellido") and d.get("nombre") and d.get("email")}
+
+    por_id = Profesional.objects.in_bulk(ids) if ids else {}
+    faltan = ids - por_id.keys()
+    if faltan:
+        raise serializers.ValidationError({"profesionales": f"No existen los profesionales con id {sorted(faltan)}."})
+    por_mat = Profesional.objects.in_bulk(matriculas, field_name="matricula") if matriculas else {}
+    por_terna = {}
+    if ternas:
+        qs = Profesional.objects.filter(
+            apellido__in={a for a, _, _ in ternas},
+            nombre__in={n for _, n, _ in ternas},
+            email__in={e for _, _, e in ternas},
+        ).order_by("id")
+        for p in qs:
+            por_terna.setdefault((p.apellido, p.nombre, p.email), p)
+
+    resultado, a_parchear, nuevos = [], {}, []
+    for d in items:
+        if d.get("id"):
+            resultado.append(por_id[d["id"]])
+            continue
+        obj = por_mat.get(d.get("matricula")) or por_terna.get((d.get("apellido"), d.get("nombre"), d.get("email")))
+        if obj is None:
+            obj = Profesional(
+                nombre=d.get("nombre", ""),
+                apellido=d.get("apellido", ""),
+                matricula=d.get("matricula", ""),
+                email=d.get("email", ""),
+                telefono=d.get("telefono", ""),
+            )
+            nuevos.append(obj)
+            if obj.matricula:
+                por_mat[obj.matricula] = obj
+            if obj.apellido and obj.nombre and obj.email:
+                por_terna[(obj.apellido, obj.nombre, obj.email)] = obj
+        elif obj.pk and d.get("matricula") and _patch_vacios(obj, d, PROFESIONAL_PATCH_FIELDS):
+            a_parchear[obj.pk] = obj
+        resultado.append(obj)
+
+    if a_parchear:
+        Profesional.objects.bulk_update(list(a_parchear.values()), PROFESIONAL_PATCH_FIELDS)
+    if nuevos:
+        Profesional.objects.bulk_create(nuevos)
+    return resultado
+
+
 class CausaFullCreateSerializer(serializers.Serializer):
     # Causa base
     # Generar un idempotency_key automático si no vino
@@ -437,8 +622,27 @@ class CausaFullCreateSerializer(serializers.Serializer):
     eventos = EventoInSerializer(many=True, required=False, default=list)
     grafo = GrafoInSerializer(required=False)
 
+    def validate(self, attrs):
+        # Plazos en días hábiles: se calculan acá (en lote) para que una fecha fuera del
+        # calendario judicial sea un 400 del evento y no un 500 a mitad del create()
+        eventos = attrs.get("eventos") or []
+        con_habiles = [e for e in eventos if e.get("plazo_dias_habiles") is not None]
+        if con_habiles:
+            from .calendario import sumar_dias_habiles_lote
+            try:
+                plazos = sumar_dias_habiles_lote(
+                    [e["fecha"] for e in con_habiles], [e["plazo_dias_habiles"] for e in con_habiles],
+                    attrs.get("jurisdiccion", ""),
+                )
+            except ValueError as e:
+                raise serializers.ValidationError({"eventos": str(e)})
+            for e, plazo in zip(con_habiles, plazos):
+                e["plazo_limite"] = plazo
+        return attrs
+
     def create(self, validated_data):
-        user = self.context["request"].user
+        # En importaciones masivas no hay request: el usuario viene en el contexto
+        user = self.context.get("user") or self.context["request"].user
         
         if not validated_data.get("creado_por"):
             validated_data["creado_por"] = user
@@ -465,66 +669,65 @@ class CausaFullCreateSerializer(serializers.Serializer):
         with transaction.atomic():
             causa = Causa.objects.create(**validated_data)
 
-            # Partes
-            for item in partes:
-                parte_obj = ParteWriteSerializer(data=item.get("parte"))
-                parte_obj.is_valid(raise_exception=True)
-                parte = parte_obj.get_or_create()
-
-                CausaParte.objects.get_or_create(
-                    causa=causa, parte=parte
-                )
+            # Partes: upsert en lote + vínculos en un solo INSERT
+            partes_objs = upsert_partes_bulk([item["parte"] for item in partes])
+            links = {p.pk: CausaParte(causa=causa, parte=p) for p in partes_objs}
+            if links:
+                CausaParte.objects.bulk_create(links.values(), ignore_conflicts=True)
 
             # Profesionales
-            for item in profesionales:
-                prof_ser = ProfesionalWriteSerializer(data=item["profesional"])
-                prof_ser.is_valid(raise_exception=True)
-                prof = prof_ser.get_or_create()
-
-                CausaProfesional.objects.get_or_create(
-                    causa=causa, profesional=prof,
-                    rol_profesional=item["rol_profesional"]
+            profs_objs = upsert_profesionales_bulk([item["profesional"] for item in profesionales])
+            links = {
+                (p.pk, item["rol_profesional"]): CausaProfesional(
+                    causa=causa, profesional=p, rol_profesional=item["rol_profesional"]
                 )
+                for p, item in zip(profs_objs, profesionales)
+            }
+            if links:
+                CausaProfesional.objects.bulk_create(links.values(), ignore_conflicts=True)
 
-            # Documentos
+            # Documentos (solo metadata si no vino archivo; el archivo se puede subir luego)
+            bulk_docs = []
             for doc in documentos:
-                file_field = doc.get("archivo")
-                key = doc.get("archivo_key")
-                if not file_field and not key:
-                    # permitir crear metadata y subir luego
-                    Documento.objects.create(causa=causa, titulo=doc["titulo"], fecha=doc.get("fecha"))
-                elif file_field:
-                    Documento.objects.create(causa=causa, titulo=doc["titulo"],
-                                             archivo=file_field, fecha=doc.get("fecha"))
-                else:
+                d = Documento(causa=causa, usuario=user, titulo=doc["titulo"])
+                if doc.get("archivo"):
+                    d.archivo = doc["archivo"]
+                elif doc.get("archivo_key"):
                     # Si usás un storage que mapea key->name, podés setear .name directamente
-                    d = Documento(causa=causa, titulo=doc["titulo"], fecha=doc.get("fecha"))
-                    d.archivo.name = key  # p.ej. "causas/123/docs/lo-que-sea.pdf"
-                    d.save()
+                    d.archivo.name = doc["archivo_key"]  # p.ej. "causas/123/docs/lo-que-sea.pdf"
+                bulk_docs.append(d)
+            if bulk_docs:
+                Documento.objects.bulk_create(bulk_docs, batch_size=100)
 
-            # Eventos
+            # Eventos (plazo_limite de los plazos en días hábiles ya viene de validate())
             bulk_eventos = [
                 EventoProcesal(causa=causa,
                                titulo=e["titulo"],
                                descripcion=e.get("descripcion",""),
                                fecha=e["fecha"],
-                               plazo_limite=e.get("plazo_limite"))
+                               plazo_limite=e.get("plazo_limite"),
+                               plazo_desde=e["fecha"] if e.get("plazo_dias_habiles") is not None else None,
+                               plazo_dias_habiles=e.get("plazo_dias_habiles"))
                 for e in eventos
             ]
             if bulk_eventos:
                 EventoProcesal.objects.bulk_create(bulk_eventos, batch_size=100)
+                # bulk_create no dispara signals: la agenda se sincroniza en lote
+                from .agenda import sincronizar_vencimientos
+                sincronizar_vencimientos(bulk_eventos)
 
             # Grafo (opcional)
             # --- Grafo: generar/actualizar de forma idempotente ---
             # Si vino un grafo en el payload lo usamos; si no, lo construimos desde DB.
+            # Con `diferir_grafo` (importación masiva) lo genera la tarea post-importación.
             if grafo_in and isinstance(grafo_in.get("data"), dict):
-                data = grafo_in["data"]
-            else:
-                from .utils import build_causa_graph
-                data = build_causa_graph(causa)
+                CausaGrafo.objects.update_or_create(causa=causa, defaults={"data": grafo_in["data"]})
+            elif not self.context.get("diferir_grafo"):
+                from .utils import generar_grafo_desde_bd
+                data = generar_grafo_desde_bd(causa)
 
-            # Evita el UniqueViolation cuando ya existe para esa causa
-            CausaGrafo.objects.update_or_create(causa=causa, defaults={"data": data})
+                # Evita el UniqueViolation cuando ya existe para esa causa
+                CausaGrafo.objects.update_or_create(causa=causa, defaults={"data": data})
         # Devolver expandido con el serializer de lectura ya existente
         return causa
 
@@ -1,22 +1,49 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import Causa, Documento, EventoProcesal, CausaParte, CausaProfesional, CausaGrafo
-from .utils import generar_grafo_desde_bd
-
-def ensure_grafo(causa):
-    grafo, created = CausaGrafo.objects.get_or_create(causa=causa)
-    if created or not grafo.data:
-        grafo.data = generar_grafo_desde_bd(causa)
-        grafo.save(update_fields=["data", "actualizado_en"])
+from .models import Causa, Documento, EventoProcesal, CausaParte, CausaProfesional, Vencimiento
+from .utils import programar_delta_grafo
+from .agenda import sincronizar_vencimientos
 
+# El grafo se actualiza por delta al hacer commit (ver causa.utils.programar_delta_grafo):
+# una importación masiva dentro de una transacción toca cada grafo una sola vez.
 @receiver(post_save, sender=Documento)
 @receiver(post_save, sender=EventoProcesal)
 @receiver(post_save, sender=CausaParte)
 @receiver(post_save, sender=CausaProfesional)
 def bootstrap_grafo(sender, instance, created, **kwargs):
-    if created:
-        ensure_grafo(instance.causa)
+    # Los eventos y documentos pueden cambiar de título/fecha: también se propaga el update
+    if created or sender in (Documento, EventoProcesal):
+        programar_delta_grafo(instance.causa_id, sender, instance.pk)
+
+@receiver(post_delete, sender=Documento)
+@receiver(post_delete, sender=EventoProcesal)
+@receiver(post_delete, sender=CausaParte)
+@receiver(post_delete, sender=CausaProfesional)
+def quitar_nodo_grafo(sender, instance, **kwargs):
+    if sender is CausaParte:
+        node_id = f"parte-{instance.parte_id}"
+    elif sender is CausaProfesional:
+        node_id = f"prof-{instance.profesional_id}"
+    elif sender is Documento:
+        node_id = f"doc-{instance.pk}"
+    else:
+        node_id = f"ev-{instance.pk}"
+    programar_delta_grafo(instance.causa_id, quitar_nodo=node_id)
+
 @receiver(post_save, sender=Causa)
 def bootstrap_grafo_causa(sender, instance, created, **kwargs):
     if created:
-        ensure_grafo(instance)
\ No newline at end of file
+        programar_delta_grafo(instance.pk)
+
+# Agenda desnormalizada (ver causa.agenda)
+@receiver(post_save, sender=EventoProcesal)
+def sincronizar_agenda_evento(sender, instance, **kwargs):
+    sincronizar_vencimientos([instance])
+
+@receiver(post_save, sender=Causa)
+def sincronizar_agenda_causa(sender, instance, created, **kwargs):
+    if not created:
+        # Si cambió el dueño de la causa, la agenda lo sigue (no-op en el caso común)
+        Vencimiento.objects.filter(causa=instance).exclude(
+            usuario_id=instance.creado_por_id
+        ).update(usuario_id=instance.creado_por_id)
@@ -0,0 +1,20 @@
+from celery import shared_task
+from django.contrib.auth import get_user_model
+
+from trazability.trazabilityHelper import TrazabilityHelper
+from .models import Causa
+from .utils import procesar_deltas_grafo
+
+
+@shared_task
+def post_importacion_causas(causa_ids, user_id):
+    """
+    Trabajo diferido de una importación masiva: trazabilidad en lote y
+    un grafo por causa (se corre después del commit de cada lote).
+    """
+    user = get_user_model().objects.filter(pk=user_id).first()
+    causas = list(Causa.objects.filter(pk__in=causa_ids).only("id", "numero_expediente"))
+    TrazabilityHelper.register_causa_create_bulk(causas, user)
+    for causa in causas:
+        procesar_deltas_grafo(causa.id, completo=True)
+    return len(causas)
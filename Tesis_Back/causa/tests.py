@@ -1,3 +1,275 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from io import StringIO
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import etag
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+
+from tesis_api import cache
+from tesis_api.etag import _recordar
+
+
+class _VistaContada(APIView):
+    permission_classes = [AllowAny]
+    llamadas = 0
+
+    @cache.cachear_respuesta(cache.GRUPO_CAUSAS)
+    def get(self, request):
+        type(self).llamadas += 1
+        return Response({"n": type(self).llamadas})
+
+
+class _VistaConEtag(APIView):
+    """Como CausaViewSet.retrieve: etag() por encima de @cachear_respuesta."""
+    permission_classes = [AllowAny]
+    estado = 1
+
+    @method_decorator(etag(lambda request: _recordar(request, f"e{_VistaConEtag.estado}")))
+    @cache.cachear_respuesta(cache.GRUPO_CAUSAS)
+    def get(self, request):
+        return Response({"estado": type(self).estado})
+
+
+@override_settings(API_CACHE=True)
+class CacheRespuestasTests(SimpleTestCase):
+    """Usa los LocMemCache de settings (sin CACHE_REDIS_URL) como L1 y L2: un solo proceso."""
+
+    def setUp(self):
+        caches["default"].clear()
+        caches["local"].clear()
+        _VistaContada.llamadas = 0
+        self.vista = _VistaContada.as_view()
+
+    def _get(self, uid, path="/api/causas/"):
+        request = APIRequestFactory().get(path)
+        force_authenticate(request, user=SimpleNamespace(pk=uid, is_authenticated=True))
+        return self.vista(request)
+
+    def test_segundo_get_sale_del_cache(self):
+        r1, r2 = self._get(1), self._get(1)
+        self.assertEqual(r1["X-Cache"], "MISS")
+        self.assertEqual(r2["X-Cache"], "HIT-L1")
+        self.assertEqual(r2.data, {"n": 1})
+        self.assertEqual(_VistaContada.llamadas, 1)
+
+    def test_l2_cuando_l1_no_tiene(self):
+        self._get(1)
+        caches["local"].clear()  # otro proceso: L1 vacío
+        r = self._get(1)
+        self.assertEqual(r["X-Cache"], "HIT-L2")
+        self.assertEqual(_VistaContada.llamadas, 1)
+
+    def test_claves_por_usuario_y_query(self):
+        self._get(1)
+        self._get(2)
+        self._get(1, "/api/causas/?estado=abierta")
+        self.assertEqual(_VistaContada.llamadas, 3)
+
+    def test_invalidar_solo_afecta_al_usuario(self):
+        self._get(1)
+        self._get(2)
+        cache.invalidar(cache.GRUPO_CAUSAS, 1)
+        self.assertEqual(self._get(1).data, {"n": 3})
+        self.assertEqual(self._get(2)["X-Cache"], "HIT-L1")
+        # Otro grupo no se entera
+        cache.invalidar(cache.GRUPO_CONVERSACIONES, 2)
+        self.assertEqual(self._get(2)["X-Cache"], "HIT-L1")
+
+    def test_metricas(self):
+        cache.reiniciar_metricas()
+        self._get(1)
+        self._get(1)
+        caches["local"].clear()
+        self._get(1)
+        m = cache.metricas()["_VistaContada:get"]
+        self.assertEqual((m["l1"], m["l2"], m["fallos"]), (1, 1, 1))
+        self.assertAlmostEqual(m["tasa"], 2 / 3, places=3)
+
+    @override_settings(API_CACHE=False)
+    def test_apagado_no_cachea(self):
+        r1, r2 = self._get(1), self._get(1)
+        self.assertFalse(r1.has_header("X-Cache"))
+        self.assertEqual(r2.data, {"n": 2})
+
+    def test_etag_nuevo_no_reusa_cuerpo_cacheado(self):
+        vista = _VistaConEtag.as_view()
+        _VistaConEtag.estado = 1
+
+        def get(**headers):
+            request = APIRequestFactory().get("/api/causas/1/", **headers)
+            force_authenticate(request, user=SimpleNamespace(pk=1, is_authenticated=True))
+            return vista(request)
+
+        r1 = get()
+        self.assertEqual(get(HTTP_IF_NONE_MATCH=r1["ETag"]).status_code, 304)
+        # Cambian los datos pero la invalidación (on_commit / otro proceso) todavía no llegó
+        _VistaConEtag.estado = 2
+        r2 = get(HTTP_IF_NONE_MATCH=r1["ETag"])
+        self.assertEqual(r2.status_code, 200)
+        self.assertEqual(r2.data, {"estado": 2})
+        self.assertEqual(r2["X-Cache"], "MISS")
+
+
+class CausaFullCreateValidacionTests(SimpleTestCase):
+    def _ser(self, fecha):
+        from causa.serializers import CausaFullCreateSerializer
+
+        return CausaFullCreateSerializer(data={
+            "numero_expediente": "1/2024", "caratula": "A c/ B", "jurisdiccion": "Provincia de Buenos Aires",
+            "eventos": [{"titulo": "Traslado", "fecha": fecha, "plazo_dias_habiles": 5}],
+        })
+
+    def test_fecha_fuera_del_calendario_es_error_de_validacion(self):
+        ser = self._ser("1990-03-01")
+        self.assertFalse(ser.is_valid())
+        self.assertIn("eventos", ser.errors)
+
+    def test_plazo_se_calcula_en_validate(self):
+        ser = self._ser("2024-03-01")
+        self.assertTrue(ser.is_valid(), ser.errors)
+        evento = ser.validated_data["eventos"][0]
+        self.assertGreater(evento["plazo_limite"].isoformat(), "2024-03-01")
+
+
+class ImportarCausasComandoTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email="dueno@example.com", password="x")
+        fd, self.ruta = tempfile.mkstemp(suffix=".jsonl")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for i in range(3):
+                f.write(json.dumps({"numero_expediente": f"{i}/2024", "caratula": f"A{i} c/ B"}) + "\n")
+        self.addCleanup(os.remove, self.ruta)
+
+    def test_importa_para_el_usuario_por_email(self):
+        from causa.models import Causa
+
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("importar_causas", self.ruta, usuario="dueno@example.com", stdout=out)
+        self.assertIn("creadas=3", out.getvalue())
+        self.assertEqual(Causa.objects.filter(creado_por=self.user).count(), 3)
+
+    def test_usuario_inexistente(self):
+        from django.core.management.base import CommandError
+
+        with self.assertRaises(CommandError):
+            call_command("importar_causas", self.ruta, usuario="nadie@example.com", stdout=StringIO())
+
+
+class LayoutGrafoTests(SimpleTestCase):
+    def _grafo(self):
+        from causa.utils import aplicar_delta_grafo
+
+        data = {"nodes": [], "edges": []}
+        aplicar_delta_grafo(data, nodos=[
+            {"id": "ev-1", "type": "evento", "data": {"label": "Demanda", "fecha": "2024-03-01"}, "position": {"x": 0, "y": 0}},
+            {"id": "ev-2", "type": "evento", "data": {"label": "Traslado", "fecha": "2024-03-05"}, "position": {"x": 0, "y": 0}},
+            {"id": "parte-1", "type": "parte", "data": {"label": "Actor"}, "position": {"x": 0, "y": 0}},
+            {"id": "doc-1", "type": "documento", "data": {"label": "Escrito"}, "position": {"x": 0, "y": 0}},
+        ])
+        return data
+
+    def test_calcular_posiciones_eventos_en_linea_de_tiempo(self):
+        from causa.layout import DX, calcular_posiciones
+
+        data = self._grafo()
+        pos = calcular_posiciones(data["nodes"], data["edges"])
+        self.assertEqual(set(pos), {"ev-1", "ev-2", "parte-1", "doc-1"})
+        self.assertEqual(pos["ev-2"]["x"] - pos["ev-1"]["x"], DX)
+        self.assertLess(pos["parte-1"]["y"], pos["doc-1"]["y"])  # partes arriba, documentos abajo
+        self.assertEqual(pos, calcular_posiciones(data["nodes"], data["edges"]))  # determinista
+
+    def test_delta_conserva_posiciones_guardadas(self):
+        from causa.layout import aplicar_layout
+        from causa.utils import aplicar_delta_grafo
+
+        data = self._grafo()
+        self.assertTrue(aplicar_layout(data))
+        self.assertFalse(aplicar_layout(data))  # misma estructura: no se recalcula
+        data["nodes"][2]["position"] = {"x": 1234.0, "y": -99.0}  # el front movió la parte
+        antes = {n["id"]: dict(n["position"]) for n in data["nodes"]}
+
+        aplicar_delta_grafo(data, nodos=[
+            {"id": "ev-3", "type": "evento", "data": {"label": "Sentencia", "fecha": "2024-04-01"}, "position": {"x": 0, "y": 0}},
+        ])
+        self.assertTrue(aplicar_layout(data))
+        despues = {n["id"]: n["position"] for n in data["nodes"]}
+        self.assertEqual({i: despues[i] for i in antes}, antes)
+        self.assertTrue(despues["ev-3"]["x"] or despues["ev-3"]["y"])
+
+    def test_nodo_sin_id(self):
+        from causa.layout import aplicar_layout, calcular_posiciones
+        from causa.serializers import CausaGrafoSerializer
+
+        data = self._grafo()
+        data["nodes"].append({"type": "evento", "data": {"label": "?", "fecha": "2024-03-02"}})
+        self.assertEqual(len(calcular_posiciones(data["nodes"], data["edges"])), 4)
+        self.assertTrue(aplicar_layout(data))
+        self.assertNotIn("position", data["nodes"][-1])
+
+        ser = CausaGrafoSerializer(data={"data": data})
+        self.assertFalse(ser.is_valid())
+        self.assertIn("data", ser.errors)
+
+
+class AplicarDeltaGrafoTests(SimpleTestCase):
+    def test_dedup_por_id_conserva_posicion(self):
+        from causa.utils import aplicar_delta_grafo
+
+        nodo = {"id": "doc-1", "type": "documento", "data": {"label": "Escrito"}, "position": {"x": 0, "y": 0}}
+        data = {"nodes": [], "edges": []}
+        self.assertTrue(aplicar_delta_grafo(data, nodos=[nodo, dict(nodo)]))
+        self.assertEqual(len(data["nodes"]), 1)
+        data["nodes"][0]["position"] = {"x": 10, "y": 20}
+
+        self.assertFalse(aplicar_delta_grafo(data, nodos=[dict(nodo)]))  # mismo contenido: sin cambios
+        renombrado = {**nodo, "data": {"label": "Escrito inicial"}}
+        self.assertTrue(aplicar_delta_grafo(data, nodos=[renombrado]))
+        self.assertEqual(data["nodes"], [{**renombrado, "position": {"x": 10, "y": 20}}])
+
+        self.assertTrue(aplicar_delta_grafo(data, quitar=["doc-1"]))
+        self.assertEqual(data["nodes"], [])
+
+
+class ProgramarDeltaGrafoTests(TestCase):
+    def tearDown(self):
+        from causa.utils import _cola
+
+        _cola().clear()
+
+    def test_un_solo_on_commit_por_causa(self):
+        from causa.models import Documento, EventoProcesal
+        from causa.utils import _cola, programar_delta_grafo
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            for pk in (1, 2, 3):
+                programar_delta_grafo(10, Documento, pk)
+            programar_delta_grafo(10, quitar_nodo="parte-7")
+            programar_delta_grafo(20, EventoProcesal, 5)
+        self.assertEqual(len(callbacks), 2)
+        self.assertEqual(_cola()[10]["upsert"], {Documento: {1, 2, 3}})
+        self.assertEqual(_cola()[10]["quitar"], {"parte-7"})
+
+    def test_rollback_descarta_lo_encolado(self):
+        from causa.models import Documento
+        from causa.utils import _cola, programar_delta_grafo
+
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                programar_delta_grafo(10, Documento, 1)
+                raise RuntimeError("rollback")
+        with self.captureOnCommitCallbacks() as callbacks:
+            programar_delta_grafo(10, Documento, 2)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(_cola()[10]["upsert"], {Documento: {2}})
@@ -1,47 +1,272 @@
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+
+from .layout import aplicar_layout
+
+
+# ---------- nodos por entidad ----------
+def nodo_parte(parte):
+    return {
+        "id": f"parte-{parte.id}",
+        "type": "parte",
+        "data": {"label": parte.nombre_razon_social},
+        "position": {"x": 0, "y": 0},  # opcional, el front puede moverlos
+    }
+
+
+def nodo_profesional(prof):
+    return {
+        "id": f"prof-{prof.id}",
+        "type": "profesional",
+        "data": {"label": f"{prof.apellido}, {prof.nombre}".strip(", ")},
+        "position": {"x": 0, "y": 0},
+    }
+
+
+def nodo_documento(doc):
+    return {
+        "id": f"doc-{doc.id}",
+        "type": "documento",
+        "data": {"label": doc.titulo},
+        "position": {"x": 0, "y": 0},
+    }
+
+
+def nodo_evento(ev):
+    return {
+        "id": f"ev-{ev.id}",
+        "type": "evento",
+        "data": {"label": ev.titulo, "fecha": str(ev.fecha)},
+        "position": {"x": 0, "y": 0},
+    }
+
+
 def generar_grafo_desde_bd(causa):
     """
     Devuelve un JSON (dict) con nodes/edges a partir de lo que haya en BD.
-    Por defecto solo genera nodos; las aristas las define el front más tarde.
+    Genera los nodos y la cadena cronológica de eventos ("precede");
+    el resto de las aristas las define el front más tarde.
     """
     nodes = []
-    edges = []  # el front las irá agregando
 
     # NODOS de Partes
     for p in causa.partes.select_related("parte").all():
-        parte = p.parte
-        nodes.append({
-            "id": f"parte-{parte.id}",
-            "type": "parte",
-            "data": {"label": parte.nombre_razon_social},
-            "position": {"x": 0, "y": 0},  # opcional, el front puede moverlos
-        })
+        nodes.append(nodo_parte(p.parte))
 
     # NODOS de Profesionales
     for cp in causa.profesionales.select_related("profesional").all():
-        prof = cp.profesional
-        nodes.append({
-            "id": f"prof-{prof.id}",
-            "type": "profesional",
-            "data": {"label": f"{prof.apellido}, {prof.nombre}".strip(", ")},
-            "position": {"x": 0, "y": 0},
-        })
+        nodes.append(nodo_profesional(cp.profesional))
 
     # NODOS de Documentos
     for d in causa.documentos.all():
-        nodes.append({
-            "id": f"doc-{d.id}",
-            "type": "documento",
-            "data": {"label": d.titulo},
-            "position": {"x": 0, "y": 0},
-        })
+        nodes.append(nodo_documento(d))
 
     # NODOS de Eventos
     for ev in causa.eventos.all():
-        nodes.append({
-            "id": f"ev-{ev.id}",
-            "type": "evento",
-            "data": {"label": ev.titulo},
-            "position": {"x": 0, "y": 0},
-        })
-
-    return {"nodes": nodes, "edges": edges}
+        nodes.append(nodo_evento(ev))
+
+    data = {"nodes": [], "edges": []}
+    aplicar_delta_grafo(data, nodos=nodes)
+    aplicar_layout(data)
+    return data
+
+
+# ---------- deltas ----------
+def _aristas_cronologicas(nodes):
+    """Aristas evento→evento siguiente, ordenadas por (fecha, id)."""
+    eventos = [n for n in nodes if n.get("type") == "evento" and n.get("id") is not None]
+    eventos.sort(key=lambda n: ((n.get("data") or {}).get("fecha") or "", len(str(n["id"])), str(n["id"])))
+    return [
+        {"id": f"{a['id']}->{b['id']}", "source": a["id"], "target": b["id"], "label": "precede"}
+        for a, b in zip(eventos, eventos[1:])
+    ]
+
+
+def aplicar_delta_grafo(data, nodos=(), quitar=()):
+    """
+    Aplica un delta sobre `data` ({nodes, edges}) in-place:
+    - `nodos`: nodos a agregar/actualizar (dedup por id; si existe se actualiza
+      `data` pero se conserva la posición que haya guardado el front).
+    - `quitar`: ids de nodos a eliminar (junto con sus aristas).
+    Después recalcula en memoria la cadena "precede" de eventos.
+    Devuelve True si el grafo cambió.
+    """
+    nodes = data.setdefault("nodes", [])
+    edges = data.setdefault("edges", [])
+    por_id = {n.get("id"): n for n in nodes}
+    cambio = False
+
+    quitar = set(quitar)
+    if quitar & por_id.keys():
+        nodes[:] = [n for n in nodes if n.get("id") not in quitar]
+        edges[:] = [e for e in edges if e.get("source") not in quitar and e.get("target") not in quitar]
+        por_id = {n.get("id"): n for n in nodes}
+        cambio = True
+
+    for nodo in nodos:
+        actual = por_id.get(nodo["id"])
+        if actual is None:
+            nodes.append(nodo)
+            por_id[nodo["id"]] = nodo
+            cambio = True
+        elif actual.get("data") != nodo["data"]:
+            actual["data"] = nodo["data"]
+            cambio = True
+
+    # Aristas automáticas: solo se tocan las "precede"; las del front quedan intactas
+    esperadas = {e["id"]: e for e in _aristas_cronologicas(nodes)}
+    actuales = {e.get("id") for e in edges if e.get("label") == "precede"}
+    if actuales != esperadas.keys():
+        edges[:] = [e for e in edges if e.get("label") != "precede" or e.get("id") in esperadas]
+        edges.extend(e for i, e in esperadas.items() if i not in actuales)
+        cambio = True
+
+    return cambio
+
+
+# ---------- mantenimiento incremental (diferido a on_commit) ----------
+# Pendientes por hilo: {causa_id: {"upsert": {modelo: {pks}}, "quitar": {node_ids},
+#                                  "callback": on_commit registrado, "run_on_commit": lista de la conexión}}
+# Solo llegan acá los cambios que disparan signals: las filas de `bulk_create`
+# (CausaParte, CausaProfesional, Documento y EventoProcesal en CausaFullCreateSerializer
+# e importaciones) no emiten post_save y entran al grafo únicamente por la
+# regeneración completa (generar_grafo_desde_bd / procesar_deltas_grafo(completo=True)).
+_pendientes = threading.local()
+
+
+def _cola():
+    if not hasattr(_pendientes, "por_causa"):
+        _pendientes.por_causa = {}
+    return _pendientes.por_causa
+
+
+def _pendiente_vigente(pend):
+    """
+    False si la transacción (o el savepoint) en la que se encoló se deshizo: Django
+    descarta su on_commit y la cola quedaría colgada para un commit ajeno. Al hacer
+    rollback la conexión reemplaza `run_on_commit`, así que el chequeo caro (buscar el
+    callback) solo corre cuando cambió la lista.
+    """
+    conn = transaction.get_connection()
+    if pend["run_on_commit"] is conn.run_on_commit:
+        return True
+    if any(func is pend["callback"] for _, func, _ in conn.run_on_commit):
+        pend["run_on_commit"] = conn.run_on_commit
+        return True
+    return False
+
+
+@contextmanager
+def grafos_suspendidos():
+    """
+    Desactiva el mantenimiento automático de grafos en este hilo (importaciones
+    masivas): los grafos se generan después con `procesar_deltas_grafo(..., completo=True)`.
+    """
+    previo = getattr(_pendientes, "suspendido", False)
+    _pendientes.suspendido = True
+    try:
+        yield
+    finally:
+        _pendientes.suspendido = previo
+
+
+def programar_delta_grafo(causa_id, modelo=None, pk=None, quitar_nodo=None):
+    """
+    Encola el cambio de una entidad y difiere la actualización del grafo al commit.
+    Varias filas de la misma causa en una transacción se resuelven en un único
+    delta con un solo on_commit por causa. Si la transacción se deshace, lo encolado
+    se descarta en la próxima llamada para esa causa.
+    """
+    if getattr(_pendientes, "suspendido", False):
+        return
+    cola = _cola()
+    pend = cola.get(causa_id)
+    if pend is not None and not _pendiente_vigente(pend):
+        pend = None
+    nueva = pend is None
+    if nueva:
+        pend = cola[causa_id] = {"upsert": {}, "quitar": set(), "callback": None, "run_on_commit": None}
+    if modelo is not None:
+        pend["upsert"].setdefault(modelo, set()).add(pk)
+    if quitar_nodo:
+        pend["quitar"].add(quitar_nodo)
+    if nueva:
+        pend["callback"] = lambda: procesar_deltas_grafo(causa_id)
+        pend["run_on_commit"] = transaction.get_connection().run_on_commit
+        # Fuera de una transacción corre en el acto (y vacía la entrada)
+        transaction.on_commit(pend["callback"], robust=True)
+
+
+def _nodos_pendientes(causa_id, upsert):
+    from .models import CausaParte, CausaProfesional, Documento, EventoProcesal
+
+    nodos = []
+    # Una query por tipo; los pks de filas que ya no existen (rollback) se ignoran solos
+    if upsert.get(CausaParte):
+        qs = CausaParte.objects.filter(causa_id=causa_id, pk__in=upsert[CausaParte]).select_related("parte")
+        nodos += [nodo_parte(cp.parte) for cp in qs]
+    if upsert.get(CausaProfesional):
+        qs = CausaProfesional.objects.filter(causa_id=causa_id, pk__in=upsert[CausaProfesional]).select_related("profesional")
+        nodos += [nodo_profesional(cp.profesional) for cp in qs]
+    if upsert.get(Documento):
+        nodos += [nodo_documento(d) for d in Documento.objects.filter(causa_id=causa_id, pk__in=upsert[Documento])]
+    if upsert.get(EventoProcesal):
+        nodos += [nodo_evento(e) for e in EventoProcesal.objects.filter(causa_id=causa_id, pk__in=upsert[EventoProcesal])]
+    return nodos
+
+
+def _quitar_vigentes(causa_id, quitar):
+    """Una parte/profesional puede estar vinculado con varios roles: solo se quita si no queda ningún vínculo."""
+    from .models import CausaParte, CausaProfesional
+
+    partes = [int(n.split("-")[1]) for n in quitar if n.startswith("parte-")]
+    profs = [int(n.split("-")[1]) for n in quitar if n.startswith("prof-")]
+    vigentes = set()
+    if partes:
+        vigentes |= {f"parte-{i}" for i in CausaParte.objects.filter(
+            causa_id=causa_id, parte_id__in=partes).values_list("parte_id", flat=True)}
+    if profs:
+        vigentes |= {f"prof-{i}" for i in CausaProfesional.objects.filter(
+            causa_id=causa_id, profesional_id__in=profs).values_list("profesional_id", flat=True)}
+    return quitar - vigentes
+
+
+def _es_formato_simple(data):
+    """Grafos viejos de `crear_grafo_simple` (nodos P1/E1, aristas from/to): se regeneran."""
+    return any("data" not in n for n in data.get("nodes", [])) or any("from" in e for e in data.get("edges", []))
+
+
+def procesar_deltas_grafo(causa_id, completo=False):
+    """
+    Aplica los cambios encolados para la causa. Si la causa todavía no tiene grafo
+    (o está vacío) lo genera completo una sola vez; si no, aplica solo el delta.
+    Con `completo=True` se procesa aunque no haya nada encolado (grafos diferidos).
+    """
+    from .models import Causa, CausaGrafo
+
+    pend = _cola().pop(causa_id, None)
+    if pend is None:
+        if not completo:
+            return None
+        pend = {"upsert": {}, "quitar": set()}
+
+    with transaction.atomic():
+        grafo = CausaGrafo.objects.select_for_update().filter(causa_id=causa_id).first()
+        if grafo is None or not grafo.data or _es_formato_simple(grafo.data):
+            causa = Causa.objects.filter(pk=causa_id).first()
+            if causa is None:  # causa borrada en la misma transacción
+                return None
+            data = generar_grafo_desde_bd(causa)
+            grafo, _ = CausaGrafo.objects.update_or_create(causa=causa, defaults={"data": data})
+            return grafo
+
+        nodos = _nodos_pendientes(causa_id, pend["upsert"])
+        quitar = _quitar_vigentes(causa_id, pend["quitar"]) if pend["quitar"] else set()
+        cambio = aplicar_delta_grafo(grafo.data, nodos=nodos, quitar=quitar)
+        # El layout solo se recalcula si cambió el conjunto de nodos/aristas
+        cambio = aplicar_layout(grafo.data) or cambio
+        if cambio:
+            grafo.save(update_fields=["data", "actualizado_en"])
+        return grafo
@@ -31,6 +31,16 @@ from django.core.files.base import ContentFile
 from django.conf import settings
 from openai import OpenAI
 from trazability.trazabilityHelper import TrazabilityHelper
+from tesis_api.db import liberar_conexion_db
+from tesis_api.cache import GRUPO_CAUSAS, cachear_respuesta
+from tesis_api.etag import etag_causa
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import etag
+from .utils import generar_grafo_desde_bd, procesar_deltas_grafo
+from .layout import aplicar_layout
+from .agenda import proximos_eventos, vencimientos, exportar_ical, exportar_json
+from .calendario import sumar_dias_habiles
+from django.http import HttpResponse
 from django.db.models import Count, Q
 
 # Para desarrollo, permitimos acceso sin token:
@@ -269,6 +279,13 @@ class CausaViewSet(viewsets.ModelViewSet):
         instance.delete()
 
 
+    @cachear_respuesta(GRUPO_CAUSAS)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    # If-None-Match vigente -> 304 sin tocar el cache ni serializar (ver tesis_api/etag.py)
+    @method_decorator(etag(etag_causa))
+    @cachear_respuesta(GRUPO_CAUSAS)
     def retrieve(self, request, *args, **kwargs):
         """
         Obtiene los datos de una causa y sus 10 documentos más recientes.
@@ -299,6 +316,7 @@ class CausaViewSet(viewsets.ModelViewSet):
         responses={200: TimelineResponseSerializer},
     )
     @action(detail=True, methods=["get"], url_path="timeline")
+    @cachear_respuesta(GRUPO_CAUSAS)
     def timeline(self, request, pk=None):
         causa = self.get_object()
         desde = request.query_params.get("desde")
@@ -330,6 +348,7 @@ class CausaViewSet(viewsets.ModelViewSet):
         responses={200: ProximosResponseSerializer},
     )
     @action(detail=True, methods=["get"], url_path="proximos")
+    @cachear_respuesta(GRUPO_CAUSAS)
     def proximos(self, request, pk=None):
         causa = self.get_object()
         try:
@@ -341,14 +360,12 @@ class CausaViewSet(viewsets.ModelViewSet):
         desde = hoy if request.query_params.get("desde_hoy") in {"1", "true", "True"} else (hoy - timedelta(days=1))
         hasta = hoy + timedelta(days=dias)
 
-        qs = EventoProcesal.objects.filter(causa=causa).filter(
-            models.Q(fecha__range=(desde, hasta)) |
-            models.Q(plazo_limite__range=(desde, hasta))
+        qs = proximos_eventos(
+            causa.creado_por_id, desde, hasta, causa_id=causa.id,
+            solo_con_plazo=request.query_params.get("solo_con_plazo") in {"1", "true", "True"},
         )
-        if request.query_params.get("solo_con_plazo") in {"1", "true", "True"}:
-            qs = qs.filter(plazo_limite__isnull=False)
 
-        data = EventoProcesalSerializer(qs.order_by("plazo_limite", "fecha", "id"), many=True).data
+        data = EventoProcesalSerializer(qs, many=True).data
         return Response({"desde": desde, "hasta": hasta, "eventos": data})
 
 
@@ -364,18 +381,24 @@ class CausaViewSet(viewsets.ModelViewSet):
         # Ensure existe entry de grafo (o generarlo si falta)
         grafo_obj, created = CausaGrafo.objects.get_or_create(causa=causa)
         if created or not grafo_obj.data:
-            grafo_obj.data = grafo(causa)
+            grafo_obj.data = generar_grafo_desde_bd(causa)
             grafo_obj.save(update_fields=["data", "actualizado_en"])
 
         if request.method == "GET":
+            # Posiciones cacheadas en data.layout_hash: solo se recalculan si cambió la estructura
+            if aplicar_layout(grafo_obj.data):
+                grafo_obj.save(update_fields=["data", "actualizado_en"])
             return Response(CausaGrafoSerializer(grafo_obj).data)
 
         if request.method == "PUT":
             # reemplazo total del JSON
             serializer = CausaGrafoSerializer(grafo_obj, data=request.data, partial=False)
             serializer.is_valid(raise_exception=True)
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            grafo_obj = serializer.save()
+            # Las posiciones que mandó el front se respetan; las que falten se calculan acá
+            if aplicar_layout(grafo_obj.data):
+                grafo_obj.save(update_fields=["data", "actualizado_en"])
+            return Response(CausaGrafoSerializer(grafo_obj).data, status=status.HTTP_200_OK)
 
         if request.method == "DELETE":
             #Opción B (si preferís limpiarlo del todo):
@@ -617,6 +640,45 @@ class CausaViewSet(viewsets.ModelViewSet):
         status_code = status.HTTP_200_OK if request.data.get("idempotency_key") else status.HTTP_201_CREATED
         return Response(ser.to_representation(causa), status=status_code)
 
+    @extend_schema(
+        summary="Importación masiva de causas (CSV/JSONL)",
+        description=(
+            "Recibe un archivo `archivo` (.csv o .jsonl) y crea una causa por fila, con el mismo formato que "
+            "`POST /api/causas/full/`. En CSV, las columnas `partes`, `profesionales`, `documentos` y `eventos` "
+            "llevan un array JSON. Las filas se validan y escriben por lotes (`tam_lote`, default 200); "
+            "grafo y trazabilidad se generan después del commit de cada lote. "
+            "Devuelve el reporte con errores por fila y causas/segundo. Las causas ya existentes "
+            "(misma triple-clave del usuario) se cuentan como duplicadas y no se vuelven a crear."
+        ),
+        request={"multipart/form-data": {
+            "type": "object",
+            "properties": {
+                "archivo": {"type": "string", "format": "binary"},
+                "formato": {"type": "string", "enum": ["csv", "jsonl"]},
+                "tam_lote": {"type": "integer"},
+            },
+            "required": ["archivo"],
+        }},
+        responses={200: OpenApiTypes.OBJECT},
+        tags=["Causas"],
+    )
+    @action(detail=False, methods=["post"], url_path="importar",
+            permission_classes=[permissions.IsAuthenticated], parser_classes=[parsers.MultiPartParser])
+    def importar(self, request):
+        from .importacion import importar_causas, inferir_formato, TAM_LOTE
+
+        archivo = request.FILES.get("archivo")
+        if not archivo:
+            return Response({"detail": "Falta el archivo (`archivo`)."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            formato = inferir_formato(archivo.name, request.data.get("formato"))
+            tam_lote = max(1, min(int(request.data.get("tam_lote") or TAM_LOTE), 1000))
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        reporte = importar_causas(archivo, formato, request.user, tam_lote=tam_lote)
+        return Response(reporte, status=status.HTTP_200_OK)
+
 
 
 
@@ -751,6 +813,7 @@ class EventoProcesalViewSet(viewsets.ModelViewSet):
         responses={200: ProximosResponseSerializer},
     )
     @action(detail=False, methods=["get"], url_path="proximos")
+    @cachear_respuesta(GRUPO_CAUSAS)
     def proximos(self, request):
         try:
             dias = int(request.query_params.get("dias", 14))
@@ -761,22 +824,57 @@ class EventoProcesalViewSet(viewsets.ModelViewSet):
         desde = hoy if request.query_params.get("desde_hoy") in {"1", "true", "True"} else (hoy - timedelta(days=1))
         hasta = hoy + timedelta(days=dias)
 
-        qs = EventoProcesal.objects.all()
-        if request.query_params.get("solo_con_plazo") in {"1", "true", "True"}:
-            qs = qs.filter(plazo_limite__isnull=False)
+        if not request.user.is_authenticated:
+            return Response({"desde": desde, "hasta": hasta, "eventos": []})
 
         causa = request.query_params.get("causa")
-        if causa:
-            qs = qs.filter(causa_id=causa)
-
-        qs = qs.filter(
-            models.Q(fecha__range=(desde, hasta)) |
-            models.Q(plazo_limite__range=(desde, hasta))
-        ).order_by("plazo_limite", "fecha", "id")
+        qs = proximos_eventos(
+            request.user, desde, hasta,
+            causa_id=int(causa) if causa and causa.isdigit() else None,
+            solo_con_plazo=request.query_params.get("solo_con_plazo") in {"1", "true", "True"},
+        )
 
         data = EventoProcesalSerializer(qs, many=True).data
         return Response({"desde": desde, "hasta": hasta, "eventos": data})
 
+    # /api/eventos/agenda/?dias=30&formato=ics
+    @extend_schema(
+        summary="Agenda de vencimientos (JSON / iCal)",
+        description=(
+            "Fechas de eventos y plazos límite de todas las causas del usuario en los próximos `dias` días. "
+            "`formato=ics` devuelve un calendario iCalendar para suscribirse desde Google/Outlook; "
+            "por defecto JSON."
+        ),
+        parameters=[
+            OpenApiParameter("dias", OpenApiTypes.INT, OpenApiParameter.QUERY, description="Días hacia adelante (default 30)"),
+            OpenApiParameter("causa", OpenApiTypes.INT, OpenApiParameter.QUERY, description="Filtrar por ID de causa"),
+            OpenApiParameter("solo_con_plazo", OpenApiTypes.BOOL, OpenApiParameter.QUERY, description="1/true para solo eventos con plazo definido"),
+            OpenApiParameter("formato", OpenApiTypes.STR, OpenApiParameter.QUERY, enum=["json", "ics"]),
+        ],
+        responses={200: OpenApiTypes.OBJECT},
+    )
+    @action(detail=False, methods=["get"], url_path="agenda", permission_classes=[permissions.IsAuthenticated])
+    def agenda(self, request):
+        try:
+            dias = int(request.query_params.get("dias", 30))
+        except ValueError:
+            dias = 30
+        hoy = date.today()
+        hasta = hoy + timedelta(days=dias)
+
+        causa = request.query_params.get("causa")
+        qs = vencimientos(
+            request.user, hoy, hasta,
+            causa_id=int(causa) if causa and causa.isdigit() else None,
+            solo_con_plazo=request.query_params.get("solo_con_plazo") in {"1", "true", "True"},
+        )
+
+        if request.query_params.get("formato") == "ics":
+            resp = HttpResponse(exportar_ical(qs), content_type="text/calendar; charset=utf-8")
+            resp["Content-Disposition"] = 'attachment; filename="agenda.ics"'
+            return resp
+        return Response({"desde": hoy, "hasta": hasta, "vencimientos": exportar_json(qs)})
+
 # Resto de viewsets (con filtros básicos para comodidad)
 
 class ParteFilter(dj_filters.FilterSet):
@@ -1126,31 +1224,11 @@ class DocumentoViewSet(viewsets.ModelViewSet):
 
 
 # Crear Causa desde Documento (usando AWS Textract + OpenAI) y SUMANDO ML
-import pickle
-from pathlib import Path
 from datetime import date, timedelta
 from tasks.models import Task
-# ========== CARGA DEL MODELO ML ==========
-ML_MODELS_PATH = Path(__file__).parent / 'ml_models'
-VECTORIZER = None
-CLASIFICADOR = None
-
-def cargar_modelos_ml():
-    """Carga los modelos ML una sola vez"""
-    global VECTORIZER, CLASIFICADOR
-    
-    if VECTORIZER is None or CLASIFICADOR is None:
-        try:
-            with open(ML_MODELS_PATH / 'vectorizer.pkl', 'rb') as f:
-                VECTORIZER = pickle.load(f)
-            with open(ML_MODELS_PATH / 'clasificador.pkl', 'rb') as f:
-                CLASIFICADOR = pickle.load(f)
-            print("✅ Modelos ML cargados correctamente")
-        except FileNotFoundError:
-            print("⚠️ Modelos ML no encontrados en ml_models/")
-            return None, None
-    
-    return VECTORIZER, CLASIFICADOR
+from .clasificador import servicio as clasificador_etapas
+# ========== MODELO ML ==========
+# Los modelos se cargan al arrancar el proceso (ver causa/clasificador.py y CausaConfig.ready)
 
 
 # ========== MAPEO DE ETAPAS ML A ESTADOS DE CAUSA ==========
@@ -1421,120 +1499,6 @@ EVENTOS_POR_ETAPA = {
 
 
 
-def generar_grafo_simple(causa):
-    """
-    Genera grafo con solo eventos y partes de la causa
-    
-    Args:
-        causa: Instancia de Causa
-    
-    Returns:
-        dict - Estructura de grafo con nodes y edges
-    """
-    
-    nodes = []
-    edges = []
-    
-    # ========== NODOS: PARTES ==========
-    partes = causa.partes.all()  # CausaParte
-    
-    for idx, causa_parte in enumerate(partes):
-        parte = causa_parte.parte
-        
-        node_id = f"P{idx + 1}"
-        
-        nodes.append({
-            "id": node_id,
-            "label": parte.nombre_razon_social,
-            "type": "PERSONA" if parte.tipo_persona == 'F' else "ORGANIZACION",
-            "role": "Parte"  # Puedes agregar rol_parte si lo tienes en CausaParte
-        })
-    
-    # ========== NODOS: EVENTOS ==========
-    eventos = causa.eventos.all().order_by('fecha')  # EventoProcesal
-    
-    for idx, evento in enumerate(eventos):
-        node_id = f"E{idx + 1}"
-        
-        # Determinar tipo de evento por palabras clave
-        titulo_lower = evento.titulo.lower()
-        
-        if any(word in titulo_lower for word in ['audiencia', 'comparendo']):
-            tipo_evento = "AUDIENCIA"
-        elif any(word in titulo_lower for word in ['plazo', 'vencimiento', 'límite']):
-            tipo_evento = "PLAZO_CRITICO"
-        elif any(word in titulo_lower for word in ['presentación', 'demanda', 'contestación']):
-            tipo_evento = "PRESENTACION"
-        else:
-            tipo_evento = "EVENTO"
-        
-        nodes.append({
-            "id": node_id,
-            "label": f"{evento.titulo} ({evento.fecha})",
-            "type": tipo_evento,
-            "fecha": str(evento.fecha),
-            "tiene_plazo": evento.plazo_limite is not None
-        })
-    
-    # ========== RELACIONES: EVENTOS CONSECUTIVOS ==========
-    # Conectar eventos en orden cronológico
-    evento_ids = [f"E{i+1}" for i in range(len(eventos))]
-    
-    for i in range(len(evento_ids) - 1):
-        edges.append({
-            "from": evento_ids[i],
-            "to": evento_ids[i + 1],
-            "label": "precede"
-        })
-    
-    # ========== RELACIONES: PARTES → PRIMER/ÚLTIMO EVENTO ==========
-    # Conectar partes con el primer y último evento (opcional)
-    if len(evento_ids) > 0 and len(partes) > 0:
-        # Primera parte (actor) → primer evento
-        edges.append({
-            "from": "P1",
-            "to": evento_ids[0],
-            "label": "inicia"
-        })
-        
-        # Si hay segunda parte (demandado) → eventos intermedios
-        if len(partes) > 1 and len(evento_ids) > 1:
-            edges.append({
-                "from": "P2",
-                "to": evento_ids[len(evento_ids)//2],  # Evento del medio
-                "label": "participa"
-            })
-    
-    return {
-        "nodes": nodes,
-        "edges": edges
-    }
-
-
-def crear_grafo_simple(causa):
-    """
-    Crea o actualiza el grafo de una causa (versión simple)
-    """
-    from .models import CausaGrafo
-    
-    # Generar estructura del grafo
-    grafo_data = generar_grafo_simple(causa)
-    
-    # Crear o actualizar CausaGrafo
-    grafo, created = CausaGrafo.objects.get_or_create(
-        causa=causa,
-        defaults={'data': grafo_data}
-    )
-    
-    if not created:
-        grafo.data = grafo_data
-        grafo.save()
-    
-    return grafo
-
-
-
-
 # ========== FUNCIÓN DE CLASIFICACIÓN ML ==========
 def clasificar_documento_ml(texto_documento):
     """
@@ -1543,9 +1507,8 @@ def clasificar_documento_ml(texto_documento):
     Returns:
         dict con etapa, confianza, eventos y tasks
     """
-    vectorizer, clf = cargar_modelos_ml()
-    
-    if vectorizer is None or clf is None:
+    clasificador = clasificador_etapas()
+    if not clasificador.cargar():
         return {
             'etapa': 'desconocido',
             'confianza': 0.0,
@@ -1553,11 +1516,10 @@ def clasificar_documento_ml(texto_documento):
         }
     
     try:
-        # Clasificar
-        texto_vec = vectorizer.transform([texto_documento.lower()])
-        etapa_predicha = clf.predict(texto_vec)[0]
-        probabilidades = clf.predict_proba(texto_vec)[0]
-        confianza = max(probabilidades)
+        # Clasificar (un solo predict_proba, resultado cacheado por hash del texto)
+        resultado = clasificador.classify(texto_documento)
+        etapa_predicha = resultado['etapa']
+        confianza = resultado['confianza']
         
         # Obtener configuración de la etapa
         config_etapa = EVENTOS_POR_ETAPA.get(etapa_predicha, EVENTOS_POR_ETAPA['desconocido'])
@@ -1810,11 +1772,12 @@ class CausaDesdeDocumentoView(APIView):
 
             try:
                 cliente_ia = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
-                respuesta_ia = cliente_ia.chat.completions.create(
-                    model="gpt-4o",
-                    messages=[{"role": "user", "content": prompt}],
-                    response_format={"type": "json_object"}  
-                )
+                with liberar_conexion_db():
+                    respuesta_ia = cliente_ia.chat.completions.create(
+                        model="gpt-4o",
+                        messages=[{"role": "user", "content": prompt}],
+                        response_format={"type": "json_object"}  
+                    )
                 
                 raw_content = respuesta_ia.choices[0].message.content
                 json_start = raw_content.find('{')
@@ -1875,7 +1838,9 @@ class CausaDesdeDocumentoView(APIView):
                 archivo=archivo,
                 titulo=titulo_sin_extension,
                 mime=archivo_content_type,
-                size=archivo_size
+                size=archivo_size,
+                etapa_ml=resultado_ml['etapa'] if resultado_ml else "",
+                etapa_confianza=resultado_ml['confianza'] if resultado_ml else None,
             )
 
             TrazabilityHelper.register_document_upload(
@@ -1889,9 +1854,10 @@ class CausaDesdeDocumentoView(APIView):
             if use_ml_bool and resultado_ml:
                 fecha_hoy = timezone.now().date()
                 
-                # Eventos pasados
+                # Eventos pasados (días hábiles hacia atrás según el calendario judicial)
                 for evento_config in resultado_ml['eventos_pasados']:
-                    fecha_evento = fecha_hoy - timedelta(days=evento_config.get('dias_antes', 0))
+                    dias_antes = evento_config.get('dias_antes', 0)
+                    fecha_evento = sumar_dias_habiles(fecha_hoy, -dias_antes, causa.jurisdiccion) if dias_antes else fecha_hoy
                     EventoProcesal.objects.create(
                         causa=causa,
                         titulo=evento_config['titulo'],
@@ -1910,14 +1876,18 @@ class CausaDesdeDocumentoView(APIView):
                 # Eventos actuales/futuros
                 for evento_config in resultado_ml['eventos_actuales']:
                     plazo_dias = evento_config.get('plazo_dias', 7)
-                    fecha_evento = fecha_hoy + timedelta(days=plazo_dias)
+                    # Los plazos procesales corren en días hábiles judiciales
+                    fecha_evento = sumar_dias_habiles(fecha_hoy, plazo_dias, causa.jurisdiccion)
+                    es_plazo = evento_config.get('es_plazo_limite')
                     
                     EventoProcesal.objects.create(
                         causa=causa,
                         titulo=evento_config['titulo'],
                         descripcion=evento_config['descripcion'],
                         fecha=fecha_evento,
-                        plazo_limite=fecha_evento if evento_config.get('es_plazo_limite') else None
+                        plazo_limite=fecha_evento if es_plazo else None,
+                        plazo_desde=fecha_hoy if es_plazo else None,
+                        plazo_dias_habiles=plazo_dias if es_plazo else None,
                     )
                     confianza=f"{resultado_ml['confianza']:.0%}"
                     TrazabilityHelper.register_evento_create(
@@ -1933,7 +1903,7 @@ class CausaDesdeDocumentoView(APIView):
                 
                 for task_config in resultado_ml.get('tasks', []):
                     deadline_dias = task_config.get('deadline_dias', 7)
-                    deadline = fecha_hoy + timedelta(days=deadline_dias)
+                    deadline = sumar_dias_habiles(fecha_hoy, deadline_dias, causa.jurisdiccion)
                     
                     task= Task.objects.create(
                         causa=causa,
@@ -1979,8 +1949,9 @@ class CausaDesdeDocumentoView(APIView):
             
             
             # 10. Preparar respuesta
-
-            grafo = crear_grafo_simple(causa)
+            # El grafo se arma una sola vez con los deltas encolados por los signals;
+            # el callback de on_commit ya no tiene nada pendiente para esta causa.
+            procesar_deltas_grafo(causa.id)
 
             serializer_respuesta = CausaSerializer(causa)
             response_data = serializer_respuesta.data
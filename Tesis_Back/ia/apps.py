@@ -1,6 +1,35 @@
+import logging
+
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+
+def registrar_pgvector(sender, connection, **kwargs):
+    """
+    Registra el adaptador de pgvector en cada conexión nueva: los embeddings se
+    pasan como ndarray (binario con psycopg 3 + server_side_binding) en vez de un
+    literal de texto de 1536 floats. Si falla (p.ej. sin la extensión) se sigue
+    con literales; ver ia.retrieval._vector_param.
+    """
+    if connection.vendor != "postgresql":
+        return
+    try:
+        if connection.Database.__name__ == "psycopg":
+            from pgvector.psycopg import register_vector
+        else:
+            from pgvector.psycopg2 import register_vector
+        register_vector(connection.connection)
+        connection.pgvector_registrado = True
+    except Exception as e:
+        connection.pgvector_registrado = False
+        logger.warning("No se pudo registrar el adaptador de pgvector: %s", e)
 
 
 class IaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ia'
+
+    def ready(self):
+        connection_created.connect(registrar_pgvector, dispatch_uid="ia.registrar_pgvector")
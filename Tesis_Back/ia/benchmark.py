@@ -0,0 +1,288 @@
+# ia/benchmark.py
+"""
+Benchmark offline de la recuperación (RAG de jurisprudencia).
+
+Carga un corpus (sintético y determinístico, o un JSONL de fixture) en
+JurisDocument/JurisChunk con el proveedor de embeddings "fake" (sin OpenAI) y
+repite un set de consultas por cada modo de búsqueda. Por modo reporta
+p50/p95 de latencia, filas escaneadas (EXPLAIN ANALYZE), recall@k y MRR; además
+el tamaño de la tabla y de cada índice (memoria de los layouts de vectores).
+
+Los documentos del benchmark se marcan con link_origen "bench://<id>" para
+poder borrarlos sin tocar el corpus real.
+"""
+import json
+import math
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from functools import partial
+from typing import Any, Callable, Dict, List
+
+from django.db import connection, transaction
+
+from .embeddings import FakeEmbeddings, set_provider
+from .rerank import recall_at_k
+
+BENCH_PREFIX = "bench://"
+
+TEMAS = {
+    "despido": ["despido", "indemnizacion", "antiguedad", "preaviso", "integracion", "injuria", "trabajador", "empleador"],
+    "accidente": ["accidente", "incapacidad", "aseguradora", "riesgos", "siniestro", "pericia", "medica", "reparacion"],
+    "alimentos": ["alimentos", "cuota", "progenitor", "menor", "necesidades", "ingresos", "provisoria", "incumplimiento"],
+    "danos": ["danos", "perjuicios", "responsabilidad", "culpa", "lucro", "cesante", "moral", "resarcimiento"],
+    "desalojo": ["desalojo", "locacion", "inmueble", "locatario", "canon", "vencimiento", "restitucion", "intimacion"],
+    "sucesion": ["sucesion", "herederos", "testamento", "causante", "legitima", "particion", "acervo", "declaratoria"],
+}
+FUERO_POR_TEMA = {
+    "despido": "Laboral", "accidente": "Laboral", "alimentos": "Familia",
+    "danos": "Civil", "desalojo": "Civil", "sucesion": "Civil",
+}
+RELLENO = [
+    "conforme", "surge", "autos", "resolver", "corresponde", "tribunal", "prueba", "analisis",
+    "sentencia", "instancia", "agravios", "recurso", "criterio", "doctrina", "planteo", "demanda",
+]
+SILABAS = ["ra", "mo", "ti", "ve", "lu", "sa", "qui", "ne", "bor", "dal", "fen", "gu", "zor", "pel"]
+
+
+# ---------- corpus y consultas sintéticas ----------
+def _nombre(rng: random.Random) -> str:
+    return "".join(rng.choice(SILABAS) for _ in range(3))
+
+
+def _oracion(rng: random.Random, palabras: List[str], n: int) -> str:
+    return " ".join(rng.choice(palabras) for _ in range(n)).capitalize() + "."
+
+
+def generar_corpus(n_docs: int = 200, seed: int = 7):
+    """
+    Devuelve (docs, consultas). Cada doc tiene un tema y dos nombres propios
+    únicos; su consulta combina términos del tema con esos nombres, así el doc
+    relevante está definido sin ambigüedad.
+    """
+    rng = random.Random(seed)
+    docs, consultas, usados = [], [], set()
+    temas = sorted(TEMAS)
+    for i in range(n_docs):
+        tema = temas[i % len(temas)]
+        nombres = []
+        while len(nombres) < 2:
+            nom = _nombre(rng)
+            if nom not in usados:
+                usados.add(nom)
+                nombres.append(nom)
+        vocab = TEMAS[tema] + RELLENO
+        sumario = f"Sumario\n{' '.join(TEMAS[tema][:3])} {nombres[0]} c {nombres[1]}. " + _oracion(rng, vocab, 25)
+        considerandos = "Considerandos\n" + " ".join(_oracion(rng, vocab, 18) for _ in range(8))
+        fallo = "Fallo\n" + _oracion(rng, RELLENO, 20)
+        doc_id = f"b{seed}-{i:05d}"
+        docs.append({
+            "id": doc_id,
+            "title": f"{nombres[0].capitalize()} c/ {nombres[1].capitalize()} s/ {tema}",
+            "url": BENCH_PREFIX + doc_id,
+            "fuero": FUERO_POR_TEMA[tema],
+            "jurisdiction": rng.choice(["CABA", "Buenos Aires", "Córdoba"]),
+            "court": rng.choice(["Cámara Nacional", "Suprema Corte", "Juzgado de Primera Instancia"]),
+            "date": f"{rng.randint(2005, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "text": "\n".join([sumario, considerandos, fallo]),
+        })
+        terminos = rng.sample(TEMAS[tema][:3], 2)
+        anio = docs[-1]["date"][:4]
+        consultas.append({
+            "query": f"{terminos[0]} {terminos[1]} {nombres[0]} {nombres[1]}",
+            "relevant": [doc_id],
+            "fuero": FUERO_POR_TEMA[tema],
+            # Rango angosto (el año del doc) para medir la poda por fecha
+            "desde": f"{anio}-01-01",
+            "hasta": f"{anio}-12-31",
+        })
+    return docs, consultas
+
+
+def leer_jsonl(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(l) for l in f if l.strip()]
+
+
+# ---------- carga / limpieza ----------
+def cargar_corpus(docs: List[Dict[str, Any]]) -> Dict[str, str]:
+    """
+    Ingesta los docs por el mismo camino que los JSONL reales (ingest_from_jsonl_record)
+    con embeddings fake. Devuelve {id del fixture -> doc_id en la BD}.
+    """
+    from .ingest import ingest_from_jsonl_record
+
+    mapa = {}
+    anterior = set_provider(FakeEmbeddings())
+    try:
+        for d in docs:
+            rec = {**d, "url": d.get("url") or BENCH_PREFIX + d["id"]}
+            doc_id, _ = ingest_from_jsonl_record(rec)
+            mapa[d["id"]] = doc_id
+    finally:
+        set_provider(anterior)
+    with connection.cursor() as cur:
+        cur.execute("ANALYZE ia_jurisdocument; ANALYZE ia_jurischunk;")
+    return mapa
+
+
+def limpiar_corpus() -> int:
+    from .models import JurisDocument
+
+    borrados, _ = JurisDocument.objects.filter(link_origen__startswith=BENCH_PREFIX).delete()
+    return borrados
+
+
+# ---------- filas escaneadas ----------
+@contextmanager
+def capturar_sql():
+    """Registra (sql, params) de cada query ejecutada dentro del bloque."""
+    capturadas = []
+
+    def wrapper(execute, sql, params, many, context):
+        capturadas.append((sql, params))
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        yield capturadas
+
+
+def filas_escaneadas(plan: Any) -> int:
+    """Suma filas leídas por los nodos *Scan de un plan EXPLAIN (FORMAT JSON), incluidas las filtradas."""
+    if isinstance(plan, list):
+        return sum(filas_escaneadas(p) for p in plan)
+    if not isinstance(plan, dict):
+        return 0
+    nodo = plan.get("Plan", plan)
+    total = 0
+    if "Scan" in nodo.get("Node Type", ""):
+        loops = nodo.get("Actual Loops", 1) or 1
+        total += int((nodo.get("Actual Rows", 0)
+                      + nodo.get("Rows Removed by Filter", 0)
+                      + nodo.get("Rows Removed by Index Recheck", 0)) * loops)
+    for hijo in nodo.get("Plans", []):
+        total += filas_escaneadas(hijo)
+    return total
+
+
+def explicar(queries) -> int:
+    """
+    Re-ejecuta con EXPLAIN ANALYZE las queries capturadas de una búsqueda. Los SET
+    LOCAL (ef_search, iterative_scan) se repiten en la misma transacción para que
+    el plan sea el de la búsqueda real.
+    """
+    total = 0
+    with transaction.atomic(), connection.cursor() as cur:
+        for sql, params in queries:
+            if sql.lstrip().upper().startswith("SET "):
+                cur.execute(sql, params)
+                continue
+            cur.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + sql.strip().rstrip(";"), params)
+            plan = cur.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            total += filas_escaneadas(plan)
+    return total
+
+
+# ---------- métricas ----------
+def percentil(valores: List[float], p: float) -> float:
+    """Percentil por rango más cercano (p en 0..100)."""
+    if not valores:
+        return 0.0
+    orden = sorted(valores)
+    idx = max(0, min(len(orden) - 1, math.ceil(p / 100 * len(orden)) - 1))
+    return orden[idx]
+
+
+def reciprocal_rank(doc_ids: List[str], relevantes: set) -> float:
+    for i, d in enumerate(doc_ids, start=1):
+        if d in relevantes:
+            return 1.0 / i
+    return 0.0
+
+
+# ---------- memoria ----------
+def tamanos() -> Dict[str, int]:
+    """Bytes de la tabla de chunks (heap + TOAST) y de cada uno de sus índices."""
+    with connection.cursor() as cur:
+        cur.execute("SELECT pg_table_size('ia_jurischunk')")
+        out = {"ia_jurischunk": cur.fetchone()[0]}
+        cur.execute(
+            "SELECT indexrelname, pg_relation_size(indexrelid) FROM pg_stat_user_indexes "
+            "WHERE relname = 'ia_jurischunk' ORDER BY 1"
+        )
+        out.update(dict(cur.fetchall()))
+    return out
+
+
+# ---------- modos ----------
+def _rango(c, fechas):
+    return {"desde": c.get("desde"), "hasta": c.get("hasta")} if fechas else {}
+
+
+def _flexible(q, k, emb, c, min_score, modo="exacto", fechas=False):
+    from .retrieval import search_chunks
+    return search_chunks(q, k=k, fuero=c.get("fuero"), emb=emb, rerank=False, modo=modo, **_rango(c, fechas))
+
+
+def _estricta(q, k, emb, c, min_score, modo="exacto", rerank=False, fechas=False):
+    from .retrieval import search_chunks_strict
+    return search_chunks_strict(q, k=k, fuero=c.get("fuero"), min_score=min_score, emb=emb,
+                                rerank=rerank, modo=modo, **_rango(c, fechas))["hits"]
+
+
+# nombre -> fn(query, k, emb, consulta, min_score) -> hits. Los modos nuevos se registran acá.
+MODOS: Dict[str, Callable] = {
+    "flexible": _flexible,
+    "estricta": _estricta,
+    "estricta_rerank": partial(_estricta, rerank=True),
+    "flexible_compacto": partial(_flexible, modo="compacto"),
+    "estricta_compacta": partial(_estricta, modo="compacto"),
+    "flexible_binario": partial(_flexible, modo="binario"),
+    "estricta_binaria": partial(_estricta, modo="binario"),
+    "flexible_fecha": partial(_flexible, fechas=True),
+    "estricta_fecha": partial(_estricta, fechas=True),
+}
+
+
+def correr(consultas: List[Dict[str, Any]], modos: List[str] = None, k: int = 8,
+           min_score: float = 0.0, mapa: Dict[str, str] = None, explain: bool = True) -> Dict[str, Any]:
+    """
+    Repite `consultas` por cada modo. `mapa` traduce los ids de `relevant` a doc_id
+    de la BD (si el corpus se cargó con cargar_corpus). `min_score` va en 0 por
+    defecto: el coseno de los embeddings fake no está en la escala de OpenAI.
+    """
+    mapa = mapa or {}
+    fake = FakeEmbeddings()
+    embs = fake.embed([c["query"] for c in consultas])
+    anterior = set_provider(fake)
+    resultados = {}
+    try:
+        for modo in modos or list(MODOS):
+            fn = MODOS[modo]
+            ms, filas, recalls, rrs = [], [], [], []
+            for c, emb in zip(consultas, embs):
+                relevantes = {mapa.get(r, r) for r in c.get("relevant") or []}
+                with capturar_sql() as queries:
+                    t = time.perf_counter()
+                    hits = fn(c["query"], k, emb, c, min_score)
+                    ms.append((time.perf_counter() - t) * 1000)
+                if explain:
+                    filas.append(explicar(queries))
+                doc_ids = list(dict.fromkeys(h["doc_id"] for h in hits))
+                if relevantes:
+                    recalls.append(recall_at_k(doc_ids, relevantes, k))
+                    rrs.append(reciprocal_rank(doc_ids, relevantes))
+            resultados[modo] = {
+                "consultas": len(consultas),
+                "p50_ms": round(percentil(ms, 50), 2),
+                "p95_ms": round(percentil(ms, 95), 2),
+                "filas_p50": int(statistics.median(filas)) if filas else None,
+                f"recall@{k}": round(statistics.mean(recalls), 4) if recalls else None,
+                "mrr": round(statistics.mean(rrs), 4) if rrs else None,
+            }
+    finally:
+        set_provider(anterior)
+    return resultados
@@ -1,9 +1,37 @@
 # ia/embeddings.py
+"""
+Embeddings con proveedores intercambiables.
+
+- "openai": text-embedding-3-small (1536 dims) vía API.
+- "local": modelo en CPU (p.ej. multilingual MiniLM, 384 dims), exportado a ONNX
+  (settings.EMBEDDINGS_ONNX_MODEL + tokenizer.json) o vía sentence-transformers.
+  Inferencia en lotes y en varios hilos; sin round-trip de red por consulta.
+- "fake": determinístico y local (hashing de términos), sin red. Para tests y
+  benchmarks: textos que comparten palabras quedan cerca en coseno.
+
+Cada proveedor expone `model` y `dim`: se guardan por chunk (embedding_model /
+embedding_dim) y la búsqueda filtra por el modelo activo, con un índice HNSW
+parcial por modelo (ver el comando `embeddings_indices`).
+
+Se elige con settings.EMBEDDINGS_PROVIDER (o un dotted path); `set_provider`
+lo reemplaza en caliente (tests / management commands).
+"""
+import hashlib
 import os
+import re
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.utils.module_loading import import_string
 from openai import OpenAI
 
 DEFAULT_EMBED_MODEL = "text-embedding-3-small"  # 1536 dims
+DEFAULT_EMBED_DIM = 1536
 
 @lru_cache(maxsize=1)
 def _client():
@@ -14,21 +42,242 @@ def _as_list(texts):
         return list(texts)
     return [texts]
 
-def embed_texts(texts, model: str = DEFAULT_EMBED_MODEL):
+
+# ---------- proveedores ----------
+class OpenAIEmbeddings:
+    nombre = "openai"
+
+    def __init__(self, model: str = DEFAULT_EMBED_MODEL, dim: int = DEFAULT_EMBED_DIM):
+        self.model = model
+        self.dim = dim
+
+    def embed(self, items, model: str = None):
+        """
+        Devuelve una lista de vectores (uno por texto).
+        Compatible con openai>=1.x/2.x
+        """
+        client = _client()
+        # Lotes por si tenés muchos textos
+        BATCH = int(os.getenv("EMBED_BATCH", "64"))
+        out = []
+        for i in range(0, len(items), BATCH):
+            chunk = items[i:i+BATCH]
+            resp = client.embeddings.create(model=model or self.model, input=chunk)
+            out.extend([d.embedding for d in resp.data])
+        return out
+
+
+class FakeEmbeddings:
+    """
+    Vectores determinísticos por feature hashing: cada término (sin acentos, en
+    minúscula) suma ±1 en una coordenada elegida por blake2b; se normaliza a norma 1.
+    Mismo texto -> mismo vector en cualquier proceso/máquina.
+    """
+    nombre = "fake"
+    model = "fake-hashing-v1"
+
+    def __init__(self, dim: int = DEFAULT_EMBED_DIM):
+        self.dim = dim
+
+    def _vector(self, text: str) -> list:
+        t = unicodedata.normalize("NFKD", (text or "").lower()).encode("ascii", "ignore").decode()
+        v = np.zeros(self.dim, dtype=np.float64)
+        for w in re.findall(r"\w+", t):
+            h = int.from_bytes(hashlib.blake2b(w.encode(), digest_size=8).digest(), "little")
+            v[h % self.dim] += 1.0 if (h >> 63) & 1 else -1.0
+        n = np.linalg.norm(v)
+        if n == 0:
+            v[0] = 1.0
+            n = 1.0
+        return (v / n).tolist()
+
+    def embed(self, items, model: str = None):
+        return [self._vector(t) for t in items]
+
+
+class LocalEmbeddings:
     """
-    Devuelve una lista de vectores (uno por texto).
-    Compatible con openai>=1.x/2.x
+    Encoder de oraciones en CPU. Con settings.EMBEDDINGS_ONNX_MODEL usa onnxruntime
+    (mean pooling + normalización L2, lotes repartidos en EMBEDDINGS_THREADS hilos:
+    session.run suelta el GIL); si no, sentence-transformers con
+    settings.EMBEDDINGS_LOCAL_MODEL. Ninguno de los dos es dependencia obligatoria.
     """
-    client = _client()
-    items = _as_list(texts)
-    # Lotes por si tenés muchos textos
-    BATCH = int(os.getenv("EMBED_BATCH", "64"))
-    out = []
-    for i in range(0, len(items), BATCH):
-        chunk = items[i:i+BATCH]
-        resp = client.embeddings.create(model=model, input=chunk)
-        out.extend([d.embedding for d in resp.data])
-    return out
+    nombre = "local"
+
+    def __init__(self, model: str = None, dim: int = None, onnx_path: str = None):
+        self.onnx_path = onnx_path if onnx_path is not None else getattr(settings, "EMBEDDINGS_ONNX_MODEL", "")
+        self.model_name = model or getattr(
+            settings, "EMBEDDINGS_LOCAL_MODEL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+        )
+        # Nombre que se guarda por chunk: identifica modelo (y export) para filtrar e indexar
+        self.model = getattr(settings, "EMBEDDINGS_LOCAL_NAME", "") or (
+            Path(self.onnx_path).parent.name if self.onnx_path else self.model_name.split("/")[-1]
+        )
+        self.dim = int(dim or getattr(settings, "EMBEDDINGS_LOCAL_DIM", 384))
+        self.batch = int(getattr(settings, "EMBEDDINGS_LOCAL_BATCH", 32))
+        self.threads = int(getattr(settings, "EMBEDDINGS_THREADS", 4))
+        self._impl = None
+        self._lock = threading.Lock()
+
+    def _cargar(self):
+        if self._impl is None:
+            with self._lock:
+                if self._impl is None:
+                    self._impl = self._cargar_onnx() if self.onnx_path else self._cargar_st()
+        return self._impl
+
+    def _cargar_st(self):
+        from sentence_transformers import SentenceTransformer
+
+        st = SentenceTransformer(self.model_name, device="cpu")
+        return lambda items: st.encode(items, batch_size=self.batch, normalize_embeddings=True)
+
+    def _cargar_onnx(self):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        path = Path(self.onnx_path)
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = 1 if self.threads > 1 else 0  # el paralelismo lo dan los lotes
+        session = ort.InferenceSession(str(path), sess_options=opts, providers=["CPUExecutionProvider"])
+        tok = Tokenizer.from_file(str(path.with_name("tokenizer.json")))
+        tok.enable_truncation(max_length=int(getattr(settings, "EMBEDDINGS_MAX_LENGTH", 256)))
+        tok.enable_padding()
+        inputs = {i.name for i in session.get_inputs()}
+
+        def lote(items):
+            enc = tok.encode_batch(items)
+            mask = np.array([e.attention_mask for e in enc], dtype=np.int64)
+            feed = {"input_ids": np.array([e.ids for e in enc], dtype=np.int64), "attention_mask": mask}
+            if "token_type_ids" in inputs:
+                feed["token_type_ids"] = np.array([e.type_ids for e in enc], dtype=np.int64)
+            hidden = session.run(None, {k: v for k, v in feed.items() if k in inputs})[0]
+            m = mask[:, :, None].astype(np.float32)
+            pooled = (hidden * m).sum(axis=1) / np.maximum(m.sum(axis=1), 1e-9)
+            return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+        pool = ThreadPoolExecutor(max_workers=max(1, self.threads), thread_name_prefix="embed")
+
+        def encode(items):
+            lotes = [items[i:i + self.batch] for i in range(0, len(items), self.batch)]
+            if len(lotes) == 1:
+                return lote(lotes[0])
+            return np.vstack(list(pool.map(lote, lotes)))
+
+        return encode
+
+    def embed(self, items, model: str = None):
+        if not items:
+            return []
+        vecs = np.asarray(self._cargar()(list(items)), dtype=np.float32)
+        if vecs.shape[1] != self.dim:
+            raise ValueError(f"El modelo {self.model} devuelve {vecs.shape[1]} dims y se esperaban {self.dim}")
+        return vecs.tolist()
+
 
-def embed_query(q: str, model: str = DEFAULT_EMBED_MODEL):
+PROVIDERS = {"openai": OpenAIEmbeddings, "local": LocalEmbeddings, "fake": FakeEmbeddings}
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider():
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                nombre = getattr(settings, "EMBEDDINGS_PROVIDER", "openai")
+                clase = PROVIDERS.get(nombre) or import_string(nombre)
+                _provider = clase()
+    return _provider
+
+
+def set_provider(provider):
+    """Reemplaza el proveedor del proceso (p.ej. `set_provider(FakeEmbeddings())`). Devuelve el anterior."""
+    global _provider
+    anterior, _provider = _provider, provider
+    return anterior
+
+
+# ---------- API ----------
+def embed_texts(texts, model: str = None):
+    """Devuelve una lista de vectores (uno por texto)."""
+    return get_provider().embed(_as_list(texts), model=model)
+
+def embed_query(q: str, model: str = None):
     return embed_texts([q], model=model)[0]
+
+
+# ---------- representación compacta (Matryoshka + halfvec) ----------
+def compact_dim(dim: int) -> int:
+    """Dims de `embedding_compact` para un vector de `dim` (settings.EMBEDDINGS_COMPACT_DIM, 0 = sin compactar)."""
+    c = int(getattr(settings, "EMBEDDINGS_COMPACT_DIM", 512) or 0)
+    return min(c, dim) if c > 0 else dim
+
+
+def compactar(vec, dim: int = None) -> list:
+    """
+    Primeras `dim` coordenadas renormalizadas. Los text-embedding-3 están entrenados
+    tipo Matryoshka: el prefijo conserva la mayor parte de la señal. Se guarda como
+    halfvec (float16), así que el índice ocupa ~1/6 del de vector(1536).
+    """
+    v = np.asarray(vec, dtype=np.float32)[: dim or compact_dim(len(vec))]
+    n = np.linalg.norm(v)
+    return (v / n if n > 0 else v).tolist()
+
+
+# ---------- índices por modelo ----------
+# tipo -> (prefijo del nombre, expresión indexada, operator class). Las expresiones
+# tienen que coincidir con las de ia/retrieval.py (_knn_sql) para que el planner use
+# el índice. "binario": signo de cada coordenada (bit(dim)) con distancia de Hamming;
+# es índice de expresión, así que los bits viven solo en el índice y no en el heap.
+TIPOS_INDICE = {
+    "completo": ("ia_jc_hnsw", "embedding::vector({dim})", "vector_cosine_ops"),
+    "compacto": ("ia_jc_hnswc", "embedding_compact::halfvec({dim})", "halfvec_cosine_ops"),
+    "binario": ("ia_jc_hnswb", "binary_quantize(embedding::vector({dim}))::bit({dim})", "bit_hamming_ops"),
+}
+
+
+def _slug(valor: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", valor.lower()).strip("_")
+
+
+def nombre_indice(model: str, dim: int, tipo: str = "completo", fuero: str = None) -> str:
+    slug = _slug(model)
+    prefijo = TIPOS_INDICE[tipo][0]
+    sufijo = f"_f_{_slug(fuero)}" if fuero else ""
+    nombre = f"{prefijo}_{slug}_{dim}{sufijo}"
+    if len(nombre) > 63:  # límite de identificadores de Postgres
+        h = hashlib.sha1(f"{model}|{dim}|{fuero or ''}".encode()).hexdigest()[:8]
+        nombre = f"{prefijo}_{slug[:24]}_{dim}{sufijo[:14]}_{h}"
+    return nombre
+
+
+def expresion_indice(tipo: str, dim: int, alias: str = "") -> str:
+    expr = TIPOS_INDICE[tipo][1].format(dim=int(dim))
+    return expr.replace("embedding", f"{alias}.embedding") if alias else expr
+
+
+def sql_indice(model: str, dim: int, concurrently: bool = False, tipo: str = "completo",
+               fuero: str = None) -> tuple:
+    """
+    (sql, params) del índice HNSW parcial de tipo `tipo` para los chunks de `model`.
+    Con `fuero` (ya normalizado, como en jc.fuero_norm) el índice cubre solo ese
+    fuero: las búsquedas filtradas por fuero recorren un grafo sin vecinos de otros
+    fueros y no se quedan cortas de resultados.
+    """
+    _, _, ops = TIPOS_INDICE[tipo]
+    # Literales y no parámetros: el predicado del índice parcial tiene que ser constante
+    # y DDL no admite parámetros con server_side_binding (psycopg 3)
+    where = f"embedding_model = {_literal(model)}"
+    if fuero:
+        where += f" AND fuero_norm = {_literal(fuero)}"
+    sql = (
+        f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {nombre_indice(model, dim, tipo, fuero)} "
+        f"ON ia_jurischunk USING hnsw (({expresion_indice(tipo, dim)}) {ops}) "
+        f"WHERE {where}"
+    )
+    return sql, []
+
+
+def _literal(valor: str) -> str:
+    return "'" + str(valor).replace("'", "''") + "'"
@@ -1,6 +1,7 @@
 import os
 from django.conf import settings
 from openai import OpenAI, AzureOpenAI
+from tesis_api.db import liberar_conexion_db
 
 def _client():
     return OpenAI(api_key=settings.OPENAI_API_KEY)
@@ -10,5 +11,6 @@ def chat(model: str, messages: list, max_tokens: int, response_format=None, temp
     kwargs = {"model": model, "messages": messages, "max_tokens": max_tokens, "temperature": temperature}
     if response_format:
         kwargs["response_format"] = response_format  # p.ej. {"type":"json_object"}
-    resp = client.chat.completions.create(**kwargs)
+    with liberar_conexion_db():
+        resp = client.chat.completions.create(**kwargs)
     return resp.choices[0].message.content
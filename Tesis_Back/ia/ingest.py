@@ -3,8 +3,8 @@ import boto3
 from bs4 import BeautifulSoup
 from django.db import transaction
 from django.core.exceptions import ValidationError
-from .models import JurisDocument, JurisChunk
-from .embeddings import embed_texts
+from .models import JurisDocument, JurisChunk, normalizar_metadato
+from .embeddings import compactar, embed_texts, get_provider
 import gzip
 
 from datetime import datetime, date
@@ -173,13 +173,17 @@ def ingest_from_metadata(metadata_key: str):
     # Embeddings (en lote)
     texts = [c[1] for c in chunks]
     embs = embed_texts(texts)
+    provider = get_provider()
 
     JurisChunk.objects.filter(doc_id=doc_id).delete()
     objs = []
     for i, ((section, txt, a, b), e) in enumerate(zip(chunks, embs)):
         objs.append(JurisChunk(
             doc_id=doc_id, chunk_id=i, section=section[:64],
-            text=txt, span_start=a, span_end=b, embedding=e
+            text=txt, span_start=a, span_end=b, embedding=e,
+            embedding_model=provider.model, embedding_dim=len(e), embedding_compact=compactar(e),
+            fuero_norm=normalizar_metadato(jd.fuero), jurisdiccion_norm=normalizar_metadato(jd.jurisdiccion),
+            fecha=jd.fecha
         ))
     JurisChunk.objects.bulk_create(objs, batch_size=500)
 
@@ -223,11 +227,15 @@ def ingest_from_jsonl_record(rec: dict):
 
     texts = [c[1] for c in chunks]
     embs = embed_texts(texts)
+    provider = get_provider()
 
     JurisChunk.objects.filter(doc_id=doc_id).delete()
     objs = [
         JurisChunk(doc_id=doc_id, chunk_id=i, section=sec[:64],
-                   text=txt, span_start=a, span_end=b, embedding=e)
+                   text=txt, span_start=a, span_end=b, embedding=e,
+                   embedding_model=provider.model, embedding_dim=len(e), embedding_compact=compactar(e),
+                   fuero_norm=normalizar_metadato(fuero), jurisdiccion_norm=normalizar_metadato(jurisd),
+                   fecha=jd.fecha)
         for i, ((sec, txt, a, b), e) in enumerate(zip(chunks, embs))
     ]
     JurisChunk.objects.bulk_create(objs, batch_size=500)
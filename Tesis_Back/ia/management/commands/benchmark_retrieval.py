@@ -0,0 +1,71 @@
+import io
+import json
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from ia import benchmark
+from ia.embeddings import FakeEmbeddings
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark offline de la búsqueda: carga un corpus sintético (o --corpus JSONL) con embeddings "
+        "fake, repite las consultas por modo y reporta p50/p95, filas escaneadas, recall@k y MRR. "
+        "Necesita Postgres+pgvector; no usa OpenAI."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--docs", type=int, default=200, help="Documentos del corpus sintético")
+        parser.add_argument("--seed", type=int, default=7)
+        parser.add_argument("--corpus", help='JSONL de docs {"id","title","text","fuero",...} (en vez del sintético)')
+        parser.add_argument("--consultas", help='JSONL {"query","relevant":[id,...],"fuero"} (requerido con --corpus)')
+        parser.add_argument("--modos", default=",".join(benchmark.MODOS), help="Modos separados por coma")
+        parser.add_argument("--k", type=int, default=8)
+        parser.add_argument("--min-score", type=float, default=0.0)
+        parser.add_argument("--sin-explain", action="store_true", help="No correr EXPLAIN ANALYZE")
+        parser.add_argument("--conservar", action="store_true", help="No borrar el corpus al terminar")
+        parser.add_argument("--json", action="store_true")
+
+    def handle(self, *args, **opts):
+        modos = [m.strip() for m in opts["modos"].split(",") if m.strip()]
+        desconocidos = [m for m in modos if m not in benchmark.MODOS]
+        if desconocidos:
+            raise CommandError(f"Modos desconocidos: {', '.join(desconocidos)} (hay: {', '.join(benchmark.MODOS)})")
+
+        if opts["corpus"]:
+            if not opts["consultas"]:
+                raise CommandError("--consultas es obligatorio con --corpus")
+            docs, consultas = benchmark.leer_jsonl(opts["corpus"]), benchmark.leer_jsonl(opts["consultas"])
+        else:
+            docs, consultas = benchmark.generar_corpus(opts["docs"], seed=opts["seed"])
+            if opts["consultas"]:
+                consultas = benchmark.leer_jsonl(opts["consultas"])
+
+        benchmark.limpiar_corpus()
+        self.stdout.write(f"Cargando {len(docs)} documentos…")
+        mapa = benchmark.cargar_corpus(docs)
+        try:
+            # Índices HNSW parciales del modelo fake (completo, compacto y binario); solo ese
+            # modelo: no tocar los índices del corpus real
+            call_command("embeddings_indices", binario=True, modelo=[FakeEmbeddings.model],
+                         stdout=io.StringIO() if opts["json"] else self.stdout)
+            res = benchmark.correr(consultas, modos, k=opts["k"], min_score=opts["min_score"],
+                                   mapa=mapa, explain=not opts["sin_explain"])
+            tamanos = benchmark.tamanos()
+        finally:
+            if not opts["conservar"]:
+                benchmark.limpiar_corpus()
+
+        if opts["json"]:
+            self.stdout.write(json.dumps({"modos": res, "bytes": tamanos}, ensure_ascii=False))
+            return
+        k = opts["k"]
+        for modo, r in res.items():
+            self.stdout.write(
+                f"{modo:18s} p50={r['p50_ms']}ms p95={r['p95_ms']}ms filas={r['filas_p50']} "
+                f"recall@{k}={r[f'recall@{k}']} mrr={r['mrr']}"
+            )
+        for rel, b in tamanos.items():
+            self.stdout.write(f"{rel:50s} {b / 1024 / 1024:.1f} MB")
+        self.stdout.write(self.style.SUCCESS(f"Listo. {len(consultas)} consultas × {len(res)} modos"))
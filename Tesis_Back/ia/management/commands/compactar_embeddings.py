@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from ia.embeddings import compact_dim
+
+
+class Command(BaseCommand):
+    help = (
+        "Completa embedding_compact (prefijo Matryoshka renormalizado, halfvec) a partir de embedding, "
+        "por lotes de ids y en SQL. Después correr `embeddings_indices` para el índice compacto."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=5000)
+        parser.add_argument("--todos", action="store_true", help="Recalcular también los que ya tienen valor")
+
+    def handle(self, *args, **opts):
+        pendiente = "" if opts["todos"] else " AND embedding_compact IS NULL"
+        with connection.cursor() as cur:
+            cur.execute("SELECT COALESCE(MIN(id), 0), COALESCE(MAX(id), -1) FROM ia_jurischunk")
+            desde, hasta = cur.fetchone()
+            cur.execute("SELECT DISTINCT embedding_dim FROM ia_jurischunk")
+            dims = [r[0] for r in cur.fetchall()]
+
+        inicio, total = time.monotonic(), 0
+        for dim in dims:
+            cdim = compact_dim(dim)
+            for a in range(desde, hasta + 1, opts["batch"]):
+                with connection.cursor() as cur:
+                    # subvector/l2_normalize: pgvector >= 0.7
+                    cur.execute(
+                        f"UPDATE ia_jurischunk SET embedding_compact = "
+                        f"l2_normalize(subvector(embedding, 1, {int(cdim)}))::halfvec "
+                        f"WHERE embedding_dim = %s AND id >= %s AND id < %s{pendiente}",
+                        [dim, a, a + opts["batch"]],
+                    )
+                    total += cur.rowcount
+            self.stdout.write(f"dim={dim} -> {cdim}: {total} chunks ({time.monotonic() - inicio:.1f}s)")
+        self.stdout.write(self.style.SUCCESS(f"Listo. {total} chunks compactados"))
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+
+from ia.embeddings import compact_dim, nombre_indice, sql_indice
+from ia.models import JurisChunk
+
+
+class Command(BaseCommand):
+    help = (
+        "Crea (o lista) los índices HNSW parciales de cada (embedding_model, embedding_dim) presente en "
+        "ia_jurischunk: el de los vectores completos, el compacto (halfvec) si hay embedding_compact y, "
+        "con --binario, el binario (bit + Hamming). Con --por-fuero, además uno por cada fuero grande."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--listar", action="store_true", help="Solo mostrar modelos e índices")
+        parser.add_argument("--binario", action="store_true", help="Crear también el índice binario cuantizado")
+        parser.add_argument("--por-fuero", action="store_true", help="Índices parciales por fuero (vectores completos)")
+        parser.add_argument("--min-chunks", type=int, default=5000, help="Chunks mínimos de un fuero para indexarlo aparte")
+        parser.add_argument("--concurrently", action="store_true", help="CREATE INDEX CONCURRENTLY (sin bloquear escrituras)")
+        parser.add_argument("--modelo", action="append", help="Limitar a este embedding_model (repetible)")
+
+    def handle(self, *args, **opts):
+        qs = JurisChunk.objects.all()
+        if opts["modelo"]:
+            qs = qs.filter(embedding_model__in=opts["modelo"])
+        grupos = (qs.values("embedding_model", "embedding_dim")
+                  .annotate(n=Count("id"), compactos=Count("embedding_compact"))
+                  .order_by("embedding_model", "embedding_dim"))
+        with connection.cursor() as cur:
+            cur.execute("SELECT indexname FROM pg_indexes WHERE tablename = 'ia_jurischunk'")
+            existentes = {r[0] for r in cur.fetchall()}
+
+        for g in grupos:
+            modelo, dim, n = g["embedding_model"], g["embedding_dim"], g["n"]
+            indices = [(dim, "completo", None, n)]
+            if g["compactos"]:
+                indices.append((compact_dim(dim), "compacto", None, n))
+            if opts["binario"]:
+                indices.append((dim, "binario", None, n))
+            if opts["por_fuero"]:
+                fueros = (JurisChunk.objects.filter(embedding_model=modelo, embedding_dim=dim)
+                          .exclude(fuero_norm="").values("fuero_norm").annotate(n=Count("id"))
+                          .filter(n__gte=opts["min_chunks"]).order_by("-n"))
+                indices += [(dim, "completo", f["fuero_norm"], f["n"]) for f in fueros]
+            for d, tipo, fuero, n in indices:
+                nombre = nombre_indice(modelo, d, tipo, fuero)
+                if opts["listar"] or nombre in existentes:
+                    estado = "ok" if nombre in existentes else "FALTA"
+                    self.stdout.write(f"{modelo:40s} dim={d:<5d} chunks={n:<8d} {nombre} [{estado}]")
+                    continue
+                sql, params = sql_indice(modelo, d, concurrently=opts["concurrently"], tipo=tipo, fuero=fuero)
+                self.stdout.write(f"Creando {nombre} ({n} chunks)…")
+                with connection.cursor() as cur:
+                    cur.execute(sql, params)
+                self.stdout.write(self.style.SUCCESS(f"[OK] {nombre}"))
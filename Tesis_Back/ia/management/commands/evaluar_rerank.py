@@ -0,0 +1,75 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ia.embeddings import embed_query
+from ia.rerank import recall_at_k
+from ia.retrieval import search_chunks_strict
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara recall@K y latencia de la búsqueda estricta con y sin rerank sobre un set fijo. "
+        'El set es un JSONL con {"query": ..., "relevant": [doc_id, ...], "fuero": opcional}.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--eval-set", required=True, help="Ruta al JSONL de consultas")
+        parser.add_argument("--k", type=int, default=8)
+        parser.add_argument("--min-score", type=float, default=0.80, help="Umbral de la búsqueda sin rerank")
+        parser.add_argument("--scorer", default=None, help="features | onnx (default: settings.RERANK_SCORER)")
+        parser.add_argument("--json", action="store_true", help="Salida en JSON (para guardar la corrida)")
+
+    def handle(self, *args, **opts):
+        try:
+            with open(opts["eval_set"], encoding="utf-8") as f:
+                consultas = [json.loads(l) for l in f if l.strip()]
+        except (OSError, ValueError) as e:
+            raise CommandError(f"No se pudo leer el set de evaluación: {e}")
+        if not consultas:
+            raise CommandError("El set de evaluación está vacío")
+
+        k = opts["k"]
+
+        res = {"base": {"recall": [], "ms": []}, "rerank": {"recall": [], "ms": [], "rerank_ms": []}}
+        for c in consultas:
+            q = c["query"]
+            relevantes = set(c.get("relevant") or [])
+            emb = embed_query(q)  # el embedding se comparte: se mide solo búsqueda + rerank
+
+            t = time.perf_counter()
+            base = search_chunks_strict(q, k=k, fuero=c.get("fuero"), min_score=opts["min_score"],
+                                        emb=emb, rerank=False)["hits"]
+            res["base"]["ms"].append((time.perf_counter() - t) * 1000)
+
+            t = time.perf_counter()
+            out = search_chunks_strict(q, k=k, fuero=c.get("fuero"), min_score=opts["min_score"],
+                                       emb=emb, rerank=True, scorer=opts["scorer"], debug=True)
+            res["rerank"]["ms"].append((time.perf_counter() - t) * 1000)
+            res["rerank"]["rerank_ms"].append(((out["debug"].get("rerank") or {}).get("ms")) or 0.0)
+
+            if relevantes:
+                res["base"]["recall"].append(recall_at_k([h["doc_id"] for h in base], relevantes, k))
+                res["rerank"]["recall"].append(recall_at_k([h["doc_id"] for h in out["hits"]], relevantes, k))
+
+        resumen = {"consultas": len(consultas), "k": k}
+        for modo, d in res.items():
+            ms = sorted(d["ms"])
+            resumen[modo] = {
+                f"recall@{k}": round(statistics.mean(d["recall"]), 4) if d["recall"] else None,
+                "p50_ms": round(ms[len(ms) // 2], 2),
+                "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 2),
+            }
+        resumen["rerank"]["rerank_p50_ms"] = round(statistics.median(res["rerank"]["rerank_ms"]), 2)
+
+        if opts["json"]:
+            self.stdout.write(json.dumps(resumen, ensure_ascii=False))
+            return
+        for modo in ("base", "rerank"):
+            r = resumen[modo]
+            self.stdout.write(f"{modo:7s} recall@{k}={r[f'recall@{k}']}  p50={r['p50_ms']}ms  p95={r['p95_ms']}ms")
+        self.stdout.write(self.style.SUCCESS(
+            f"Listo. {len(consultas)} consultas; rerank p50={resumen['rerank']['rerank_p50_ms']}ms"
+        ))
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ia.embeddings import PROVIDERS, compactar, get_provider, set_provider
+from ia.models import JurisChunk
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-embebe los chunks con otro proveedor (openai | local | fake) y guarda embedding_model/dim. "
+        "Después correr `embeddings_indices` para crear el índice del modelo nuevo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--provider", required=True, help=f"Uno de: {', '.join(PROVIDERS)}")
+        parser.add_argument("--desde-modelo", help="Solo los chunks embebidos hoy con este modelo")
+        parser.add_argument("--batch", type=int, default=256)
+        parser.add_argument("--limit", type=int, default=0)
+
+    def handle(self, *args, **opts):
+        if opts["provider"] not in PROVIDERS:
+            raise CommandError(f"Proveedor desconocido: {opts['provider']}")
+        anterior = set_provider(PROVIDERS[opts["provider"]]())
+        try:
+            self._reembeber(get_provider(), opts)
+        finally:
+            set_provider(anterior)
+
+    def _reembeber(self, provider, opts):
+        qs = JurisChunk.objects.exclude(embedding_model=provider.model).order_by("id")
+        if opts["desde_modelo"]:
+            qs = qs.filter(embedding_model=opts["desde_modelo"])
+        ids = list(qs.values_list("id", flat=True))
+        if opts["limit"]:
+            ids = ids[: opts["limit"]]
+
+        inicio, hechos = time.monotonic(), 0
+        for i in range(0, len(ids), opts["batch"]):
+            lote = list(JurisChunk.objects.filter(id__in=ids[i:i + opts["batch"]]).only("id", "text"))
+            embs = provider.embed([c.text for c in lote])
+            for c, e in zip(lote, embs):
+                c.embedding, c.embedding_model, c.embedding_dim = e, provider.model, len(e)
+                c.embedding_compact = compactar(e)
+            JurisChunk.objects.bulk_update(lote, ["embedding", "embedding_model", "embedding_dim", "embedding_compact"])
+            hechos += len(lote)
+            self.stdout.write(f"{hechos}/{len(ids)} ({hechos / max(time.monotonic() - inicio, 1e-9):.0f} chunks/s)")
+        self.stdout.write(self.style.SUCCESS(f"Listo. {hechos} chunks con {provider.model}"))
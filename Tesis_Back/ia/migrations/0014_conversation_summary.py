@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ia', '0013_alter_conversation_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='summary',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='summary_watermark_id',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='summary_watermark_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
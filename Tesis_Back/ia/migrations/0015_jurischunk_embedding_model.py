@@ -0,0 +1,39 @@
+import pgvector.django.vector
+from django.db import migrations, models
+
+# Índice HNSW parcial de los chunks ya embebidos con OpenAI (mismo nombre/expresión que
+# ia.embeddings.sql_indice)
+INDICE_OPENAI = "ia_jc_hnsw_text_embedding_3_small_1536"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ia', '0014_conversation_summary'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='jurischunk',
+            name='embedding',
+            field=pgvector.django.vector.VectorField(),
+        ),
+        migrations.AddField(
+            model_name='jurischunk',
+            name='embedding_model',
+            field=models.CharField(db_index=True, default='text-embedding-3-small', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='jurischunk',
+            name='embedding_dim',
+            field=models.PositiveSmallIntegerField(default=1536),
+        ),
+        migrations.RunSQL(
+            sql=(
+                f"CREATE INDEX IF NOT EXISTS {INDICE_OPENAI} ON ia_jurischunk "
+                "USING hnsw ((embedding::vector(1536)) vector_cosine_ops) "
+                "WHERE embedding_model = 'text-embedding-3-small';"
+            ),
+            reverse_sql=f"DROP INDEX IF EXISTS {INDICE_OPENAI};",
+        ),
+    ]
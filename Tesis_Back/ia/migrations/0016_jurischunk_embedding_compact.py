@@ -0,0 +1,17 @@
+import pgvector.django.halfvec
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ia', '0015_jurischunk_embedding_model'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jurischunk',
+            name='embedding_compact',
+            field=pgvector.django.halfvec.HalfVectorField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,42 @@
+import unicodedata
+
+from django.db import migrations, models
+
+
+def _normalizar(valor):
+    # Copia congelada de ia.models.normalizar_metadato (al momento de esta migración)
+    t = unicodedata.normalize("NFKD", (valor or "").strip().lower()).encode("ascii", "ignore").decode()
+    return " ".join(t.split())
+
+
+def completar_metadatos(apps, schema_editor):
+    JurisDocument = apps.get_model("ia", "JurisDocument")
+    pares = JurisDocument.objects.values_list("fuero", "jurisdiccion").distinct()
+    with schema_editor.connection.cursor() as cur:
+        for fuero, jurisdiccion in pares:
+            cur.execute(
+                "UPDATE ia_jurischunk jc SET fuero_norm = %s, jurisdiccion_norm = %s "
+                "FROM ia_jurisdocument jd WHERE jd.doc_id = jc.doc_id AND jd.fuero = %s AND jd.jurisdiccion = %s",
+                [_normalizar(fuero), _normalizar(jurisdiccion), fuero, jurisdiccion],
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ia', '0016_jurischunk_embedding_compact'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jurischunk',
+            name='fuero_norm',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='jurischunk',
+            name='jurisdiccion_norm',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=128),
+        ),
+        migrations.RunPython(completar_metadatos, migrations.RunPython.noop),
+    ]
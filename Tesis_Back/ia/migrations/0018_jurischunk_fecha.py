@@ -0,0 +1,28 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ia', '0017_jurischunk_fuero_norm'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='jurisdocument',
+            name='fecha',
+            field=models.DateField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='jurischunk',
+            name='fecha',
+            field=models.DateField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunSQL(
+            sql=(
+                "UPDATE ia_jurischunk jc SET fecha = jd.fecha "
+                "FROM ia_jurisdocument jd WHERE jd.doc_id = jc.doc_id AND jd.fecha IS NOT NULL;"
+            ),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
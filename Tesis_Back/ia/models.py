@@ -48,7 +48,15 @@ class VerificationResult(models.Model):
 
 
 
-from pgvector.django import VectorField
+from pgvector.django import HalfVectorField, VectorField
+import unicodedata
+
+
+def normalizar_metadato(valor) -> str:
+    """'Laboral ' / 'LABORAL' -> 'laboral'; 'Córdoba' -> 'cordoba'. Para filtros por igualdad indexables."""
+    t = unicodedata.normalize("NFKD", (valor or "").strip().lower()).encode("ascii", "ignore").decode()
+    return " ".join(t.split())
+
 
 class JurisDocument(models.Model):
     doc_id = models.CharField(max_length=128, unique=True)
@@ -56,7 +64,7 @@ class JurisDocument(models.Model):
     fuero = models.CharField(max_length=64)
     jurisdiccion = models.CharField(max_length=128)
     tribunal = models.TextField(blank=True, null=True)
-    fecha = models.DateField(blank=True, null=True)
+    fecha = models.DateField(blank=True, null=True, db_index=True)
     link_origen = models.TextField(blank=True, null=True)
     s3_key_metadata = models.TextField(blank=True, null=True)
     s3_key_document = models.TextField(blank=True, null=True)
@@ -76,7 +84,19 @@ class JurisChunk(models.Model):
     span_start = models.IntegerField(blank=True, null=True)
     span_end = models.IntegerField(blank=True, null=True)
     tokens = models.IntegerField(blank=True, null=True)
-    embedding = VectorField(dimensions=1536)  
+    # Columna sin dimensión fija: cada chunk guarda con qué modelo se embebió y cuántas
+    # dims tiene; los índices HNSW son parciales por modelo (ver ia/embeddings.py)
+    embedding = VectorField()
+    embedding_model = models.CharField(max_length=64, default="text-embedding-3-small", db_index=True)
+    embedding_dim = models.PositiveSmallIntegerField(default=1536)
+    # Prefijo Matryoshka del embedding en float16 (EMBEDDINGS_COMPACT_DIM dims) para la
+    # etapa gruesa de la búsqueda en dos etapas
+    embedding_compact = HalfVectorField(null=True, blank=True)
+    # Copias normalizadas de jd.fuero / jd.jurisdiccion: se filtra sin JOIN y sobre
+    # columnas indexadas (y con índices HNSW parciales por fuero, ver embeddings_indices)
+    fuero_norm = models.CharField(max_length=64, blank=True, default="", db_index=True)
+    jurisdiccion_norm = models.CharField(max_length=128, blank=True, default="", db_index=True)
+    fecha = models.DateField(blank=True, null=True, db_index=True)  # copia de jd.fecha para rangos + ANN
 
     class Meta:
         unique_together = (("doc", "chunk_id"),)
@@ -111,6 +131,10 @@ class Conversation(models.Model):
     causa = models.ForeignKey(
         "causa.Causa", on_delete=models.CASCADE, related_name="conversations", null=True, blank=True
     )
+    # Resumen incremental del historial: cubre hasta el mensaje watermark (inclusive)
+    summary = models.TextField(blank=True, default="")
+    summary_watermark_id = models.CharField(max_length=64, blank=True, default="")
+    summary_watermark_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         ordering = ["-last_message_at"]
@@ -0,0 +1,160 @@
+"""
+Orquestador de fuentes independientes para el asistente (fan-out con deadline).
+
+Cada fuente (búsqueda web, búsquedas vectoriales, contexto de la causa, adjuntos,
+resumen del historial...) se lanza en un pool de hilos apenas están sus datos y se
+espera recién cuando hace falta. La latencia total queda acotada por la fuente más
+lenta que realmente se necesita, no por la suma de todas.
+
+- Timeout por fuente (desde que se lanzó) y deadline global del request: al vencer
+  se usa el `default` de la fuente y el futuro se cancela (si todavía no arrancó).
+- Los hilos son I/O-bound (HTTP a OpenAI/Tavily, Postgres), así que el GIL no molesta.
+- Cada tarea cierra al terminar las conexiones a la BD que abrió en su hilo.
+- Las fuentes que dependen de otra (`despues_de=`, p.ej. las búsquedas del
+  embedding) se encadenan por callback: no ocupan un hilo esperando.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor, TimeoutError as FuturesTimeout
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Segundos por fuente (se pueden pisar con settings.ASISTENTE_TIMEOUTS)
+TIMEOUTS = {
+    "web": 8.0,
+    "embedding": 5.0,
+    "estricta": 6.0,
+    "estricta_suave": 6.0,
+    "vectorial": 6.0,
+    "adjuntos": 10.0,
+    "causa": 4.0,
+    "historial": 10.0,
+}
+
+OK, TIMEOUT, ERROR = "ok", "timeout", "error"
+
+
+def _ejecutar(fn, args, kwargs):
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        # Las conexiones de Django son por hilo: si no se cierran quedan abiertas en el pool
+        connections.close_all()
+
+
+def _copiar(origen, destino):
+    """Pasa el resultado (o la excepción) de `origen` a `destino`, si no lo cancelaron."""
+    try:
+        if origen.cancelled():
+            destino.cancel()
+        elif origen.exception() is not None:
+            destino.set_exception(origen.exception())
+        else:
+            destino.set_result(origen.result())
+    except InvalidStateError:
+        pass
+
+
+class Orquestador:
+    def __init__(self, deadline=None, max_workers=None, timeouts=None):
+        self.inicio = time.monotonic()
+        deadline = deadline if deadline is not None else getattr(settings, "ASISTENTE_DEADLINE", 20.0)
+        self.limite = self.inicio + deadline if deadline else None
+        self.timeouts = {**TIMEOUTS, **(getattr(settings, "ASISTENTE_TIMEOUTS", None) or {}), **(timeouts or {})}
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers or getattr(settings, "ASISTENTE_MAX_WORKERS", 8),
+            thread_name_prefix="asistente",
+        )
+        self._fuentes = {}   # nombre -> (future, lanzado, timeout, default)
+        self.reporte = {}    # nombre -> {"estado", "ms", "error"?}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+        return False
+
+    def lanzar(self, nombre, fn, *args, default=None, timeout=None, despues_de=None, **kwargs):
+        """
+        Arranca la fuente ya mismo (si no fue lanzada antes). Con `despues_de` arranca
+        cuando termine esa otra fuente y recibe su resultado como primer argumento; si
+        la otra falla, esta falla igual (y se usa su `default`).
+        """
+        if nombre in self._fuentes:
+            return
+        timeout = timeout if timeout is not None else self.timeouts.get(nombre)
+        if despues_de is None:
+            futuro = self._pool.submit(_ejecutar, fn, args, kwargs)
+        else:
+            futuro = Future()
+
+            def encadenar(previo):
+                if futuro.cancelled():
+                    return
+                if previo.cancelled() or previo.exception() is not None:
+                    _copiar(previo, futuro)
+                    return
+                try:
+                    interno = self._pool.submit(_ejecutar, fn, (previo.result(), *args), kwargs)
+                except RuntimeError:  # pool ya cerrado (cerrar()): la fuente ya no se espera
+                    futuro.cancel()
+                    return
+                interno.add_done_callback(lambda f: _copiar(f, futuro))
+
+            self._fuentes[despues_de][0].add_done_callback(encadenar)
+        self._fuentes[nombre] = (futuro, time.monotonic(), timeout, default)
+
+    def lanzada(self, nombre):
+        return nombre in self._fuentes
+
+    def _espera(self, lanzado, timeout):
+        limites = [l for l in (self.limite, lanzado + timeout if timeout else None) if l is not None]
+        return max(0.0, min(limites) - time.monotonic()) if limites else None
+
+    def resultado(self, nombre):
+        """
+        Espera la fuente hasta su timeout / el deadline global. Si vence o falla devuelve
+        su `default` (el error queda en `reporte`). Se puede pedir varias veces.
+        """
+        futuro, lanzado, timeout, default = self._fuentes[nombre]
+        if nombre in self.reporte and self.reporte[nombre]["estado"] != OK:
+            return default
+        try:
+            valor = futuro.result(timeout=self._espera(lanzado, timeout))
+        except FuturesTimeout:
+            futuro.cancel()
+            self._registrar(nombre, lanzado, TIMEOUT)
+            logger.warning("Fuente %s sin respuesta a tiempo; se sigue sin ella", nombre)
+            return default
+        except Exception as e:
+            self._registrar(nombre, lanzado, ERROR, e)
+            logger.exception("Falló la fuente %s", nombre)
+            return default
+        self._registrar(nombre, lanzado, OK)
+        return valor
+
+    def _registrar(self, nombre, lanzado, estado, error=None):
+        with self._lock:
+            if nombre in self.reporte:
+                return
+            entrada = {"estado": estado, "ms": round((time.monotonic() - lanzado) * 1000, 1)}
+            if error is not None:
+                entrada["error"] = str(error)
+            self.reporte[nombre] = entrada
+
+    def cerrar(self):
+        """No espera a las fuentes que siguen corriendo; cancela las que no arrancaron."""
+        for futuro, *_ in self._fuentes.values():
+            futuro.cancel()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def debug(self):
+        with self._lock:
+            fuentes = dict(self.reporte)
+        return {"total_ms": round((time.monotonic() - self.inicio) * 1000, 1), "fuentes": fuentes}
@@ -1,3 +1,8 @@
+from django.conf import settings
+
+from .retrieval import merge_adjacent_chunks
+from .tokens import count_messages, count_tokens, keep_last_tokens, truncate_tokens
+
 SYS = (
     "Sos un asistente experto en derecho laboral argentino. Analizás jurisprudencia y normativa con precisión profesional."
     "Responde en español claro y preciso. "
@@ -5,79 +10,51 @@ SYS = (
     "No inventes jurisprudencia ni citas. Si falta contexto, dilo."
 )
 
-def build_prompt(user_query: str, hits: list, causa_context: str = "", max_chars_ctx: int = 12000) -> list:
-    """
-    Construye el prompt optimizado para el asistente jurídico experto.
-    """
+MIN_BLOCK_TOKENS = 80  # bloques que quedarían más chicos que esto se descartan en vez de recortarse
+
+
+def _kind(h: dict) -> str:
+    doc_id = h.get('doc_id', '')
+    if 'causa_doc::' in doc_id:
+        return "doc"
+    if h.get('source') == 'tavily' or 'tavily' in doc_id.lower():
+        return "web"
+    return "local"
+
+
+def _header(kind: str, idx: int, h: dict) -> str:
+    if kind == "doc":
+        return f"\n[Doc {idx}] {h['titulo']}"
+    if kind == "web":
+        return f"\n[Web {idx}] {h.get('titulo', 'Fuente web')}"
+    header = f"\n[Fuente {idx}] {h['titulo']}"
+    if h.get('tribunal'):
+        header += f" — {h['tribunal']}"
+    if h.get('fecha'):
+        header += f" — {h['fecha']}"
+    return header
+
+
+def _render_context(causa_context: str, blocks: list) -> str:
     ctx_parts = []
-    used = 0
-    
-    # Si hay contexto de causa, agregarlo primero
     if causa_context:
         ctx_parts.append("=== CONTEXTO DE LA CAUSA ===")
         ctx_parts.append(causa_context)
         ctx_parts.append("")
-        used += len(causa_context)
-    
-    # Clasificar fuentes
-    local_hits = []
-    web_hits = []
-    causa_docs = []
-    
-    for h in hits:
-        doc_id = h.get('doc_id', '')
-        if 'causa_doc::' in doc_id:
-            causa_docs.append(h)
-        elif h.get('source') == 'tavily' or 'tavily' in doc_id.lower():
-            web_hits.append(h)
-        else:
-            local_hits.append(h)
-    
-    # Documentos de la causa
-    if causa_docs:
-        ctx_parts.append("=== DOCUMENTOS DE LA CAUSA ===")
-        for idx, h in enumerate(causa_docs, 1):
-            header = f"\n[Doc {idx}] {h['titulo']}"
-            block = f"{header}\n{h['text'].strip()}\n"
-            if used + len(block) > max_chars_ctx:
-                continue
-            ctx_parts.append(block)
-            used += len(block)
-    
-    # Jurisprudencia local
-    base_idx = len(causa_docs)
-    if local_hits:
-        ctx_parts.append("\n=== JURISPRUDENCIA Y DOCTRINA ===")
-        for idx, h in enumerate(local_hits, base_idx + 1):
-            tribunal = h.get('tribunal', '')
-            fecha = h.get('fecha', '')
-            header = f"\n[Fuente {idx}] {h['titulo']}"
-            if tribunal:
-                header += f" — {tribunal}"
-            if fecha:
-                header += f" — {fecha}"
-            
-            block = f"{header}\n{h['text'].strip()}\n"
-            if used + len(block) > max_chars_ctx:
-                continue
-            ctx_parts.append(block)
-            used += len(block)
-    
-    # Fuentes web
-    base_idx = base_idx + len(local_hits)
-    if web_hits:
-        ctx_parts.append("\n=== INFORMACIÓN COMPLEMENTARIA ===")
-        for idx, h in enumerate(web_hits, base_idx + 1):
-            header = f"\n[Web {idx}] {h.get('titulo', 'Fuente web')}"
-            block = f"{header}\n{h['text'].strip()}\n"
-            if used + len(block) > max_chars_ctx:
-                continue
-            ctx_parts.append(block)
-            used += len(block)
-    
-    context = "\n".join(ctx_parts) if ctx_parts else ""
-    
-    # Prompt más directo y simple
+    titles = {"doc": "=== DOCUMENTOS DE LA CAUSA ===", "local": "\n=== JURISPRUDENCIA Y DOCTRINA ===",
+              "web": "\n=== INFORMACIÓN COMPLEMENTARIA ==="}
+    idx = 0
+    for kind in ("doc", "local", "web"):
+        group = [b for b in blocks if b["kind"] == kind]
+        if group:
+            ctx_parts.append(titles[kind])
+        for b in group:
+            idx += 1
+            ctx_parts.append(f"{_header(kind, idx, b['hit'])}\n{b['text'].strip()}\n")
+    return "\n".join(ctx_parts) if ctx_parts else ""
+
+
+def _messages(user_query: str, context: str, n_sources: int, history: str) -> list:
     system_prompt = """Sos un abogado laboralista senior de la Provincia de Buenos Aires con 15+ años de experiencia.
 
 Tu trabajo es analizar jurisprudencia y proporcionar respuestas fundamentadas en las fuentes disponibles.
@@ -103,9 +80,110 @@ INSTRUCCIONES:
 4. NO incluyas URLs en tu texto
 5. Respondé en párrafos corridos
 
-IMPORTANTE: Tenés {len(hits)} fuentes disponibles. Usalas todas para tu análisis."""
+IMPORTANTE: Tenés {n_sources} fuentes disponibles. Usalas todas para tu análisis."""
 
-    return [
+    messages = [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_prompt},
-    ]
\ No newline at end of file
+    ]
+    if history:
+        messages.insert(1, {"role": "user", "content": f"{history}\n\nNueva consulta: {user_query}"})
+    return messages
+
+
+def assemble_prompt(
+    user_query: str,
+    hits: list,
+    causa_context: str = "",
+    history: str = "",
+    model: str = None,
+    max_input_tokens: int = None,
+):
+    """
+    Arma el prompt dentro de un presupuesto de tokens de entrada (todo cuenta:
+    system, instrucciones, consulta, contexto de causa, historial y fuentes).
+
+    - Los chunks solapados del mismo documento se fusionan por span (misma etapa que
+      `retrieval.merge_adjacent_chunks`; no-op si los hits ya vienen fusionados).
+    - Si no entra todo, se recorta/descarta primero el bloque de menor valor por
+      token (score / tokens); los demás quedan completos y en orden.
+    - Si ni siquiera entran las partes fijas, se recorta el historial (se conserva
+      lo más reciente) y después el contexto de la causa.
+
+    Devuelve (messages, reporte) con los tokens enviados.
+    """
+    model = model or getattr(settings, "OPENAI_MODEL", "gpt-4o")
+    budget = max_input_tokens or getattr(settings, "PROMPT_MAX_INPUT_TOKENS", 8000)
+
+    # Partes fijas
+    fixed = count_messages(_messages(user_query, _render_context(causa_context, []), 0, history), model)
+    if fixed > budget and history:
+        keep = max(0, count_tokens(history, model) - (fixed - budget))
+        history = keep_last_tokens(history, keep, model)
+        fixed = count_messages(_messages(user_query, _render_context(causa_context, []), 0, history), model)
+    if fixed > budget and causa_context:
+        keep = max(0, count_tokens(causa_context, model) - (fixed - budget))
+        causa_context = truncate_tokens(causa_context, keep, model)
+        fixed = count_messages(_messages(user_query, _render_context(causa_context, []), 0, history), model)
+
+    # Bloques de fuentes (≈ tokens del header + texto + separadores)
+    unique = merge_adjacent_chunks(hits)
+    blocks = []
+    for h in unique:
+        text = (h.get('text') or '').strip()
+        if not text:
+            continue
+        kind = _kind(h)
+        b = {"kind": kind, "hit": h, "text": text, "value": float(h.get("score") or 0.0)}
+        b["overhead"] = count_tokens(_header(kind, 0, h), model) + 2
+        b["tokens"] = count_tokens(text, model) + b["overhead"]
+        blocks.append(b)
+    # Títulos de sección
+    section_tokens = 12 * len({b["kind"] for b in blocks})
+
+    available = budget - fixed - section_tokens
+    trimmed = dropped = 0
+    total = sum(b["tokens"] for b in blocks)
+    while blocks and total > available:
+        over = total - available
+        worst = min(blocks, key=lambda b: b["value"] / max(b["tokens"], 1))
+        new_len = worst["tokens"] - worst["overhead"] - over
+        if new_len >= MIN_BLOCK_TOKENS:
+            worst["text"] = truncate_tokens(worst["text"], new_len, model)
+            total -= worst["tokens"]
+            worst["tokens"] = count_tokens(worst["text"], model) + worst["overhead"]
+            total += worst["tokens"]
+            trimmed += 1
+            if total > available:  # el sufijo " […]" puede sumar un token
+                blocks.remove(worst)
+                total -= worst["tokens"]
+                dropped += 1
+        else:
+            blocks.remove(worst)
+            total -= worst["tokens"]
+            dropped += 1
+
+    messages = _messages(user_query, _render_context(causa_context, blocks), len(blocks), history)
+    report = {
+        "model": model,
+        "budget_tokens": budget,
+        "prompt_tokens": count_messages(messages, model),
+        "fixed_tokens": fixed,
+        "sources_in": len(hits),
+        "sources_deduped": len(hits) - len(unique),
+        "sources_sent": len(blocks),
+        "sources_trimmed": trimmed,
+        "sources_dropped": dropped,
+    }
+    return messages, report
+
+
+def build_prompt(user_query: str, hits: list, causa_context: str = "", history: str = "",
+                 max_input_tokens: int = None) -> list:
+    """
+    Construye el prompt optimizado para el asistente jurídico experto
+    (ver `assemble_prompt` para el presupuesto de tokens).
+    """
+    return assemble_prompt(
+        user_query, hits, causa_context=causa_context, history=history, max_input_tokens=max_input_tokens
+    )[0]
@@ -0,0 +1,191 @@
+# ia/rerank.py
+"""
+Reranking local (CPU) de los candidatos de la búsqueda vectorial.
+
+En lugar de cortar por un `min_score` fijo de coseno, se sobre-pide (p.ej. 50
+candidatos con un umbral bajo) y se reordena con un scorer más fino; al prompt
+van solo los mejores K.
+
+Scorers:
+- "features" (default, sin dependencias): BM25 sobre los candidatos + coseno +
+  cobertura de términos de la consulta + match en el título, combinados linealmente
+  (pesos en settings.RERANK_WEIGHTS). Vectorizado con NumPy.
+- "onnx": cross-encoder exportado a ONNX (settings.RERANK_ONNX_MODEL, con su
+  tokenizer.json al lado). Requiere `onnxruntime` y `tokenizers`; si no están o el
+  modelo no carga, se usa "features".
+"""
+import logging
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WEIGHTS = {"cosine": 0.55, "bm25": 0.30, "coverage": 0.10, "title": 0.05}
+BM25_K1, BM25_B = 1.2, 0.75
+
+STOPWORDS = {
+    "de", "la", "el", "en", "y", "a", "los", "las", "del", "que", "por", "con", "para", "un", "una",
+    "se", "al", "lo", "su", "sus", "es", "o", "como", "sobre", "entre", "sin", "no", "si", "le", "les",
+}
+
+
+def _tokens(text: str) -> List[str]:
+    t = unicodedata.normalize("NFKD", (text or "").lower()).encode("ascii", "ignore").decode()
+    return [w for w in re.findall(r"\w+", t) if w not in STOPWORDS and len(w) > 1]
+
+
+def _scale_max(x: np.ndarray) -> np.ndarray:
+    hi = float(x.max()) if x.size else 0.0
+    return np.zeros_like(x) if hi < 1e-9 else x / hi
+
+
+# ---------- scorer por features ----------
+def feature_scores(query: str, hits: List[Dict[str, Any]], weights: Dict[str, float] = None) -> np.ndarray:
+    weights = {**DEFAULT_WEIGHTS, **(weights or getattr(settings, "RERANK_WEIGHTS", None) or {})}
+    q_terms = list(dict.fromkeys(_tokens(query)))
+    n = len(hits)
+    cosine = np.array([float(h.get("score") or 0.0) for h in hits], dtype=np.float64)
+    if not q_terms:
+        return cosine
+
+    docs = [_tokens(h.get("text") or "") for h in hits]
+    lengths = np.array([len(d) for d in docs], dtype=np.float64)
+    avgdl = max(lengths.mean(), 1.0)
+    # Matriz término×doc de frecuencias (solo términos de la consulta)
+    tf = np.zeros((len(q_terms), n), dtype=np.float64)
+    idx = {t: i for i, t in enumerate(q_terms)}
+    for j, d in enumerate(docs):
+        for t, c in Counter(w for w in d if w in idx).items():
+            tf[idx[t], j] = c
+    df = (tf > 0).sum(axis=1)
+    idf = np.log(1 + (n - df + 0.5) / (df + 0.5))
+    denom = tf + BM25_K1 * (1 - BM25_B + BM25_B * lengths / avgdl)
+    bm25 = (idf[:, None] * tf * (BM25_K1 + 1) / np.maximum(denom, 1e-9)).sum(axis=0)
+
+    coverage = (tf > 0).sum(axis=0) / len(q_terms)
+    title_terms = [set(_tokens(h.get("titulo") or "")) for h in hits]
+    title = np.array([len(set(q_terms) & tt) / len(q_terms) for tt in title_terms], dtype=np.float64)
+
+    # El coseno va crudo: los candidatos suelen estar en una franja angosta y
+    # normalizarlo por min-max exageraría diferencias de centésimas
+    return (
+        weights["cosine"] * cosine
+        + weights["bm25"] * _scale_max(bm25)
+        + weights["coverage"] * coverage
+        + weights["title"] * title
+    )
+
+
+# ---------- cross-encoder ONNX (opcional) ----------
+class OnnxCrossEncoder:
+    def __init__(self, model_path: str, max_length: int = 256, batch_size: int = 16):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        path = Path(model_path)
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = int(getattr(settings, "RERANK_ONNX_THREADS", 0) or 0)
+        self.session = ort.InferenceSession(str(path), sess_options=opts, providers=["CPUExecutionProvider"])
+        self.tokenizer = Tokenizer.from_file(str(path.with_name("tokenizer.json")))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+        self.inputs = {i.name for i in self.session.get_inputs()}
+        self.batch_size = batch_size
+
+    def score(self, query: str, texts: List[str]) -> np.ndarray:
+        out = []
+        for i in range(0, len(texts), self.batch_size):
+            enc = self.tokenizer.encode_batch([(query, t) for t in texts[i:i + self.batch_size]])
+            feed = {
+                "input_ids": np.array([e.ids for e in enc], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in enc], dtype=np.int64),
+            }
+            if "token_type_ids" in self.inputs:
+                feed["token_type_ids"] = np.array([e.type_ids for e in enc], dtype=np.int64)
+            logits = self.session.run(None, {k: v for k, v in feed.items() if k in self.inputs})[0]
+            out.append(logits.reshape(len(enc), -1)[:, -1])
+        return np.concatenate(out) if out else np.zeros(0)
+
+
+_cross_encoder = None
+_cross_encoder_lock = threading.Lock()
+_cross_encoder_failed = False
+
+
+def _get_cross_encoder():
+    global _cross_encoder, _cross_encoder_failed
+    path = getattr(settings, "RERANK_ONNX_MODEL", "")
+    if not path or _cross_encoder_failed:
+        return None
+    if _cross_encoder is None:
+        with _cross_encoder_lock:
+            if _cross_encoder is None and not _cross_encoder_failed:
+                try:
+                    _cross_encoder = OnnxCrossEncoder(path)
+                except Exception as e:
+                    logger.warning("Cross-encoder ONNX no disponible (%s); se usa el scorer por features", e)
+                    _cross_encoder_failed = True
+    return _cross_encoder
+
+
+# ---------- API ----------
+def rerank(query: str, hits: List[Dict[str, Any]], k: int, scorer: str = None, report: dict = None):
+    """
+    Reordena `hits` y devuelve los mejores `k` con `rerank_score`. El `score`
+    original (coseno) se conserva. `report` (opcional) recibe scorer y latencia.
+    """
+    inicio = time.perf_counter()
+    scorer = scorer or getattr(settings, "RERANK_SCORER", "features")
+    if not hits:
+        return []
+
+    scores = None
+    used = "features"
+    if scorer == "onnx":
+        ce = _get_cross_encoder()
+        if ce is not None:
+            try:
+                scores = ce.score(query, [h.get("text") or "" for h in hits])
+                used = "onnx"
+            except Exception as e:
+                logger.warning("Falló el cross-encoder (%s); se usa el scorer por features", e)
+    if scores is None:
+        scores = feature_scores(query, hits)
+
+    order = np.argsort(-scores, kind="stable")[:k]
+    out = [{**hits[i], "rerank_score": round(float(scores[i]), 6)} for i in order]
+    if report is not None:
+        report.update({
+            "scorer": used,
+            "candidates": len(hits),
+            "kept": len(out),
+            "ms": round((time.perf_counter() - inicio) * 1000, 2),
+        })
+    return out
+
+
+def rerank_enabled() -> bool:
+    return bool(getattr(settings, "RERANK_ENABLED", False))
+
+
+def overfetch_params(k: int, min_score: float = 1.0) -> Dict[str, Any]:
+    """`k` y `min_score` con los que sobre-pedir candidatos para el rerank."""
+    return {
+        "k": max(k, int(getattr(settings, "RERANK_CANDIDATES", 50))),
+        "min_score": min(min_score, float(getattr(settings, "RERANK_MIN_SCORE", 0.65))),
+    }
+
+
+def recall_at_k(ranked_doc_ids: List[str], relevant: set, k: int) -> float:
+    if not relevant:
+        return math.nan
+    return len(set(ranked_doc_ids[:k]) & relevant) / len(relevant)
@@ -1,6 +1,15 @@
 from typing import List, Dict, Any, Optional
-from django.db import connection
-from .embeddings import embed_query
+from datetime import date
+from functools import lru_cache
+import logging
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from .embeddings import compact_dim, embed_query, expresion_indice, get_provider
+from .models import normalizar_metadato
+from .rerank import overfetch_params, rerank as rerank_hits, rerank_enabled
+
+logger = logging.getLogger(__name__)
 
 import re
 from typing import Optional
@@ -32,6 +41,176 @@ def _to_vector_literal(v: list[float]) -> str:
     return "[" + ",".join(f"{x:.10f}" for x in v) + "]"
 
 
+# --------- SQL k-NN (exacto o en dos etapas) ----------
+MODOS_VECTORIALES = ("exacto", "compacto", "binario")
+
+# La distancia se calcula una sola vez (columna `dist`, que también ordena); el
+# score se arma en Python (1 - dist) en _ejecutar_knn.
+_SELECT_HIT = """
+      jc.doc_id, jc.chunk_id, jc.section, jc.text,
+      {dist} AS dist,
+      jd.titulo, jd.tribunal, jd.fecha, jd.link_origen, jd.s3_key_document,
+      jc.span_start, jc.span_end"""
+
+
+def _vector_param(emb):
+    """
+    El embedding como parámetro: ndarray float32 si la conexión tiene registrado el
+    adaptador de pgvector (ver ia.apps; con psycopg 3 y server_side_binding viaja en
+    binario), si no el literal de texto.
+    """
+    if getattr(connection, "pgvector_registrado", False):
+        return np.asarray(emb, dtype=np.float32)
+    return _to_vector_literal(emb)
+
+
+def _knn_sql(emb: list[float], where: list[str], params: list, limit: int,
+             modo: Optional[str] = None) -> tuple[str, list, int]:
+    """
+    SQL, params y filas pedidas al índice ANN de la búsqueda k-NN con los filtros
+    `where`. La columna `embedding` no tiene dimensión fija: se castea a vector(dim)
+    igual que en el índice HNSW parcial del modelo (ia.embeddings.sql_indice);
+    `where` ya filtra embedding_model.
+
+    El vector de la consulta viaja una sola vez (CTE `q`); las etapas lo leen con
+    `(SELECT ... FROM q)`, que Postgres evalúa una vez como InitPlan y el índice
+    HNSW acepta como parámetro de ordenamiento.
+
+    modo (None -> settings.RETRIEVAL_MODO):
+    - "exacto": ANN directo sobre los vectores completos.
+    - "compacto": etapa 1 sobre `embedding_compact` (halfvec truncado, índice chico)
+      pidiendo RETRIEVAL_FACTOR_CANDIDATOS × limit; etapa 2 re-puntúa esos candidatos
+      con el vector completo.
+    - "binario": etapa 1 por distancia de Hamming sobre el signo de cada coordenada
+      (índice bit(dim), ~32× más chico que el de floats) pidiendo
+      RETRIEVAL_FACTOR_BINARIO × limit; etapa 2 igual que "compacto".
+    """
+    modo = modo or getattr(settings, "RETRIEVAL_MODO", "exacto")
+    if modo not in MODOS_VECTORIALES:
+        raise ValueError(f"Modo de búsqueda vectorial desconocido: {modo}")
+    dim = len(emb)
+    vec = expresion_indice("completo", dim, "jc")
+    dist = f"{vec} <=> (SELECT v FROM q)"
+    cte = f"WITH q AS MATERIALIZED (SELECT %s::vector({dim}) AS v)"
+    filtros = " AND ".join(where)
+
+    if modo == "exacto":
+        sql = f"""
+    {cte}
+    SELECT{_SELECT_HIT.format(dist=dist)}
+    FROM ia_jurischunk jc
+    JOIN ia_jurisdocument jd ON jd.doc_id = jc.doc_id
+    WHERE {filtros}
+    ORDER BY dist
+    LIMIT %s;
+    """
+        return sql, [_vector_param(emb)] + params + [int(limit)], int(limit)
+
+    if modo == "compacto":
+        cdim = compact_dim(dim)
+        # Misma transformación que ia.embeddings.compactar, hecha en el servidor
+        orden = (f"{expresion_indice('compacto', cdim, 'jc')} <=> "
+                 f"(SELECT l2_normalize(subvector(v, 1, {cdim}))::halfvec({cdim}) FROM q)")
+        filtros += " AND jc.embedding_compact IS NOT NULL"
+        factor = getattr(settings, "RETRIEVAL_FACTOR_CANDIDATOS", 4)
+    else:
+        orden = f"{expresion_indice('binario', dim, 'jc')} <~> (SELECT binary_quantize(v)::bit({dim}) FROM q)"
+        factor = getattr(settings, "RETRIEVAL_FACTOR_BINARIO", 10)
+    candidatos = int(limit) * int(factor)
+    sql = f"""
+    {cte},
+    cand AS MATERIALIZED (
+      SELECT jc.id
+      FROM ia_jurischunk jc
+      JOIN ia_jurisdocument jd ON jd.doc_id = jc.doc_id
+      WHERE {filtros}
+      ORDER BY {orden}
+      LIMIT %s
+    )
+    SELECT{_SELECT_HIT.format(dist=dist)}
+    FROM cand
+    JOIN ia_jurischunk jc ON jc.id = cand.id
+    JOIN ia_jurisdocument jd ON jd.doc_id = jc.doc_id
+    ORDER BY dist
+    LIMIT %s;
+    """
+    return sql, [_vector_param(emb)] + params + [candidatos, int(limit)], candidatos
+
+
+def _filtros_metadatos(where: list, params: list, fuero: Optional[str], jurisdiccion: Optional[str]) -> None:
+    """
+    Filtros sobre las copias normalizadas en ia_jurischunk (sin depender del JOIN):
+    fuero por igualdad (usa el índice HNSW parcial del fuero si existe) y jurisdicción
+    por substring, como el ILIKE de antes pero sin distinguir acentos.
+    """
+    if fuero:
+        where.append("jc.fuero_norm = %s")
+        params.append(normalizar_metadato(fuero))
+    if jurisdiccion:
+        where.append("jc.jurisdiccion_norm LIKE %s")
+        params.append(f"%{normalizar_metadato(jurisdiccion)}%")
+
+
+def _as_date(valor) -> Optional[date]:
+    if not valor:
+        return None
+    if isinstance(valor, date):
+        return valor
+    try:
+        return date.fromisoformat(str(valor)[:10])
+    except ValueError:
+        logger.warning("Fecha de filtro inválida (se ignora): %r", valor)
+        return None
+
+
+def _filtros_fecha(where: list, params: list, desde, hasta) -> None:
+    """
+    Rango de fechas sobre jc.fecha (copia de jd.fecha, indexada): el rango se aplica
+    en la misma tabla que el ANN, sin esperar al JOIN. Sin fecha -> queda afuera.
+    """
+    desde, hasta = _as_date(desde), _as_date(hasta)
+    if desde:
+        where.append("jc.fecha >= %s")
+        params.append(desde)
+    if hasta:
+        where.append("jc.fecha <= %s")
+        params.append(hasta)
+
+
+@lru_cache(maxsize=1)
+def _pgvector_version() -> tuple:
+    try:
+        with connection.cursor() as cur:
+            cur.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+            row = cur.fetchone()
+        return tuple(int(x) for x in row[0].split(".")[:3]) if row else (0,)
+    except Exception:
+        return (0,)
+
+
+def _ejecutar_knn(sql: str, params: list, ann_limit: int) -> list:
+    """
+    Corre la búsqueda en una transacción corta con SET LOCAL de HNSW:
+    - hnsw.ef_search >= filas pedidas al índice (con el default 40 un LIMIT 64 nunca
+      devuelve 64 filas).
+    - hnsw.iterative_scan (pgvector >= 0.8): si los filtros descartan candidatos, el
+      índice sigue escaneando en vez de devolver menos filas de las pedidas.
+    Con "relaxed_order" el orden puede venir levemente alterado: se reordena por score.
+    """
+    version = _pgvector_version()
+    iterativo = getattr(settings, "RETRIEVAL_ITERATIVE_SCAN", "relaxed_order")
+    with transaction.atomic(), connection.cursor() as cur:
+        if version >= (0, 5):
+            ef = max(int(getattr(settings, "RETRIEVAL_EF_SEARCH", 100)), min(int(ann_limit), 1000))
+            cur.execute(f"SET LOCAL hnsw.ef_search = {ef}")
+        if version >= (0, 8) and iterativo in ("relaxed_order", "strict_order"):
+            cur.execute(f"SET LOCAL hnsw.iterative_scan = {iterativo}")
+            cur.execute(f"SET LOCAL hnsw.max_scan_tuples = {int(getattr(settings, 'RETRIEVAL_MAX_SCAN_TUPLES', 20000))}")
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+    rows = [r[:4] + (1.0 - float(r[4]),) + r[5:] for r in rows]  # dist -> score
+    return sorted(rows, key=lambda r: -r[4])
+
 
 # --------- BÚSQUEDA ESTRICTA (FTS obligatorio + filtros + umbral cosine) ----------
 def _mk_websearch_query(user_q: str, required_terms: Optional[list[str]] = None) -> str:
@@ -41,22 +220,20 @@ def _mk_websearch_query(user_q: str, required_terms: Optional[list[str]] = None)
         qs = (qs + " " + req).strip()
     return qs
 
-def search_chunks_strict(
+def _build_strict_sql(
     query: str,
-    k: int = 8,
-    fuero: Optional[str] = "Laboral",
-    jurisdiccion: Optional[str] = None,  
+    emb: list[float],
+    emb_model: str,
+    limit: int,
+    fuero: Optional[str] = None,
+    jurisdiccion: Optional[str] = None,
     tribunal: Optional[str] = None,
     desde: Optional[str] = None,
     hasta: Optional[str] = None,
     min_chars: int = 200,
-    min_score: float = 0.80,
-    max_per_doc: int = 2,
-    debug: bool = False,
-) -> Dict[str, Any]:
-    emb = embed_query(query)
-    emb_lit = _to_vector_literal(emb)
-
+    modo: Optional[str] = None,
+) -> tuple[str, list, int, list[str]]:
+    """SQL de la búsqueda estricta: (sql, params, filas pedidas al índice, where)."""
     # Forzamos algunos términos comunes en laboral PBA (opcional)
     required = []
     ql = query.lower()
@@ -68,16 +245,11 @@ def search_chunks_strict(
         required.append("certificado")
     web_q = _mk_websearch_query(query, required_terms=required)
 
-    where: list[str] = ["length(jc.text) >= %s"]
-    params: list = [int(min_chars)]
-
-    if fuero:
-        where.append("LOWER(jd.fuero) = LOWER(%s)")
-        params.append(fuero)
+    where: list[str] = ["jc.embedding_model = %s", "length(jc.text) >= %s"]
+    params: list = [emb_model, int(min_chars)]
 
-    if jurisdiccion:
-        where.append("jd.jurisdiccion ILIKE %s")
-        params.append(f"%{jurisdiccion}%")
+    _filtros_metadatos(where, params, fuero, jurisdiccion)
+    _filtros_fecha(where, params, desde, hasta)
 
     if tribunal:
         where.append("jd.tribunal ILIKE %s")
@@ -86,22 +258,47 @@ def search_chunks_strict(
     where.append("to_tsvector('spanish', coalesce(jd.titulo,'') || ' ' || jc.text) @@ websearch_to_tsquery('spanish', %s)")
     params.append(web_q)
 
-    sql = f"""
-    SELECT
-      jc.doc_id, jc.chunk_id, jc.section, jc.text,
-      1 - (jc.embedding <=> %s::vector) AS score,
-      jd.titulo, jd.tribunal, jd.fecha, jd.link_origen, jd.s3_key_document
-    FROM ia_jurischunk jc
-    JOIN ia_jurisdocument jd ON jd.doc_id = jc.doc_id
-    WHERE {" AND ".join(where)}
-    ORDER BY jc.embedding <=> %s::vector
-    LIMIT %s;
-    """
-    params_final = [emb_lit] + params + [emb_lit, int(k * 8)]  # pedimos extra
+    sql, params_final, ann_limit = _knn_sql(emb, where, params, limit, modo)
+    return sql, params_final, ann_limit, where
 
-    with connection.cursor() as cur:
-        cur.execute(sql, params_final)
-        rows = cur.fetchall()
+
+def search_chunks_strict(
+    query: str,
+    k: int = 8,
+    fuero: Optional[str] = "Laboral",
+    jurisdiccion: Optional[str] = None,  
+    tribunal: Optional[str] = None,
+    desde: Optional[str] = None,
+    hasta: Optional[str] = None,
+    min_chars: int = 200,
+    min_score: float = 0.80,
+    max_per_doc: int = 2,
+    debug: bool = False,
+    emb: Optional[list[float]] = None,
+    rerank: Optional[bool] = None,
+    modo: Optional[str] = None,
+    scorer: Optional[str] = None,
+) -> Dict[str, Any]:
+    # `emb`: embedding ya calculado de `query` (el asistente lo comparte entre búsquedas)
+    # `rerank`: sobre-pedir candidatos con umbral bajo y quedarse con los K mejores
+    #           según ia.rerank (None -> settings.RERANK_ENABLED)
+    # `scorer`: scorer del rerank, "features" | "onnx" (None -> settings.RERANK_SCORER)
+    # `modo`: "exacto" | "compacto" | "binario" (ver _knn_sql; None -> settings.RETRIEVAL_MODO)
+    do_rerank = rerank_enabled() if rerank is None else rerank
+    top_k = k
+    if do_rerank:
+        over = overfetch_params(k, min_score)
+        k, min_score = over["k"], over["min_score"]
+    emb = emb if emb is not None else embed_query(query)
+    emb_model = get_provider().model
+
+    sql, params_final, ann_limit, where = _build_strict_sql(
+        query, emb, emb_model, int(k * 8),  # pedimos extra
+        fuero=fuero, jurisdiccion=jurisdiccion, tribunal=tribunal,
+        desde=desde, hasta=hasta, min_chars=min_chars, modo=modo,
+    )
+
+    rows = _ejecutar_knn(sql, params_final, ann_limit)
 
     hits: List[Dict[str, Any]] = []
     per_doc = {}
@@ -126,10 +323,17 @@ def search_chunks_strict(
             "fecha": r[7].isoformat() if r[7] else None,
             "link_origen": doc_url,
             "s3_key_document": r[9],
+            "span_start": r[10],
+            "span_end": r[11],
+            "raw_text": r[3] or "",  # para fusionar por offsets (merge_adjacent_chunks lo saca)
         })
         if len(hits) >= k:
             break
 
+    rerank_report: Dict[str, Any] = {}
+    if do_rerank:
+        hits = rerank_hits(query, hits, top_k, scorer=scorer, report=rerank_report)
+
     if debug:
         return {
             "hits": hits,
@@ -138,6 +342,7 @@ def search_chunks_strict(
                 "min_score": min_score,
                 "got_rows": len(rows),
                 "kept_hits": len(hits),
+                "rerank": rerank_report or None,
             }
         }
     return {"hits": hits}
@@ -151,42 +356,26 @@ def search_chunks(
     desde: Optional[str] = None,
     hasta: Optional[str] = None,
     min_chars: int = 80,
+    emb: Optional[list[float]] = None,
+    rerank: Optional[bool] = None,
+    modo: Optional[str] = None,
 ) -> List[Dict[str, Any]]:
-    emb = embed_query(query)
-    emb_lit = _to_vector_literal(emb)
+    do_rerank = rerank_enabled() if rerank is None else rerank
+    top_k = k
+    if do_rerank:
+        k = overfetch_params(k)["k"]
+    emb = emb if emb is not None else embed_query(query)
+    emb_model = get_provider().model
 
-    where: list[str] = ["length(jc.text) >= %s"]
-    params: list = [int(min_chars)]
+    where: list[str] = ["jc.embedding_model = %s", "length(jc.text) >= %s"]
+    params: list = [emb_model, int(min_chars)]
 
-    if fuero:
-        where.append("LOWER(jd.fuero) = LOWER(%s)")
-        params.append(fuero)
-    if jurisdiccion:
-        where.append("jd.jurisdiccion ILIKE %s")
-        params.append(f"%{jurisdiccion}%")
-    if desde:
-        where.append("jd.fecha IS NOT NULL AND jd.fecha >= %s")
-        params.append(desde)
-    if hasta:
-        where.append("jd.fecha IS NOT NULL AND jd.fecha <= %s")
-        params.append(hasta)
+    _filtros_metadatos(where, params, fuero, jurisdiccion)
+    _filtros_fecha(where, params, desde, hasta)
 
-    sql = f"""
-    SELECT
-      jc.doc_id, jc.chunk_id, jc.section, jc.text,
-      1 - (jc.embedding <=> %s::vector) AS score,
-      jd.titulo, jd.tribunal, jd.fecha, jd.link_origen, jd.s3_key_document
-    FROM ia_jurischunk jc
-    JOIN ia_jurisdocument jd ON jd.doc_id = jc.doc_id
-    WHERE {" AND ".join(where)}
-    ORDER BY jc.embedding <=> %s::vector
-    LIMIT %s;
-    """
-    params_final = [emb_lit] + params + [emb_lit, int(k)]
+    sql, params_final, ann_limit = _knn_sql(emb, where, params, int(k), modo)
 
-    with connection.cursor() as cur:
-        cur.execute(sql, params_final)
-        rows = cur.fetchall()
+    rows = _ejecutar_knn(sql, params_final, ann_limit)
 
     out: List[Dict[str, Any]] = []
     for r in rows:
@@ -203,5 +392,138 @@ def search_chunks(
             "fecha": r[7].isoformat() if r[7] else None,
             "link_origen": doc_url,
             "s3_key_document": r[9],
+            "span_start": r[10],
+            "span_end": r[11],
+            "raw_text": r[3] or "",  # para fusionar por offsets (merge_adjacent_chunks lo saca)
         })
+    if do_rerank:
+        out = rerank_hits(query, out, top_k)
     return out
+
+
+# --------- POST-RETRIEVAL: fusión de chunks contiguos + near-duplicates ----------
+SIMHASH_MAX_HAMMING = 3   # bits distintos (de 64) para considerar dos pasajes casi iguales
+
+
+def _texto_alineado(h: Dict[str, Any]) -> Optional[str]:
+    """
+    Texto del chunk que coincide caracter a caracter con su span: el crudo si vino
+    (`raw_text`), si no `text` cuando el largo calza. None si no se puede alinear
+    (p.ej. `clean_urls_in_text` ya le sacó URLs o espacios).
+    """
+    largo = h["span_end"] - h["span_start"]
+    for t in (h.get("raw_text"), h.get("text")):
+        if t is not None and len(t) == largo:
+            return t
+    return None
+
+
+def _sin_crudo(h: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in h.items() if k != "raw_text"} if "raw_text" in h else h
+
+
+def merge_adjacent_chunks(hits: List[Dict[str, Any]], max_gap: int = 0) -> List[Dict[str, Any]]:
+    """
+    Une en un único pasaje los chunks del mismo documento/sección cuyos spans se solapan
+    o son contiguos (las ventanas de `window_chunks` se pisan 400 caracteres). El solape
+    se recorta por offsets sobre el texto crudo y el pasaje se limpia al final; si algún
+    chunk del grupo no se puede alinear con su span, ese grupo no se fusiona. El pasaje
+    toma el mejor score y queda en la posición del mejor de sus chunks. Hits sin span
+    (web, adjuntos) pasan intactos. La salida no lleva `raw_text`.
+    """
+    groups: Dict[tuple, List[int]] = {}
+    for i, h in enumerate(hits):
+        if h.get("span_start") is not None and h.get("span_end") is not None and h.get("doc_id"):
+            groups.setdefault((h["doc_id"], h.get("section")), []).append(i)
+
+    replace: Dict[int, Dict[str, Any]] = {}   # índice del mejor chunk -> pasaje fusionado
+    drop = set()
+    for idxs in groups.values():
+        if len(idxs) < 2:
+            continue
+        idxs.sort(key=lambda i: (hits[i]["span_start"], hits[i]["span_end"]))
+        runs, run = [], [idxs[0]]
+        end = hits[idxs[0]]["span_end"]
+        for i in idxs[1:]:
+            if hits[i]["span_start"] <= end + max_gap:
+                run.append(i)
+                end = max(end, hits[i]["span_end"])
+            else:
+                runs.append(run)
+                run, end = [i], hits[i]["span_end"]
+        runs.append(run)
+
+        for run in runs:
+            if len(run) < 2:
+                continue
+            textos = [_texto_alineado(hits[i]) for i in run]
+            if any(t is None for t in textos):
+                continue
+            first = hits[run[0]]
+            text, start, end = textos[0], first["span_start"], first["span_end"]
+            for i, t in zip(run[1:], textos[1:]):
+                h = hits[i]
+                if h["span_end"] <= end:
+                    continue  # contenido en lo ya unido
+                hueco = h["span_start"] - end
+                text += ("\n" if hueco > 0 else "") + t[max(0, -hueco):]
+                end = h["span_end"]
+            best = max(run, key=lambda i: hits[i].get("score") or 0)
+            merged = {
+                **_sin_crudo(hits[best]),
+                "text": clean_urls_in_text(text),
+                "span_start": start,
+                "span_end": end,
+                "chunk_id": first.get("chunk_id"),
+                "merged_chunk_ids": [hits[i].get("chunk_id") for i in run],
+            }
+            replace[best] = merged
+            drop.update(i for i in run if i != best)
+
+    return [replace.get(i, _sin_crudo(h)) for i, h in enumerate(hits) if i not in drop]
+
+
+def _shingles(text: str, n: int = 3) -> List[str]:
+    words = re.findall(r"\w+", (text or "").lower())
+    if len(words) <= n:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[i:i + n]) for i in range(len(words) - n + 1)]
+
+
+def simhash(text: str) -> int:
+    """SimHash de 64 bits sobre shingles de 3 palabras (blake2b como hash base)."""
+    import hashlib
+    import numpy as np
+
+    sh = _shingles(text)
+    if not sh:
+        return 0
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") for s in set(sh)),
+        dtype=np.uint64,
+    )
+    bits = (hashes[:, None] >> np.arange(64, dtype=np.uint64)) & np.uint64(1)
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - len(hashes)
+    return int(sum(1 << int(b) for b in np.flatnonzero(votes > 0)))
+
+
+def dedupe_near_duplicates(hits: List[Dict[str, Any]], max_hamming: int = SIMHASH_MAX_HAMMING) -> List[Dict[str, Any]]:
+    """
+    Descarta pasajes casi idénticos (p.ej. el mismo fallo publicado en dos fuentes):
+    se queda el de mayor score, en su posición original.
+    """
+    if len(hits) < 2:
+        return hits
+    fps = [simhash(h.get("text") or "") for h in hits]
+    keep: List[int] = []
+    for i in sorted(range(len(hits)), key=lambda i: -(hits[i].get("score") or 0)):
+        if fps[i] and any(fps[j] and bin(fps[i] ^ fps[j]).count("1") <= max_hamming for j in keep):
+            continue
+        keep.append(i)
+    keep_set = set(keep)
+    return [h for i, h in enumerate(hits) if i in keep_set]
+
+
+def merge_passages(hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Etapa post-retrieval: fusión por spans y después near-duplicates entre documentos."""
+    return dedupe_near_duplicates(merge_adjacent_chunks(hits))
@@ -623,36 +623,22 @@ def run_case_summary_and_verification(causa_id: int):
 
 
 
-from tavily import TavilyClient
 from typing import List, Dict, Any
 import uuid
+from .web_search import buscar_web
 
 def search_with_tavily(query: str, max_results: int = 5) -> List[Dict[str, Any]]:
     """
-    Busca en la web usando Tavily con contexto de Argentina/Buenos Aires/Laboral
+    Busca en la web (Tavily u otro backend, ver ia/web_search.py) con contexto de
+    Argentina/Buenos Aires/Laboral. Resultados cacheados; primero se buscan los
+    dominios oficiales y, si no hay nada, la web abierta (en serie por defecto; con
+    settings.WEB_SEARCH_PARALELO las dos salen a la vez).
     """
     try:
-        client = TavilyClient(api_key=settings.TAVILY_API_KEY)
-        
         # Enriquecer la query con contexto argentino
         enhanced_query = f"{query} Argentina Buenos Aires derecho laboral jurisprudencia"
         
-        response = client.search(
-            query=enhanced_query,
-            search_depth="advanced",
-            max_results=max_results,
-            include_domains=["argentina.gob.ar", "infoleg.gob.ar", "csjn.gov.ar", "boletinoficial.gob.ar"],
-            
-        )
-        results = response.get('results', [])
-        if not results:
-            response = client.search(
-                query=enhanced_query,
-                search_depth="advanced",
-                max_results=max_results,
-                # Sin include_domains = busca en toda la web
-            )
-            results = response.get('results', [])
+        results = buscar_web(enhanced_query, max_results=max_results, profundidad="advanced")
         
         # Convertir resultados de Tavily al formato de "hits"
         pseudo_hits = []
@@ -666,11 +652,11 @@ def search_with_tavily(query: str, max_results: int = 5) -> List[Dict[str, Any]]
                 "link_origen": result.get('url', ''),
                 "s3_key_document": None,
                 "score": result.get('score', 0.8),
-                "text": result.get('content', '')[:3000],  
+                "text": (result.get('content') or '')[:3000],  
             })
         
         return pseudo_hits
         
     except Exception as e:
         print(f"[ERROR] Tavily search failed: {e}")
-        return []
\ No newline at end of file
+        return []
@@ -1,3 +1,318 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
 
-# Create your tests here.
+import numpy as np
+
+from datetime import date, timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from . import benchmark, web_search
+from .embeddings import FakeEmbeddings, set_provider
+from .models import Conversation, JurisDocument, Message
+from .orquestador import Orquestador
+from .retrieval import _build_strict_sql, search_chunks_strict
+
+
+class FakeEmbeddingsTests(SimpleTestCase):
+    def test_determinista_y_normalizado(self):
+        fake = FakeEmbeddings()
+        a, b = fake.embed(["Despido sin causa", "despido sin causa"])
+        self.assertEqual(len(a), 1536)
+        self.assertEqual(a, b)  # minúsculas / acentos no cambian el vector
+        self.assertAlmostEqual(float(np.linalg.norm(a)), 1.0, places=6)
+
+    def test_textos_con_terminos_comunes_quedan_cerca(self):
+        q, cerca, lejos = FakeEmbeddings().embed([
+            "indemnizacion por despido",
+            "el despido genera indemnizacion y preaviso",
+            "cuota alimentaria del progenitor",
+        ])
+        self.assertGreater(np.dot(q, cerca), np.dot(q, lejos))
+
+
+class BenchmarkHelpersTests(SimpleTestCase):
+    def test_corpus_sintetico_determinista(self):
+        docs1, consultas1 = benchmark.generar_corpus(12, seed=3)
+        docs2, consultas2 = benchmark.generar_corpus(12, seed=3)
+        self.assertEqual(docs1, docs2)
+        self.assertEqual(consultas1, consultas2)
+        for d, c in zip(docs1, consultas1):
+            self.assertEqual(c["relevant"], [d["id"]])
+            self.assertTrue(d["url"].startswith(benchmark.BENCH_PREFIX))
+            # Todos los términos de la consulta están en el doc relevante
+            for t in c["query"].split():
+                self.assertIn(t, d["text"])
+
+    def test_metricas(self):
+        self.assertEqual(benchmark.percentil([5, 1, 3, 2, 4], 50), 3)
+        self.assertEqual(benchmark.percentil(list(range(1, 101)), 95), 95)
+        self.assertEqual(benchmark.reciprocal_rank(["a", "b", "c"], {"c"}), 1 / 3)
+        self.assertEqual(benchmark.reciprocal_rank(["a"], {"z"}), 0.0)
+
+    def test_filas_escaneadas(self):
+        plan = [{"Plan": {
+            "Node Type": "Limit", "Actual Rows": 8, "Actual Loops": 1,
+            "Plans": [{
+                "Node Type": "Nested Loop", "Actual Rows": 8, "Actual Loops": 1,
+                "Plans": [
+                    {"Node Type": "Seq Scan", "Actual Rows": 40, "Rows Removed by Filter": 60, "Actual Loops": 1},
+                    {"Node Type": "Index Scan", "Actual Rows": 1, "Actual Loops": 40},
+                ],
+            }],
+        }}]
+        self.assertEqual(benchmark.filas_escaneadas(plan), 140)
+
+
+class StrictSqlTests(SimpleTestCase):
+    def _build(self, **kw):
+        return _build_strict_sql("despido", [0.1] * 8, "m", 64, **kw)
+
+    def test_rango_de_fechas_en_el_where(self):
+        sql, params, _, where = self._build(desde="2020-01-01", hasta=date(2020, 12, 31))
+        self.assertIn("jc.fecha >= %s", where)
+        self.assertIn("jc.fecha <= %s", where)
+        self.assertIn(date(2020, 1, 1), params)
+        self.assertIn(date(2020, 12, 31), params)
+        # El rango se aplica sobre ia_jurischunk, antes del ORDER BY del ANN
+        self.assertLess(sql.index("jc.fecha >= %s"), sql.index("ORDER BY"))
+
+    def test_sin_fechas_o_invalidas_no_filtra(self):
+        for kw in ({}, {"desde": "", "hasta": None}, {"desde": "no-es-fecha"}):
+            _, _, _, where = self._build(**kw)
+            self.assertFalse([w for w in where if "fecha" in w], kw)
+
+    def test_params_alineados_con_placeholders(self):
+        for modo in ("exacto", "compacto", "binario"):
+            sql, params, _, _ = self._build(desde="2020-01-01", fuero="Laboral", modo=modo)
+            self.assertEqual(sql.count("%s"), len(params), modo)
+
+
+class OrquestadorTests(SimpleTestCase):
+    def test_dependientes_no_bloquean_el_pool(self):
+        # Con un solo hilo, tres fuentes que esperan el embedding terminarían por deadline
+        with Orquestador(max_workers=1, deadline=2) as orq:
+            orq.lanzar("embedding", lambda: [1.0, 2.0])
+            for nombre in ("a", "b", "c"):
+                orq.lanzar(nombre, lambda emb: sum(emb), despues_de="embedding", default=None)
+            self.assertEqual([orq.resultado(n) for n in ("a", "b", "c")], [3.0, 3.0, 3.0])
+
+    def test_falla_la_dependencia_usa_default(self):
+        with Orquestador(max_workers=2, deadline=2) as orq:
+            orq.lanzar("embedding", lambda: 1 / 0)
+            orq.lanzar("estricta", lambda emb: emb, despues_de="embedding", default={"hits": []})
+            with self.assertLogs("ia.orquestador", "ERROR"):
+                self.assertEqual(orq.resultado("estricta"), {"hits": []})
+            self.assertEqual(orq.debug()["fuentes"]["estricta"]["estado"], "error")
+
+
+class _StubSoloAbierta(web_search.BackendStub):
+    """Los dominios oficiales no traen nada: obliga a caer a la búsqueda abierta."""
+    def buscar(self, query, dominios=None, **kwargs):
+        resultados = super().buscar(query, dominios=dominios, **kwargs)
+        return [] if dominios else resultados
+
+
+@override_settings(WEB_SEARCH_BACKEND="stub", WEB_SEARCH_CACHE_ALIAS="local")
+class WebSearchTests(SimpleTestCase):
+    def setUp(self):
+        from django.core.cache import caches
+
+        caches["local"].clear()
+        self.backend = web_search.BackendStub()
+        self.anterior = web_search.set_backend(self.backend)
+
+    def tearDown(self):
+        web_search.set_backend(self.anterior)
+
+    def test_prefiere_dominios_oficiales(self):
+        res = web_search.buscar_web("plazo de apelación", max_results=2)
+        self.assertEqual([r["url"] for r in res], [
+            "https://argentina.gob.ar/stub/1", "https://infoleg.gob.ar/stub/2",
+        ])
+        # Por defecto en serie: con resultados oficiales no se consulta la abierta
+        self.assertEqual(len(self.backend.llamadas), 1)
+
+    def test_cae_a_la_abierta_y_cachea(self):
+        self.backend = _StubSoloAbierta()
+        web_search.set_backend(self.backend)
+        for paralelo in (False, True):
+            res = web_search.buscar_web("Plazo  de apelación", paralelo=paralelo)
+            self.assertEqual(res[0]["url"], "https://example.org/stub/1")
+        # La segunda vuelta sale del cache (query normalizada), vacíos incluidos
+        self.assertEqual([c["dominios"] for c in self.backend.llamadas], [web_search.DOMINIOS_OFICIALES, []])
+
+
+class BenchmarkRetrievalTests(TestCase):
+    """Corre contra Postgres+pgvector con embeddings fake (sin OpenAI)."""
+
+    def test_recall_y_filas(self):
+        docs, consultas = benchmark.generar_corpus(30, seed=11)
+        mapa = benchmark.cargar_corpus(docs)
+        res = benchmark.correr(consultas[:10], ["flexible", "estricta"], k=5, mapa=mapa)
+        for modo in ("flexible", "estricta"):
+            self.assertGreaterEqual(res[modo]["recall@5"], 0.9)
+            self.assertGreater(res[modo]["mrr"], 0.5)
+            self.assertGreater(res[modo]["filas_p50"], 0)
+        benchmark.limpiar_corpus()
+        self.assertFalse(JurisDocument.objects.filter(link_origen__startswith=benchmark.BENCH_PREFIX).exists())
+
+    def test_rango_de_fechas_poda_resultados(self):
+        docs, consultas = benchmark.generar_corpus(30, seed=5)
+        mapa = benchmark.cargar_corpus(docs)
+        c = consultas[0]
+        anterior = set_provider(FakeEmbeddings())
+        try:
+            dentro = search_chunks_strict(c["query"], k=5, fuero=c["fuero"], min_score=0.0,
+                                          desde=c["desde"], hasta=c["hasta"], rerank=False)["hits"]
+            # Un rango que excluye al doc relevante lo deja afuera
+            fuera = search_chunks_strict(c["query"], k=5, fuero=c["fuero"], min_score=0.0,
+                                         desde="1990-01-01", hasta="1990-12-31", rerank=False)["hits"]
+        finally:
+            set_provider(anterior)
+        self.assertIn(mapa[c["relevant"][0]], [h["doc_id"] for h in dentro])
+        self.assertTrue(all(c["desde"] <= h["fecha"] <= c["hasta"] for h in dentro))
+        self.assertEqual(fuera, [])
+
+
+@override_settings(API_CACHE=True)
+class ConversationEtagTests(TestCase):
+    """Con el cache de respuestas prendido: el ETag nuevo no puede venir con el cuerpo viejo."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email="etag@test.com", password="x")
+        self.conv = Conversation.objects.create(user=self.user, title="t")
+        Message.objects.create(conversation=self.conv, role="user", content="hola")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f"/api/conversations/{self.conv.pk}"
+
+    def test_304_mientras_no_cambie(self):
+        r = self.client.get(self.url)
+        self.assertEqual(r.status_code, 200)
+        etag = r["ETag"]
+        r2 = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r2.status_code, 304)
+        self.assertEqual(r2.content, b"")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Message.objects.create(conversation=self.conv, role="assistant", content="respuesta")
+        r3 = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r3.status_code, 200)
+        self.assertNotEqual(r3["ETag"], etag)
+        self.assertEqual(len(r3.json()["messages"]), 2)
+
+    def test_otro_usuario_no_recibe_304(self):
+        etag = self.client.get(self.url)["ETag"]
+        otro = get_user_model().objects.create_user(email="otro@test.com", password="x")
+        self.client.force_authenticate(otro)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 404)
+
+
+class _LLMContado:
+    """Cliente OpenAI falso: cuenta las llamadas a chat.completions.create."""
+
+    def __init__(self):
+        self.llamadas = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        self.llamadas.append(kwargs)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="resumen"))])
+
+
+@override_settings(CONVERSATION_RECENT_WINDOW=5, CONVERSATION_SUMMARY_BATCH=4)
+class ResumenHistorialTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(email="hist@test.com", password="x")
+        self.conv = Conversation.objects.create(user=user, title="t")
+        inicio = timezone.now() - timedelta(days=1)
+        self.msgs = Message.objects.bulk_create([
+            Message(conversation=self.conv, role="user" if i % 2 == 0 else "assistant",
+                    content=f"m{i}", created_at=inicio + timedelta(seconds=i))
+            for i in range(500)
+        ])
+        self.llm = _LLMContado()
+
+    def _resumir(self):
+        from . import views
+
+        with patch.object(views, "get_openai_client", return_value=self.llm):
+            return views.summarize_conversation_history(self.conv, current_message_id=None)
+
+    def test_conversacion_vieja_una_sola_llamada_por_turno(self):
+        contexto = self._resumir()
+        self.assertEqual(len(self.llm.llamadas), 1)
+        prompt = self.llm.llamadas[0]["messages"][0]["content"]
+        self.assertIn("m494", prompt)       # el último que salió de la ventana
+        self.assertNotIn("m474", prompt)    # los anteriores a la tanda se saltean
+        self.conv.refresh_from_db()
+        self.assertEqual(self.conv.summary_watermark_id, self.msgs[494].id)
+        self.assertIn("Resumen de conversación anterior: resumen", contexto)
+        self.assertNotIn("Mensajes anteriores", contexto)
+
+        # Turno siguiente sin mensajes nuevos: nada que plegar
+        self._resumir()
+        self.assertEqual(len(self.llm.llamadas), 1)
+
+
+class MergePasajesTests(SimpleTestCase):
+    TEXTO = " ".join(f"palabra{i}" for i in range(400))  # documento de ~3900 caracteres
+
+    def _hit(self, i, j, score=0.8, doc="d1", limpiar=True):
+        from .retrieval import clean_urls_in_text
+
+        crudo = self.TEXTO[i:j]
+        h = {"doc_id": doc, "section": None, "chunk_id": f"{doc}-{i}", "score": score,
+             "span_start": i, "span_end": j, "text": clean_urls_in_text(crudo) if limpiar else crudo}
+        if limpiar:
+            h["raw_text"] = crudo
+        return h
+
+    def test_solapados_se_unen_sin_duplicar(self):
+        from .retrieval import merge_adjacent_chunks
+
+        # Cortes justo en espacios: el texto limpio (strip) ya no calza con el span
+        fin_a, ini_b = self.TEXTO.index(" ", 1500) + 1, self.TEXTO.index(" ", 1100)
+        a, b = self._hit(0, fin_a, 0.7), self._hit(ini_b, 2600, 0.9)
+        self.assertNotEqual(len(a["text"]), fin_a)
+        out = merge_adjacent_chunks([a, b, self._hit(0, 100, doc="d2")])
+        self.assertEqual(len(out), 2)
+        pasaje = out[0]
+        self.assertEqual(pasaje["text"], self.TEXTO[0:2600].strip())
+        self.assertEqual((pasaje["span_start"], pasaje["span_end"]), (0, 2600))
+        self.assertEqual(pasaje["score"], 0.9)
+        self.assertEqual(pasaje["merged_chunk_ids"], ["d1-0", f"d1-{ini_b}"])
+        self.assertTrue(all("raw_text" not in h for h in out))
+
+    def test_sin_texto_crudo_alineado_no_se_fusiona(self):
+        from .retrieval import merge_adjacent_chunks
+
+        a, b = self._hit(0, 1500), self._hit(1100, 2600)
+        for h in (a, b):
+            del h["raw_text"]
+            h["text"] = h["text"][5:]  # ya no calza con el span
+        self.assertEqual(len(merge_adjacent_chunks([a, b])), 2)
+
+    def test_contiguos_se_concatenan_tal_cual(self):
+        from .retrieval import merge_adjacent_chunks
+
+        out = merge_adjacent_chunks([self._hit(0, 1000, limpiar=False), self._hit(1000, 2000, limpiar=False)])
+        self.assertEqual(out[0]["text"], self.TEXTO[0:2000].strip())
+
+    def test_simhash_descarta_casi_duplicados(self):
+        from .retrieval import dedupe_near_duplicates, simhash
+
+        texto = self.TEXTO[:2000]
+        casi = texto.replace("palabra150", "palabra150bis")
+        otro = " ".join(f"termino{i}" for i in range(300))
+        self.assertLessEqual(bin(simhash(texto) ^ simhash(casi)).count("1"), 3)
+        hits = [
+            {"doc_id": "a", "text": texto, "score": 0.7},
+            {"doc_id": "b", "text": casi, "score": 0.9},
+            {"doc_id": "c", "text": otro, "score": 0.8},
+        ]
+        self.assertEqual([h["doc_id"] for h in dedupe_near_duplicates(hits)], ["b", "c"])
+        self.assertEqual(simhash(""), 0)
@@ -0,0 +1,81 @@
+# ia/tokens.py
+"""
+Conteo de tokens para armar prompts con presupuesto.
+
+Usa tiktoken con el encoding del modelo; si no está disponible (p.ej. sin red
+para bajar el BPE la primera vez) cae a una estimación de ~4 caracteres por token.
+"""
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+CHARS_POR_TOKEN = 4.0
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    try:
+        import tiktoken
+
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.warning("tiktoken no disponible (%s); se estiman los tokens por longitud", e)
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    if not text:
+        return 0
+    enc = _encoding(model)
+    if enc is None:
+        return max(1, int(len(text) / CHARS_POR_TOKEN + 0.5))
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int, model: str = "gpt-4o") -> str:
+    """Corta `text` a `max_tokens`, retrocediendo al último fin de oración/línea si queda cerca."""
+    if max_tokens <= 0:
+        return ""
+    enc = _encoding(model)
+    if enc is None:
+        cut = text[: int(max_tokens * CHARS_POR_TOKEN)]
+    else:
+        ids = enc.encode(text, disallowed_special=())
+        if len(ids) <= max_tokens:
+            return text
+        cut = enc.decode(ids[:max_tokens])
+    if len(cut) >= len(text):
+        return text
+    fin = max(cut.rfind(". "), cut.rfind("\n"))
+    if fin > len(cut) * 0.6:
+        cut = cut[: fin + 1]
+    return cut.rstrip() + " […]"
+
+
+def keep_last_tokens(text: str, max_tokens: int, model: str = "gpt-4o") -> str:
+    """Conserva los últimos `max_tokens` de `text` (para historiales: lo más reciente va al final)."""
+    if max_tokens <= 0:
+        return ""
+    enc = _encoding(model)
+    if enc is None:
+        cut = text[-int(max_tokens * CHARS_POR_TOKEN):]
+    else:
+        ids = enc.encode(text, disallowed_special=())
+        if len(ids) <= max_tokens:
+            return text
+        cut = enc.decode(ids[-max_tokens:])
+    if len(cut) >= len(text):
+        return text
+    inicio = cut.find("\n")
+    if 0 <= inicio < len(cut) * 0.4:
+        cut = cut[inicio + 1:]
+    return "[…] " + cut.lstrip()
+
+
+def count_messages(messages: list, model: str = "gpt-4o") -> int:
+    """Tokens de una lista de mensajes chat (≈ 3 de overhead por mensaje + 3 del priming)."""
+    return sum(count_tokens(m.get("content") or "", model) + 3 for m in messages) + 3
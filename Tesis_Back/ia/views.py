@@ -35,9 +35,19 @@ from .services import run_summary_and_verification, run_case_summary_and_verific
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse, extend_schema_view, OpenApiExample
 from drf_spectacular.types import OpenApiTypes
 from django.db import transaction
+from django.db.models import Q
 from django.db.models.functions import Coalesce
 
 from openai import OpenAI
+import logging
+from tesis_api.db import liberar_conexion_db
+from tesis_api.cache import GRUPO_CAUSAS, GRUPO_CONVERSACIONES, cachear_respuesta
+from tesis_api.etag import etag_conversacion
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import etag
+
+
+logger = logging.getLogger(__name__)
 
 
 @lru_cache(maxsize=1)
@@ -116,6 +126,11 @@ class SummaryRunViewSet(viewsets.ModelViewSet):
             .order_by("-last_activity", "-id")
         )
 
+    @cachear_respuesta(GRUPO_CAUSAS)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cachear_respuesta(GRUPO_CAUSAS)
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
         # Forzar lectura fresca antes de serializar
@@ -147,6 +162,7 @@ class SummaryRunViewSet(viewsets.ModelViewSet):
         responses={200: SummaryRunSerializer},
     )
     @action(detail=False, methods=["get"], url_path="by-causa-g/(?P<causa_id>[^/.]+)")
+    @cachear_respuesta(GRUPO_CAUSAS)
     def get_by_causa(self, request, causa_id: str):
         user = request.user
         causa = get_object_or_404(Causa.objects.filter(creado_por=user), pk=int(causa_id))
@@ -299,16 +315,17 @@ class SummaryRunViewSet(viewsets.ModelViewSet):
             
             client = get_openai_client()
 
-            response = client.chat.completions.create(
-                model="gpt-4o-mini", 
-                messages=[
-                    {"role": "system", "content": "Eres un verificador estricto de factualidad y coherencia."},
-                    {"role": "user", "content": verifier_prompt}
-                ],
-                max_tokens=600,
-                response_format={"type": "json_object"},
-                temperature=0.0
-            )
+            with liberar_conexion_db():
+                response = client.chat.completions.create(
+                    model="gpt-4o-mini", 
+                    messages=[
+                        {"role": "system", "content": "Eres un verificador estricto de factualidad y coherencia."},
+                        {"role": "user", "content": verifier_prompt}
+                    ],
+                    max_tokens=600,
+                    response_format={"type": "json_object"},
+                    temperature=0.0
+                )
             verifier_json_text = response.choices[0].message.content
 
         except Exception as e:
@@ -395,8 +412,8 @@ class GrammarCheckView(GenericAPIView):
     
 
 
-from .retrieval import search_chunks_strict, search_chunks
-from .qa import build_prompt
+from .retrieval import search_chunks_strict, search_chunks, merge_passages
+from .qa import build_prompt, assemble_prompt
 from rest_framework.permissions import IsAuthenticated
 
 def _s3_presign(key: str, expires=900) -> str | None:
@@ -484,6 +501,9 @@ class AskJurisView(APIView):
             if debug:
                 dbg["vector_only"] = {"got_hits": len(hits)}
 
+        # Fusión de chunks contiguos del mismo fallo + near-duplicates
+        hits = merge_passages(hits)
+
         # 5) Sin contexto suficiente
         if not hits:
             payload = {
@@ -502,12 +522,13 @@ class AskJurisView(APIView):
         client = get_openai_client()
         try:
             model = getattr(settings, "OPENAI_MODEL", "gpt-4o")
-            resp = client.chat.completions.create(
-                model=model,
-                messages=messages,
-                max_tokens=900,
-                temperature=0.1,
-            )
+            with liberar_conexion_db():
+                resp = client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    max_tokens=900,
+                    temperature=0.1,
+                )
             answer = resp.choices[0].message.content
         except Exception as e:
             return Response({"detail": f"Error modelo: {e}"}, status=status.HTTP_502_BAD_GATEWAY)
@@ -615,64 +636,105 @@ def _build_unique_citations(hits: List[Dict[str, Any]]) -> List[Dict[str, str]]:
 
     return citations
 
-def summarize_conversation_history(conversation, current_message_id, max_messages=20):
+def _rol_label(msg):
+    return "Usuario" if msg.role == "user" else "Asistente"
+
+
+def _fold_summary(conversation, pending):
     """
-    Crea un resumen inteligente del historial:
-    - Incluye todos los últimos 5 mensajes
-    - Resume mensajes más antiguos si hay más de 20
+    Incorpora `pending` (mensajes que salieron de la ventana reciente, en orden) al
+    resumen persistido. Update condicionado al watermark anterior: si otro request
+    ya lo movió, se descarta este resultado.
     """
-    all_messages = Message.objects.filter(
-        conversation=conversation
-    ).exclude(
-        id=current_message_id
-    ).order_by('-created_at')
-    
-    total = all_messages.count()
-    
-    # Si hay pocos mensajes, devolver todos
-    if total <= 5:
+    new_text = "\n".join(f"{_rol_label(m)}: {m.content}" for m in pending)
+    prompt = (
+        f"Resumen previo de la conversación:\n{conversation.summary}\n\n" if conversation.summary else ""
+    ) + (
+        "Actualizá el resumen incorporando estos mensajes. Máximo 5 oraciones, "
+        f"conservá hechos, normas y decisiones relevantes:\n\n{new_text}"
+    )
+    client = get_openai_client()
+    with liberar_conexion_db():
+        resp = client.chat.completions.create(
+            model=getattr(settings, "CONVERSATION_SUMMARY_MODEL", "gpt-4o-mini"),  # Modelo más barato para resúmenes
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=250,
+            temperature=0.3,
+        )
+    summary = resp.choices[0].message.content or conversation.summary
+    last = pending[-1]
+    updated = Conversation.objects.filter(
+        pk=conversation.pk, summary_watermark_id=conversation.summary_watermark_id
+    ).update(summary=summary, summary_watermark_id=last.id, summary_watermark_at=last.created_at)
+    if updated:
+        conversation.summary = summary
+        conversation.summary_watermark_id = last.id
+        conversation.summary_watermark_at = last.created_at
+    return bool(updated)
+
+
+def summarize_conversation_history(conversation, current_message_id, recent_window=None):
+    """
+    Contexto del historial con resumen incremental:
+    - Los últimos `recent_window` mensajes van completos.
+    - Los anteriores viven en `Conversation.summary`, hasta el watermark
+      (`summary_watermark_id` / `summary_watermark_at`).
+    - Los que salieron de la ventana y todavía no se resumieron se pliegan al resumen
+      recién cuando se juntan CONVERSATION_SUMMARY_BATCH: una llamada chica al LLM
+      cada N turnos en lugar de resumir todo el historial en cada turno. Mientras
+      tanto van completos.
+    """
+    recent_window = recent_window or getattr(settings, "CONVERSATION_RECENT_WINDOW", 5)
+    batch = getattr(settings, "CONVERSATION_SUMMARY_BATCH", 4)
+
+    history = Message.objects.filter(conversation=conversation).exclude(id=current_message_id)
+    recent = list(history.order_by("-created_at", "-id")[:recent_window])
+    recent.reverse()
+
+    pending = []
+    if len(recent) == recent_window:
+        oldest = recent[0]
+        pending_qs = history.filter(
+            Q(created_at__lt=oldest.created_at) | Q(created_at=oldest.created_at, id__lt=oldest.id)
+        )
+        if conversation.summary_watermark_at:
+            wm_at, wm_id = conversation.summary_watermark_at, conversation.summary_watermark_id
+            pending_qs = pending_qs.filter(Q(created_at__gt=wm_at) | Q(created_at=wm_at, id__gt=wm_id))
+        pending = list(pending_qs.order_by("created_at", "id"))
+
+    # Como mucho una llamada al LLM por turno: una conversación vieja sin resumen no se
+    # pone al día entera, se pliegan solo los `tanda` pendientes más recientes y el
+    # watermark salta los anteriores. Si falla, van completos (también acotados).
+    tanda = batch * 5
+    pending = pending[-tanda:]
+    if len(pending) >= batch:
+        try:
+            if _fold_summary(conversation, pending):
+                pending = []
+            # si no, otro request movió el watermark: se usa lo pendiente
+        except Exception as e:
+            logger.warning("No se pudo actualizar el resumen de la conversación %s: %s", conversation.pk, e)
+
+    if not conversation.summary and not pending:
+        # Si hay pocos mensajes, devolver todos
         context = "\n\nConversación previa:\n"
-        for msg in reversed(list(all_messages)):
-            role = "Usuario" if msg.role == "user" else "Asistente"
-            context += f"{role}: {msg.content}\n"
+        for msg in recent:
+            context += f"{_rol_label(msg)}: {msg.content}\n"
         return context
-    
-    # Si hay muchos mensajes, resumir los antiguos
-    recent = list(all_messages[:5])  # Últimos 5
-    old = list(all_messages[5:max_messages])  # Siguientes 15
-    
+
     context = ""
-    
-    # Resumir mensajes antiguos
-    if old:
-        old_text = "\n".join([
-            f"{'Usuario' if m.role == 'user' else 'Asistente'}: {m.content}" 
-            for m in reversed(old)
-        ])
-        
-        # Usar LLM para resumir
-        try:
-            client = get_openai_client()
-            summary_resp = client.chat.completions.create(
-                model="gpt-4o-mini",  # Modelo más barato para resúmenes
-                messages=[{
-                    "role": "user",
-                    "content": f"Resume brevemente esta conversación en 3-4 oraciones:\n\n{old_text}"
-                }],
-                max_tokens=200,
-                temperature=0.3,
-            )
-            summary = summary_resp.choices[0].message.content
-            context += f"\nResumen de conversación anterior: {summary}\n"
-        except:
-            pass  # Si falla, continuar sin resumen
-    
+    if conversation.summary:
+        context += f"\nResumen de conversación anterior: {conversation.summary}\n"
+    if pending:
+        context += "\nMensajes anteriores:\n"
+        for msg in pending:
+            context += f"{_rol_label(msg)}: {msg.content}\n"
+
     # Agregar mensajes recientes completos
     context += "\nÚltimos mensajes:\n"
-    for msg in reversed(recent):
-        role = "Usuario" if msg.role == "user" else "Asistente"
-        context += f"{role}: {msg.content}\n"
-    
+    for msg in recent:
+        context += f"{_rol_label(msg)}: {msg.content}\n"
+
     return context
 
 
@@ -700,6 +762,7 @@ from .services import search_with_tavily
 class ConversationListView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @cachear_respuesta(GRUPO_CONVERSACIONES)
     def get(self, request):
         qs = Conversation.objects.filter(user=request.user).only(
             "id", "title", "created_at", "updated_at", "last_message_at"
@@ -709,9 +772,150 @@ class ConversationListView(APIView):
         
 
 from django.utils import timezone as dj_tz
+from .embeddings import embed_query
+from .orquestador import Orquestador
+
 def _derive_title(raw: str) -> str:
     return (raw or "").strip()[:80]
 
+
+def _contexto_causa(causa_id, user):
+    """
+    Contexto de la causa para el prompt y pseudo-hits de sus documentos.
+    Corre como fuente del orquestador: devuelve (causa_obj, causa_context, doc_hits).
+    """
+    causa_context = ""
+    causa_obj = None
+    doc_hits: List[Dict[str, Any]] = []
+
+    try:
+        from causa.models import Causa
+
+        causa_obj = (
+            Causa.objects.select_related("juzgado", "fuero", "jurisdiccion")
+            .prefetch_related(
+                "causa_partes__parte",
+                "causa_partes__rol_parte",
+                "eventos",
+                "tasks",
+                "documentos",
+            )
+            .get(id=causa_id, creado_por=user)
+        )
+
+        # Partes
+        partes_info = []
+        for cp in causa_obj.causa_partes.select_related("parte", "rol_parte").all():
+            parte_str = f"{cp.parte.nombre} ({cp.rol_parte.nombre})"
+            if cp.parte.email:
+                parte_str += f" - {cp.parte.email}"
+            partes_info.append(parte_str)
+
+        # Eventos próximos y recientes
+        from django.utils import timezone
+
+        hoy = timezone.now().date()
+        eventos_proximos = (
+            causa_obj.eventos.filter(fecha__gte=hoy).order_by("fecha")[:5]
+        )
+        eventos_recientes = (
+            causa_obj.eventos.filter(fecha__lt=hoy).order_by("-fecha")[:3]
+        )
+
+        eventos_info = []
+        if eventos_proximos:
+            eventos_info.append("Próximos:")
+            for e in eventos_proximos:
+                eventos_info.append(
+                    f"  • {e.titulo or e.descripcion} - {e.fecha.strftime('%d/%m/%Y')}"
+                )
+        if eventos_recientes:
+            eventos_info.append("Recientes:")
+            for e in eventos_recientes:
+                eventos_info.append(
+                    f"  • {e.titulo or e.descripcion} - {e.fecha.strftime('%d/%m/%Y')}"
+                )
+
+        # Tareas pendientes
+        tasks_pendientes = (
+            causa_obj.tasks.exclude(status__in=["done", "canceled"])
+            .order_by("deadline_date")[:5]
+        )
+        tasks_info = []
+        for task in tasks_pendientes:
+            task_str = f"  • {task.content}"
+            if task.deadline_date:
+                task_str += f" (Vence: {task.deadline_date.strftime('%d/%m/%Y')})"
+            task_str += f" - Prioridad: {task.get_priority_display()}"
+            tasks_info.append(task_str)
+
+        causa_context = f"""Expediente: {causa_obj.numero_expediente}
+        Carátula: {causa_obj.caratula}
+        Estado: {causa_obj.get_estado_display()}
+        Fuero: {causa_obj.fuero.nombre if causa_obj.fuero else 'No especificado'}
+        Juzgado: {causa_obj.juzgado or 'No especificado'}
+        Fecha de inicio: {causa_obj.fecha_inicio.strftime('%d/%m/%Y') if causa_obj.fecha_inicio else 'No especificada'}
+
+        Partes:
+        {chr(10).join(f"  • {p}" for p in partes_info) if partes_info else "  • No registradas"}
+
+        Eventos:
+        {chr(10).join(eventos_info) if eventos_info else "  • No hay eventos registrados"}
+
+        Tareas pendientes:
+        {chr(10).join(tasks_info) if tasks_info else "  • No hay tareas pendientes"}
+        """
+    except Exception:
+        # Si no existe la causa o hay error, seguimos sin contexto
+        causa_obj = None
+
+    if causa_obj is None:
+        return None, "", []
+
+    for doc in causa_obj.documentos.all()[:5]:
+        try:
+            doc_text = ""
+            if getattr(doc, "s3_key", None):
+                # TODO: extracción de texto desde S3 si corresponde
+                pass
+
+            if not doc_text:
+                doc_text = f"Documento: {doc.titulo or 'Sin título'}\n"
+                tipo = (
+                    doc.get_tipo_documento_display()
+                    if hasattr(doc, "get_tipo_documento_display")
+                    else doc.tipo_documento
+                )
+                doc_text += f"Tipo: {tipo}\n"
+                if doc.descripcion:
+                    doc_text += f"Descripción: {doc.descripcion}\n"
+                doc_text += (
+                    "Fecha de subida: "
+                    f"{doc.fecha_subida.strftime('%d/%m/%Y') if doc.fecha_subida else 'No especificada'}"
+                )
+
+            doc_hits.append(
+                {
+                    "doc_id": f"causa_doc::{doc.id}",
+                    "chunk_id": 0,
+                    "titulo": doc.titulo
+                    or f"Documento de {causa_obj.numero_expediente}",
+                    "tribunal": None,
+                    "fecha": doc.fecha_subida.strftime("%Y-%m-%d")
+                    if doc.fecha_subida
+                    else None,
+                    "link_origen": "",
+                    "s3_key_document": doc.s3_key,
+                    "score": 1.0,
+                    "text": doc_text[:5000],
+                }
+            )
+        except Exception:
+            continue
+
+    return causa_obj, causa_context, doc_hits
+
+
 class AsistenteJurisprudencia(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -731,6 +935,10 @@ class AsistenteJurisprudencia(APIView):
         description="Realiza una consulta sobre jurisprudencia/doctrina/leyes usando RAG y devuelve respuesta y citas.",
     )
     def post(self, request):
+        with Orquestador() as orq:
+            return self._consultar(request, orq)
+
+    def _consultar(self, request, orq):
         # 1) Validar entrada unificada (inicio o continuación)
         ser = AskJurisRequestUnionSerializer(data=request.data)
         ser.is_valid(raise_exception=True)
@@ -744,103 +952,70 @@ class AsistenteJurisprudencia(APIView):
         use_tavily: bool = open_ia_str.lower() == "true"
         causa: Optional[int] = data.get("causa_id")
 
-        causa_context = ""
-        causa_obj = None
-
-        if causa:
-            try:
-                from causa.models import Causa
-
-                causa_obj = (
-                    Causa.objects.select_related("juzgado", "fuero", "jurisdiccion")
-                    .prefetch_related(
-                        "causa_partes__parte",
-                        "causa_partes__rol_parte",
-                        "eventos",
-                        "tasks",
-                        "documentos",
-                    )
-                    .get(id=causa, creado_por=request.user)
-                )
-
-                # Partes
-                partes_info = []
-                for cp in causa_obj.causa_partes.select_related("parte", "rol_parte").all():
-                    parte_str = f"{cp.parte.nombre} ({cp.rol_parte.nombre})"
-                    if cp.parte.email:
-                        parte_str += f" - {cp.parte.email}"
-                    partes_info.append(parte_str)
+        is_start = "first_message" in data
+        conversation_id = data.get("conversation_id") or ""
+        title_in = (data.get("title") or "").strip()
+        uploaded_file = data.get("attachments")
+        filtros = {"tribunal": f.get("tribunal"), "desde": f.get("desde"), "hasta": f.get("hasta")}
 
-                # Eventos próximos y recientes
-                from django.utils import timezone
+        # 2) Fan-out: las fuentes independientes arrancan ya y se esperan recién al usarlas
+        #    (ver ia/orquestador.py). Las búsquedas comparten un único embedding de la query
+        #    y se encadenan a él (despues_de="embedding"): no bloquean hilos del pool.
+        def _estricta(emb):
+            return search_chunks_strict(
+                q,
+                k=10,
+                fuero="Laboral",
+                jurisdiccion="Provincia de Buenos Aires",
+                min_chars=160,
+                min_score=0.80,
+                max_per_doc=3,
+                debug=debug,
+                emb=emb,
+                **filtros,
+            )
 
-                hoy = timezone.now().date()
-                eventos_proximos = (
-                    causa_obj.eventos.filter(fecha__gte=hoy).order_by("fecha")[:5]
-                )
-                eventos_recientes = (
-                    causa_obj.eventos.filter(fecha__lt=hoy).order_by("-fecha")[:3]
-                )
+        def _estricta_suave(emb):
+            return search_chunks_strict(
+                q,
+                k=8,
+                fuero="Laboral",
+                jurisdiccion=None,
+                min_chars=100,
+                min_score=0.75,
+                max_per_doc=2,
+                debug=debug,
+                emb=emb,
+                **filtros,
+            )
 
-                eventos_info = []
-                if eventos_proximos:
-                    eventos_info.append("Próximos:")
-                    for e in eventos_proximos:
-                        eventos_info.append(
-                            f"  • {e.titulo or e.descripcion} - {e.fecha.strftime('%d/%m/%Y')}"
-                        )
-                if eventos_recientes:
-                    eventos_info.append("Recientes:")
-                    for e in eventos_recientes:
-                        eventos_info.append(
-                            f"  • {e.titulo or e.descripcion} - {e.fecha.strftime('%d/%m/%Y')}"
-                        )
-
-                # Tareas pendientes
-                tasks_pendientes = (
-                    causa_obj.tasks.exclude(status__in=["done", "canceled"])
-                    .order_by("deadline_date")[:5]
-                )
-                tasks_info = []
-                for task in tasks_pendientes:
-                    task_str = f"  • {task.content}"
-                    if task.deadline_date:
-                        task_str += f" (Vence: {task.deadline_date.strftime('%d/%m/%Y')})"
-                    task_str += f" - Prioridad: {task.get_priority_display()}"
-                    tasks_info.append(task_str)
-
-                causa_context = f"""Expediente: {causa_obj.numero_expediente}
-                Carátula: {causa_obj.caratula}
-                Estado: {causa_obj.get_estado_display()}
-                Fuero: {causa_obj.fuero.nombre if causa_obj.fuero else 'No especificado'}
-                Juzgado: {causa_obj.juzgado or 'No especificado'}
-                Fecha de inicio: {causa_obj.fecha_inicio.strftime('%d/%m/%Y') if causa_obj.fecha_inicio else 'No especificada'}
-
-                Partes:
-                {chr(10).join(f"  • {p}" for p in partes_info) if partes_info else "  • No registradas"}
-
-                Eventos:
-                {chr(10).join(eventos_info) if eventos_info else "  • No hay eventos registrados"}
-
-                Tareas pendientes:
-                {chr(10).join(tasks_info) if tasks_info else "  • No hay tareas pendientes"}
-                """
-            except Exception:
-                # Si no existe la causa o hay error, seguimos sin contexto
-                causa_obj = None
+        def _vectorial(emb):
+            return search_chunks(q, k=8, fuero=None, jurisdiccion=None, min_chars=80, emb=emb)
 
-        is_start = "first_message" in data
-        conversation_id = data.get("conversation_id") or ""
-        title_in = (data.get("title") or "").strip()
+        if causa:
+            orq.lanzar("causa", _contexto_causa, causa, request.user, default=(None, "", []))
+        if uploaded_file:
+            orq.lanzar("adjuntos", extract_text_from_upload, uploaded_file, default="")
+        if use_tavily:
+            orq.lanzar("web", search_with_tavily, q, max_results=5, default=[])
+        orq.lanzar("embedding", embed_query, q)
+        if strict:
+            orq.lanzar("estricta", _estricta, despues_de="embedding", default={"hits": []})
+        # Fallbacks especulativos: si la estricta no alcanza ya están corriendo (o terminaron)
+        if getattr(settings, "ASISTENTE_FANOUT_ESPECULATIVO", False):
+            orq.lanzar("estricta_suave", _estricta_suave, despues_de="embedding", default={"hits": []})
+            orq.lanzar("vectorial", _vectorial, despues_de="embedding", default=[])
+
+        causa_obj, causa_context, causa_doc_hits = (
+            orq.resultado("causa") if causa else (None, "", [])
+        )
 
         # Adjuntos
-        uploaded_file = data.get("attachments")
-        file_text = ""
-        if uploaded_file:
-            file_text = extract_text_from_upload(uploaded_file)
+        file_text = orq.resultado("adjuntos") if uploaded_file else ""
+        if file_text:
             print(f"[DEBUG] Texto extraído del archivo ({len(file_text)} chars)")
 
-        # 2) Crear/recuperar conversación
+        # 3) Crear/recuperar conversación
         if is_start:
             conversation = Conversation.objects.create(
                 user=request.user,
@@ -875,7 +1050,7 @@ class AsistenteJurisprudencia(APIView):
                     last_message_at=dj_tz.now(),
                 )
 
-        # 3) Mensaje de usuario
+        # 4) Mensaje de usuario
         user_msg = {
             "id": _new_msg_id("m"),
             "role": "user",
@@ -895,7 +1070,10 @@ class AsistenteJurisprudencia(APIView):
         conversation.last_message_at = user_msg["created_at"]
         conversation.save(update_fields=["updated_at", "last_message_at"])
 
-        # 4) Pseudo-hits de adjuntos
+        # El resumen del historial (puede llamar al LLM) corre mientras terminan las búsquedas
+        orq.lanzar("historial", summarize_conversation_history, conversation, user_msg["id"], default="")
+
+        # 5) Pseudo-hits de adjuntos
         pseudo_hits_from_attachments: List[Dict[str, Any]] = []
         if file_text:
             pseudo_hits_from_attachments.append(
@@ -911,104 +1089,48 @@ class AsistenteJurisprudencia(APIView):
                     "text": file_text[:5000],
                 }
             )
-
-        if causa_obj:
-            for doc in causa_obj.documentos.all()[:5]:
-                try:
-                    doc_text = ""
-                    if getattr(doc, "s3_key", None):
-                        # TODO: extracción de texto desde S3 si corresponde
-                        pass
-
-                    if not doc_text:
-                        doc_text = f"Documento: {doc.titulo or 'Sin título'}\n"
-                        tipo = (
-                            doc.get_tipo_documento_display()
-                            if hasattr(doc, "get_tipo_documento_display")
-                            else doc.tipo_documento
-                        )
-                        doc_text += f"Tipo: {tipo}\n"
-                        if doc.descripcion:
-                            doc_text += f"Descripción: {doc.descripcion}\n"
-                        doc_text += (
-                            "Fecha de subida: "
-                            f"{doc.fecha_subida.strftime('%d/%m/%Y') if doc.fecha_subida else 'No especificada'}"
-                        )
-
-                    pseudo_hits_from_attachments.append(
-                        {
-                            "doc_id": f"causa_doc::{doc.id}",
-                            "chunk_id": 0,
-                            "titulo": doc.titulo
-                            or f"Documento de {causa_obj.numero_expediente}",
-                            "tribunal": None,
-                            "fecha": doc.fecha_subida.strftime("%Y-%m-%d")
-                            if doc.fecha_subida
-                            else None,
-                            "link_origen": "",
-                            "s3_key_document": doc.s3_key,
-                            "score": 1.0,
-                            "text": doc_text[:5000],
-                        }
-                    )
-                except Exception:
-                    continue
+        pseudo_hits_from_attachments.extend(causa_doc_hits)
 
         hits: List[Dict[str, Any]] = []
         dbg: Dict[str, Any] = {}
 
-        # 5) Tavily primero (opcional)
+        # 6) Tavily (opcional)
         if use_tavily:
-            tavily_hits = search_with_tavily(q, max_results=5)
+            tavily_hits = orq.resultado("web")
             hits.extend(tavily_hits)
             if debug:
                 dbg["tavily"] = {"got_hits": len(tavily_hits)}
 
-        # 6) Búsqueda estricta PBA Laboral
+        # 7) Búsqueda estricta PBA Laboral
         if strict:
-            r1 = search_chunks_strict(
-                q,
-                k=10,
-                fuero="Laboral",
-                jurisdiccion="Provincia de Buenos Aires",
-                tribunal=f.get("tribunal"),
-                desde=f.get("desde"),
-                hasta=f.get("hasta"),
-                min_chars=160,
-                min_score=0.80,
-                max_per_doc=3,
-                debug=debug,
-            )
+            r1 = orq.resultado("estricta")
             hits.extend(r1["hits"])
             if debug:
                 dbg["strict"] = r1.get("debug")
 
-        # 7) Búsqueda estricta "suave"
+        # 8) Búsqueda estricta "suave"
         if not hits:
-            r2 = search_chunks_strict(
-                q,
-                k=8,
-                fuero="Laboral",
-                jurisdiccion=None,
-                tribunal=f.get("tribunal"),
-                desde=f.get("desde"),
-                hasta=f.get("hasta"),
-                min_chars=100,
-                min_score=0.75,
-                max_per_doc=2,
-                debug=debug,
-            )
+            orq.lanzar("estricta_suave", _estricta_suave, despues_de="embedding", default={"hits": []})
+            r2 = orq.resultado("estricta_suave")
             hits = r2["hits"]
             if debug:
                 dbg["strict_soft"] = r2.get("debug")
 
-        # 8) Vector-only
+        # 9) Vector-only
         if not hits:
-            hits = search_chunks(q, k=8, fuero=None, jurisdiccion=None, min_chars=80)
+            orq.lanzar("vectorial", _vectorial, despues_de="embedding", default=[])
+            hits = orq.resultado("vectorial")
             if debug:
                 dbg["vector_only"] = {"got_hits": len(hits)}
 
-        # 9) Añadir pseudo-hits al final
+        if debug:
+            dbg["fanout"] = orq.debug()
+            logger.debug("Fuentes del asistente: %s", dbg["fanout"])
+
+        # Fusión de chunks contiguos del mismo fallo + near-duplicates
+        hits = merge_passages(hits)
+
+        # Añadir pseudo-hits al final
         if pseudo_hits_from_attachments:
             hits = hits + pseudo_hits_from_attachments
 
@@ -1045,30 +1167,28 @@ class AsistenteJurisprudencia(APIView):
 
         # 11) LLM
         try:
-            conversation_context = summarize_conversation_history(
-                conversation, user_msg["id"]
-            )
+            conversation_context = orq.resultado("historial")
 
-            messages_llm = build_prompt(q, hits, causa_context=causa_context)
-
-            if conversation_context:
-                messages_llm.insert(
-                    1,
-                    {
-                        "role": "user",
-                        "content": f"{conversation_context}\n\nNueva consulta: {q}",
-                    },
-                )
+            # Prompt con presupuesto de tokens (historial y contexto de causa incluidos)
+            messages_llm, prompt_report = assemble_prompt(
+                q, hits, causa_context=causa_context, history=conversation_context
+            )
 
             client = get_openai_client()
             model = getattr(settings, "OPENAI_MODEL", "gpt-4o")
-            resp = client.chat.completions.create(
-                model=model,
-                messages=messages_llm,
-                max_tokens=1200,
-                temperature=0.1,
-            )
+            with liberar_conexion_db():
+                resp = client.chat.completions.create(
+                    model=model,
+                    messages=messages_llm,
+                    max_tokens=1200,
+                    temperature=0.1,
+                )
             answer = resp.choices[0].message.content
+            usage = getattr(resp, "usage", None)
+            if usage is not None:
+                prompt_report["usage_prompt_tokens"] = usage.prompt_tokens
+                prompt_report["usage_completion_tokens"] = usage.completion_tokens
+            logger.info("Prompt del asistente: %s", prompt_report)
         except Exception as e:
             assistant_msg = {
                 "id": _new_msg_id("m"),
@@ -1148,7 +1268,7 @@ def run_assistant_reply(conversation, user_message: str) -> str:
         max_per_doc=2,
         debug=False,
     )
-    hits = r.get("hits", [])
+    hits = merge_passages(r.get("hits", []))
 
     # Si no hay contexto, devolvemos un mensaje claro
     if not hits:
@@ -1184,12 +1304,13 @@ def run_assistant_reply(conversation, user_message: str) -> str:
     try:
         model = getattr(settings, "OPENAI_MODEL", "gpt-4o")
         client = get_openai_client()
-        resp = client.chat.completions.create(
-            model=model,
-            messages=messages,
-            max_tokens=900,
-            temperature=0.1,
-        )
+        with liberar_conexion_db():
+            resp = client.chat.completions.create(
+                model=model,
+                messages=messages,
+                max_tokens=900,
+                temperature=0.1,
+            )
         answer = resp.choices[0].message.content.strip()
     except Exception as e:
         return f"Ocurrió un error al generar la respuesta: {e}"
@@ -1217,6 +1338,9 @@ class ConversationDetailView(APIView):
         summary="Obtener una conversación (con mensajes)",
         tags=["conversaciones"],
     )
+    # El frontend la consulta en polling: If-None-Match vigente -> 304 (ver tesis_api/etag.py)
+    @method_decorator(etag(etag_conversacion))
+    @cachear_respuesta(GRUPO_CONVERSACIONES)
     def get(self, request, conversation_id: str):
         conv = get_object_or_404(Conversation, pk=conversation_id, user=request.user)
         # Assumimos related_name="messages" y ordering por created_at en el modelo o en el serializer
@@ -1266,7 +1390,8 @@ class ConversationsView(APIView):
         return Response({"items": data}, status=status.HTTP_200_OK)
 
     # POST /api/conversations  -> crea y devuelve CON mensajes
-    @transaction.atomic
+    # Sin @transaction.atomic en todo el método: la llamada al LLM corre fuera de
+    # transacción para poder soltar la conexión a la BD mientras tanto.
     def post(self, request):
         ser = ConversationCreateRequestSerializer(data=request.data)
         ser.is_valid(raise_exception=True)
@@ -1274,26 +1399,28 @@ class ConversationsView(APIView):
         title = ser.validated_data.get("title") or first_message[:60]
 
         now = timezone.now()
-        conv = Conversation.objects.create(
-            user=request.user,
-            title=title,
-            created_at=now, updated_at=now, last_message_at=now,
-        )
+        with transaction.atomic():
+            conv = Conversation.objects.create(
+                user=request.user,
+                title=title,
+                created_at=now, updated_at=now, last_message_at=now,
+            )
 
-        # mensaje del usuario
-        user_msg = Message.objects.create(
-            conversation=conv, role="user", content=first_message, created_at=now
-        )
+            # mensaje del usuario
+            user_msg = Message.objects.create(
+                conversation=conv, role="user", content=first_message, created_at=now
+            )
 
         # respuesta IA
         answer = run_assistant_reply(conv, first_message)
-        asst_msg = Message.objects.create(
-            conversation=conv, role="assistant", content=answer, created_at=timezone.now()
-        )
+        with transaction.atomic():
+            asst_msg = Message.objects.create(
+                conversation=conv, role="assistant", content=answer, created_at=timezone.now()
+            )
 
-        conv.updated_at = timezone.now()
-        conv.last_message_at = asst_msg.created_at
-        conv.save(update_fields=["updated_at", "last_message_at"])
+            conv.updated_at = timezone.now()
+            conv.last_message_at = asst_msg.created_at
+            conv.save(update_fields=["updated_at", "last_message_at"])
 
         detail = ConversationDetailSerializer(conv).data
         return Response(detail, status=status.HTTP_201_CREATED)
@@ -1312,7 +1439,7 @@ class ConversationMessageCreateView(APIView):
         summary="Enviar mensaje y recibir delta",
         tags=["conversaciones"],
     )
-    @transaction.atomic
+    # Sin @transaction.atomic: la llamada al LLM va fuera de transacción (ver ConversationsView.post)
     def post(self, request, conversation_id: str):
         conv = get_object_or_404(Conversation, pk=conversation_id, user=request.user)  
         ser = ConversationMessageCreateRequestSerializer(data=request.data)
@@ -1348,43 +1475,44 @@ class ConversationMessageCreateView(APIView):
 
         # 2) generar respuesta IA
         answer = run_assistant_reply(conv, content)
-        asst_msg = Message.objects.create(
-            conversation=conv,
-            role="assistant",
-            content=answer,
-            created_at=timezone.now(),
-        )
+        with transaction.atomic():
+            asst_msg = Message.objects.create(
+                conversation=conv,
+                role="assistant",
+                content=answer,
+                created_at=timezone.now(),
+            )
 
-        # 3) actualizar conv
-        conv.updated_at = timezone.now()
-        conv.last_message_at = asst_msg.created_at
-        conv.save(update_fields=["updated_at", "last_message_at"])
+            # 3) actualizar conv
+            conv.updated_at = timezone.now()
+            conv.last_message_at = asst_msg.created_at
+            conv.save(update_fields=["updated_at", "last_message_at"])
 
-        # 4) persistir idempotency
-        if idem_key:
-            # guardamos los mensajes para reuso futuro
-            # asumimos que IdempotencyKey tiene un JSONField `payload` o método helper.
-            IdempotencyKey.objects.create(
-                user=request.user,
-                key=idem_key,
-                target=f"conv:{conv.id}",
-                payload={
-                    "messages": [
-                        {
-                            "id": str(user_msg.id),
-                            "role": user_msg.role,
-                            "content": user_msg.content,
-                            "created_at": user_msg.created_at.isoformat().replace("+00:00", "Z"),
-                        },
-                        {
-                            "id": str(asst_msg.id),
-                            "role": asst_msg.role,
-                            "content": asst_msg.content,
-                            "created_at": asst_msg.created_at.isoformat().replace("+00:00", "Z"),
-                        },
-                    ]
-                }
-            )
+            # 4) persistir idempotency
+            if idem_key:
+                # guardamos los mensajes para reuso futuro
+                # asumimos que IdempotencyKey tiene un JSONField `payload` o método helper.
+                IdempotencyKey.objects.create(
+                    user=request.user,
+                    key=idem_key,
+                    target=f"conv:{conv.id}",
+                    payload={
+                        "messages": [
+                            {
+                                "id": str(user_msg.id),
+                                "role": user_msg.role,
+                                "content": user_msg.content,
+                                "created_at": user_msg.created_at.isoformat().replace("+00:00", "Z"),
+                            },
+                            {
+                                "id": str(asst_msg.id),
+                                "role": asst_msg.role,
+                                "content": asst_msg.content,
+                                "created_at": asst_msg.created_at.isoformat().replace("+00:00", "Z"),
+                            },
+                        ]
+                    }
+                )
 
         # 5) respuesta (SOLO mensajes nuevos)
         resp_ser = ConversationMessageCreateResponseSerializer(
@@ -0,0 +1,174 @@
+"""
+Búsqueda web con cache y backends intercambiables.
+
+- Backends: "tavily" (un único TavilyClient por proceso) y "stub" (local, sin red,
+  para tests y desarrollo). Se elige con settings.WEB_SEARCH_BACKEND (o un dotted path).
+- Cache por (query normalizada, dominios, profundidad, max_results) en el cache de
+  Django, con TTL settings.WEB_SEARCH_CACHE_TTL. Se cachean también los vacíos: así
+  una búsqueda restringida sin resultados no se repite en la siguiente pregunta igual.
+- `buscar_web` prueba primero la búsqueda restringida a dominios oficiales y, si no
+  trae nada, la abierta. Con settings.WEB_SEARCH_PARALELO salen las dos a la vez
+  (menos latencia al caer a la abierta, a costa de una llamada extra al backend).
+"""
+import hashlib
+import json
+import logging
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DOMINIOS_OFICIALES = ["argentina.gob.ar", "infoleg.gob.ar", "csjn.gov.ar", "boletinoficial.gob.ar"]
+
+
+# ---------- backends ----------
+class BackendTavily:
+    nombre = "tavily"
+
+    def __init__(self):
+        self._cliente = None
+        self._lock = threading.Lock()
+
+    def _client(self):
+        if self._cliente is None:
+            with self._lock:
+                if self._cliente is None:
+                    from tavily import TavilyClient
+
+                    self._cliente = TavilyClient(api_key=settings.TAVILY_API_KEY)
+        return self._cliente
+
+    def buscar(self, query, dominios=None, profundidad="advanced", max_results=5):
+        kwargs = {"query": query, "search_depth": profundidad, "max_results": max_results}
+        if dominios:
+            kwargs["include_domains"] = list(dominios)
+        return self._client().search(**kwargs).get("results", [])
+
+
+class BackendStub:
+    """
+    Backend local: devuelve `resultados[query]` si se cargó (o settings.WEB_SEARCH_STUB_RESULTADOS),
+    si no un resultado sintético por dominio. Registra las llamadas en `llamadas`.
+    """
+    nombre = "stub"
+
+    def __init__(self, resultados=None):
+        self.resultados = dict(resultados or getattr(settings, "WEB_SEARCH_STUB_RESULTADOS", {}) or {})
+        self.llamadas = []
+
+    def buscar(self, query, dominios=None, profundidad="advanced", max_results=5):
+        self.llamadas.append({"query": query, "dominios": list(dominios or []), "profundidad": profundidad})
+        if query in self.resultados:
+            return list(self.resultados[query])[:max_results]
+        fuentes = list(dominios or ["example.org"])
+        return [
+            {"title": f"Resultado stub {i + 1}", "url": f"https://{d}/stub/{i + 1}",
+             "content": f"Contenido de prueba para: {query}", "score": round(0.9 - 0.1 * i, 2)}
+            for i, d in enumerate(fuentes[:max_results])
+        ]
+
+
+BACKENDS = {"tavily": BackendTavily, "stub": BackendStub}
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                nombre = getattr(settings, "WEB_SEARCH_BACKEND", "tavily")
+                clase = BACKENDS.get(nombre) or import_string(nombre)
+                _backend = clase()
+    return _backend
+
+
+def set_backend(backend):
+    """Reemplaza el backend del proceso (tests: `set_backend(BackendStub({...}))`). Devuelve el anterior."""
+    global _backend
+    anterior, _backend = _backend, backend
+    return anterior
+
+
+# ---------- cache ----------
+def normalizar_query(query):
+    q = unicodedata.normalize("NFKC", query or "").lower()
+    return " ".join(q.split())
+
+
+def clave_cache(query, dominios, profundidad, max_results):
+    raw = json.dumps(
+        [normalizar_query(query), sorted(dominios or []), profundidad, max_results],
+        ensure_ascii=False, separators=(",", ":"),
+    )
+    return "websearch:" + hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _cache():
+    return caches[getattr(settings, "WEB_SEARCH_CACHE_ALIAS", "default")]
+
+
+def buscar_cacheado(query, dominios=None, profundidad="advanced", max_results=5):
+    """Una búsqueda (restringida o no) pasando por el cache. Errores del backend -> []."""
+    clave = clave_cache(query, dominios, profundidad, max_results)
+    cache = _cache()
+    resultados = cache.get(clave)
+    if resultados is not None:
+        return resultados
+    try:
+        resultados = get_backend().buscar(query, dominios=dominios, profundidad=profundidad, max_results=max_results)
+    except Exception as e:
+        logger.warning("Búsqueda web fallida (%s): %s", getattr(get_backend(), "nombre", "?"), e)
+        return []  # los errores no se cachean
+    cache.set(clave, resultados, getattr(settings, "WEB_SEARCH_CACHE_TTL", 6 * 3600))
+    return resultados
+
+
+# ---------- búsqueda restringida + abierta ----------
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _executor():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=getattr(settings, "WEB_SEARCH_MAX_WORKERS", 8), thread_name_prefix="websearch"
+                )
+    return _pool
+
+
+def buscar_web(query, max_results=5, profundidad="advanced", dominios=DOMINIOS_OFICIALES, paralelo=None):
+    """
+    Resultados crudos del backend ({title, url, content, score}). Prefiere los de
+    `dominios`; si no hay, los de la web abierta. Con `paralelo` ambas búsquedas
+    salen a la vez y la latencia es la de la restringida (o la mayor de las dos si
+    hay que caer a la abierta), en vez de la suma.
+    """
+    if paralelo is None:
+        paralelo = getattr(settings, "WEB_SEARCH_PARALELO", False)
+    if not dominios:
+        return buscar_cacheado(query, None, profundidad, max_results)
+
+    if not paralelo:
+        return (buscar_cacheado(query, dominios, profundidad, max_results)
+                or buscar_cacheado(query, None, profundidad, max_results))
+
+    pool = _executor()
+    restringida = pool.submit(buscar_cacheado, query, dominios, profundidad, max_results)
+    abierta = pool.submit(buscar_cacheado, query, None, profundidad, max_results)
+    resultados = restringida.result()
+    if resultados:
+        # No se espera a la abierta: se cancela si todavía no arrancó; si ya estaba
+        # corriendo termina en segundo plano y su resultado queda cacheado
+        abierta.cancel()
+        return resultados
+    return abierta.result()
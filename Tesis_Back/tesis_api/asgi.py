@@ -14,3 +14,11 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tesis_api.settings')
 
 application = get_asgi_application()
+
+# Solo en el servidor (no en manage.py / celery): con gunicorn --preload se comparten entre workers
+from django.conf import settings  # noqa: E402
+
+if settings.CLASIFICADOR_PRECARGAR:
+    from causa.clasificador import precargar
+
+    precargar()
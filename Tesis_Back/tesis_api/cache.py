@@ -0,0 +1,243 @@
+"""
+Cache de respuestas GET de la API, en dos niveles.
+
+- L1: memoria del proceso (alias "local"), TTL corto. Evita ir a la red por los
+  payloads grandes (detalle de causa, conversación con mensajes).
+- L2: cache compartido entre procesos (alias "default", Redis). Sin CACHE_REDIS_URL
+  el cache de respuestas queda apagado (API_CACHE=false): con memoria local la
+  invalidación no llegaría a los otros workers. Los tests lo prenden a mano.
+
+Claves por usuario y versionadas:
+
+    api:<vista>:u<user_id>:v<versión>:<hash de path + query + día>
+
+Invalidación: al guardar/borrar Causa, EventoProcesal, Documento, Task (y los
+modelos que se ven anidados en esos payloads, ver INVALIDAR) se incrementa la
+versión del grupo para cada usuario dueño. Las entradas viejas quedan
+inalcanzables y expiran solas por TTL. La versión vive en L2 y se lee en cada
+request, así un cambio hecho en otro proceso se ve enseguida también en L1.
+
+Uso:
+
+    @cachear_respuesta("causas")
+    def timeline(self, request, pk=None): ...
+
+Aciertos/fallos por vista: metricas() (comando `metricas_cache`).
+"""
+import functools
+import hashlib
+import logging
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from rest_framework import status
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+GRUPO_CAUSAS = "causas"
+GRUPO_CONVERSACIONES = "conversaciones"
+
+# Vistas decoradas (para reportar métricas aunque todavía no tengan tráfico)
+_VISTAS = set()
+
+
+def _local():
+    return caches["local"]
+
+
+def _compartido():
+    return caches["default"]
+
+
+def habilitado() -> bool:
+    return getattr(settings, "API_CACHE", False)
+
+
+# ---------- versiones por (grupo, usuario) ----------
+def _clave_version(grupo, user_id):
+    return f"api:ver:{grupo}:u{user_id}"
+
+
+def version(grupo, user_id) -> int:
+    """
+    Versión actual del grupo para el usuario. Si la clave no existe (primera vez o
+    el backend la desalojó) arranca en el timestamp en ms: nunca vuelve a un valor
+    ya usado, así no reaparecen entradas viejas.
+    """
+    c = _compartido()
+    clave = _clave_version(grupo, user_id)
+    v = c.get(clave)
+    if v is None:
+        c.add(clave, int(time.time() * 1000), timeout=None)
+        v = c.get(clave)
+    return v
+
+
+def invalidar(grupo, user_id):
+    """Descarta (por versión) todo lo cacheado del grupo para ese usuario."""
+    c = _compartido()
+    clave = _clave_version(grupo, user_id)
+    try:
+        c.incr(clave)
+    except ValueError:  # no existía: cualquier valor nuevo ya invalida
+        c.set(clave, int(time.time() * 1000), timeout=None)
+
+
+# ---------- métricas ----------
+def _contar(vista, resultado):
+    c = _compartido()
+    clave = f"api:met:{vista}:{resultado}"
+    try:
+        c.incr(clave)
+    except ValueError:
+        if not c.add(clave, 1, timeout=None):
+            c.incr(clave)
+
+
+def metricas():
+    """{vista: {"l1", "l2", "fallos", "tasa"}} con los contadores acumulados en L2."""
+    c = _compartido()
+    out = {}
+    for vista in sorted(_VISTAS):
+        valores = c.get_many([f"api:met:{vista}:{r}" for r in ("l1", "l2", "fallos")])
+        l1, l2, fallos = (valores.get(f"api:met:{vista}:{r}", 0) for r in ("l1", "l2", "fallos"))
+        total = l1 + l2 + fallos
+        out[vista] = {"l1": l1, "l2": l2, "fallos": fallos, "tasa": round((l1 + l2) / total, 4) if total else None}
+    return out
+
+
+def reiniciar_metricas():
+    _compartido().delete_many([f"api:met:{v}:{r}" for v in _VISTAS for r in ("l1", "l2", "fallos")])
+
+
+# ---------- decorador ----------
+def _clave_respuesta(vista, grupo, request):
+    uid = request.user.pk
+    query = sorted(request.query_params.lists())
+    # El día entra en la clave: "próximos" y similares dependen de la fecha de hoy
+    # (el host también: los links de paginación son absolutos). Si la vista tiene
+    # ETag (tesis_api/etag.py), también: un ETag nuevo nunca reusa un cuerpo viejo
+    etag = getattr(request, "etag_vigente", "")
+    h = hashlib.sha1(
+        f"{request.get_host()}{request.path}?{query}@{date.today().isoformat()}#{etag}".encode()
+    ).hexdigest()[:20]
+    return f"api:{vista}:u{uid}:v{version(grupo, uid)}:{h}"
+
+
+def cachear_respuesta(grupo, ttl=None, ttl_local=None):
+    """
+    Cachea el `response.data` de un GET exitoso (200) por usuario, en L1 y L2.
+    Va debajo de @action / @extend_schema. Requests anónimos o no-GET pasan de largo.
+    """
+    def deco(fn):
+        vista = fn.__qualname__.replace(".", ":")
+        _VISTAS.add(vista)
+
+        @functools.wraps(fn)
+        def wrapper(self, request, *args, **kwargs):
+            if not habilitado() or request.method != "GET" or not request.user.is_authenticated:
+                return fn(self, request, *args, **kwargs)
+            try:
+                clave = _clave_respuesta(vista, grupo, request)
+                data = _local().get(clave)
+                if data is not None:
+                    _contar(vista, "l1")
+                    return Response(data, headers={"X-Cache": "HIT-L1"})
+                data = _compartido().get(clave)
+                if data is not None:
+                    _contar(vista, "l2")
+                    _local().set(clave, data, ttl_local or settings.API_CACHE_LOCAL_TTL)
+                    return Response(data, headers={"X-Cache": "HIT-L2"})
+            except Exception as e:
+                # Cache caído: se responde igual desde la base
+                logger.warning("Cache de respuestas no disponible: %s", e)
+                return fn(self, request, *args, **kwargs)
+
+            response = fn(self, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                try:
+                    _contar(vista, "fallos")
+                    _compartido().set(clave, response.data, ttl or settings.API_CACHE_TTL)
+                    _local().set(clave, response.data, ttl_local or settings.API_CACHE_LOCAL_TTL)
+                    response["X-Cache"] = "MISS"
+                except Exception as e:
+                    logger.warning("No se pudo guardar en el cache de respuestas: %s", e)
+            return response
+
+        return wrapper
+
+    return deco
+
+
+# ---------- invalidación por signals ----------
+def _duenio_causa(causa_id):
+    from causa.models import Causa
+
+    if not causa_id:
+        return []
+    return list(Causa.objects.filter(pk=causa_id).values_list("creado_por_id", flat=True))
+
+
+def _duenios_causas(**filtro):
+    from causa.models import Causa
+
+    return list(Causa.objects.filter(**filtro).order_by().values_list("creado_por_id", flat=True).distinct())
+
+
+def _duenios_resumen(summary_run_id):
+    from ia.models import SummaryRun
+
+    fila = SummaryRun.objects.filter(pk=summary_run_id).values_list("created_by_id", "causa__creado_por_id").first()
+    return [uid for uid in (fila or ()) if uid]
+
+
+def _duenio_conversacion(conversation_id):
+    from ia.models import Conversation
+
+    return list(Conversation.objects.filter(pk=conversation_id).values_list("user_id", flat=True))
+
+
+# modelo -> (grupo, fn(instancia) -> ids de usuarios afectados)
+INVALIDAR = {
+    "causa.Causa": (GRUPO_CAUSAS, lambda i: [i.creado_por_id]),
+    "causa.EventoProcesal": (GRUPO_CAUSAS, lambda i: _duenio_causa(i.causa_id)),
+    "causa.Documento": (GRUPO_CAUSAS, lambda i: _duenio_causa(i.causa_id)),
+    "tasks.Task": (GRUPO_CAUSAS, lambda i: _duenio_causa(i.causa_id)),
+    # Anidados en el detalle de la causa / timeline / trazabilidad / resúmenes
+    "causa.CausaParte": (GRUPO_CAUSAS, lambda i: _duenio_causa(i.causa_id)),
+    "causa.CausaProfesional": (GRUPO_CAUSAS, lambda i: _duenio_causa(i.causa_id)),
+    "causa.CausaGrafo": (GRUPO_CAUSAS, lambda i: _duenio_causa(i.causa_id)),
+    "causa.Parte": (GRUPO_CAUSAS, lambda i: _duenios_causas(partes__parte_id=i.pk)),
+    "causa.Profesional": (GRUPO_CAUSAS, lambda i: _duenios_causas(profesionales__profesional_id=i.pk)),
+    "trazability.Move": (GRUPO_CAUSAS, lambda i: _duenio_causa(i.causa_id)),
+    "ia.SummaryRun": (GRUPO_CAUSAS, lambda i: {i.created_by_id, *_duenio_causa(i.causa_id)} - {None}),
+    "ia.VerificationResult": (GRUPO_CAUSAS, lambda i: _duenios_resumen(i.summary_run_id)),
+    "ia.Conversation": (GRUPO_CONVERSACIONES, lambda i: [i.user_id] if i.user_id else []),
+    "ia.Message": (GRUPO_CONVERSACIONES, lambda i: _duenio_conversacion(i.conversation_id)),
+}
+
+
+def _al_cambiar(sender, instance, **kwargs):
+    grupo, usuarios = INVALIDAR[sender._meta.label]
+    try:
+        ids = set(usuarios(instance))
+    except Exception as e:
+        logger.warning("No se pudo resolver a quién invalidar (%s): %s", sender._meta.label, e)
+        return
+    for uid in ids:
+        # Al commit: si se invalidara antes, un GET concurrente podría volver a
+        # cachear datos viejos con la versión nueva
+        transaction.on_commit(functools.partial(invalidar, grupo, uid), robust=True)
+
+
+def conectar_signals():
+    """Se llama desde CausaConfig.ready(). Los senders son perezosos ("app.Modelo")."""
+    for label in INVALIDAR:
+        for signal in (post_save, post_delete):
+            signal.connect(_al_cambiar, sender=label, weak=False,
+                           dispatch_uid=f"api_cache:{signal is post_save}:{label}")
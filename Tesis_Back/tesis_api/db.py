@@ -0,0 +1,34 @@
+"""
+Utilidades de conexión a la base de datos.
+
+Las vistas que llaman a OpenAI tardan segundos esperando al modelo sin tocar la
+base; si mientras tanto retienen su conexión, unos pocos requests lentos agotan el
+pool (o las conexiones de Postgres). `liberar_conexion_db` la devuelve antes de la
+llamada; la próxima query del request toma otra. Solo está activo con pool
+(psycopg_pool o PgBouncer, settings.DB_LIBERAR_EN_LLM): sin pool, cerrar la
+conexión anularía CONN_MAX_AGE y cada request pagaría una conexión nueva.
+"""
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+
+def liberar_conexiones():
+    """Devuelve al pool (o cierra) las conexiones de este hilo que no estén dentro de una transacción."""
+    if not getattr(settings, "DB_LIBERAR_EN_LLM", False):
+        return
+    for conn in connections.all(initialized_only=True):
+        # Dentro de atomic() no se puede: se perdería la transacción en curso
+        if conn.connection is not None and not conn.in_atomic_block:
+            conn.close()
+
+
+@contextmanager
+def liberar_conexion_db():
+    """
+    with liberar_conexion_db():
+        resp = client.chat.completions.create(...)
+    """
+    liberar_conexiones()
+    yield
@@ -0,0 +1,102 @@
+"""
+ETags baratos para los GET pesados que el frontend consulta seguido (polling).
+
+El ETag sale de timestamps y conteos agregados en UNA query (subconsultas sobre
+los índices por causa / conversación), sin cargar ni serializar el payload. Se
+enchufa con el decorador estándar de Django, que con If-None-Match igual
+responde 304 sin llamar a la vista:
+
+    @method_decorator(etag(etag_conversacion))
+    def get(self, request, conversation_id): ...
+
+Los conteos cubren los borrados; eventos y documentos tienen `actualizado_en`.
+Con el cache de respuestas activo (Redis) se suma además su versión por usuario
+(tesis_api/cache.py), que también cubre lo que no tiene timestamp (p.ej. editar
+una parte).
+
+El ETag calculado queda en `request.etag_vigente` y entra en la clave del cache
+de respuestas: un ETag nuevo nunca se sirve con un cuerpo cacheado antes del cambio.
+"""
+import hashlib
+
+from django.conf import settings
+from django.db.models import Count, Max, OuterRef, Subquery
+
+from causa.models import Causa, CausaGrafo, CausaParte, CausaProfesional, Documento, EventoProcesal
+from ia.models import Conversation, Message, SummaryRun, VerificationResult
+from tasks.models import Task
+from trazability.models import Move
+
+from .cache import GRUPO_CAUSAS, version
+
+# Subir si cambia la forma de los payloads: invalida los ETags que tengan los clientes
+FORMATO = 1
+
+
+def etag_de(*valores) -> str:
+    return hashlib.sha1(repr((FORMATO,) + valores).encode()).hexdigest()[:32]
+
+
+def _recordar(request, valor):
+    request.etag_vigente = valor
+    return valor
+
+
+def _agregado(modelo, fk, agregado):
+    return Subquery(
+        modelo.objects.filter(**{fk: OuterRef("pk")})
+        .order_by().values(fk).annotate(v=agregado).values("v")[:1]
+    )
+
+
+def _ultimo(modelo, campo, fk="causa"):
+    return _agregado(modelo, fk, Max(campo))
+
+
+def _cuantos(modelo, fk="causa"):
+    return _agregado(modelo, fk, Count("pk"))
+
+
+def etag_causa(request, pk=None, **kwargs):
+    """Detalle de causa (CausaViewSet.retrieve). None -> sigue la vista (404 / 400)."""
+    if not request.user.is_authenticated:
+        return None
+    try:
+        fila = (
+            Causa.objects.filter(pk=pk, creado_por=request.user)
+            .annotate(
+                ev=_ultimo(EventoProcesal, "actualizado_en"), ev_n=_cuantos(EventoProcesal),
+                doc=_ultimo(Documento, "actualizado_en"), doc_n=_cuantos(Documento),
+                task=_ultimo(Task, "updated_at"), task_n=_cuantos(Task),
+                sr=_ultimo(SummaryRun, "updated_at"), sr_n=_cuantos(SummaryRun),
+                ver=_ultimo(VerificationResult, "created_at", fk="summary_run__causa"),
+                mov=_ultimo(Move, "timestamp"),
+                grafo=_ultimo(CausaGrafo, "actualizado_en"),
+                partes_n=_cuantos(CausaParte), prof_n=_cuantos(CausaProfesional),
+            )
+            .values_list(
+                "actualizado_en", "ev", "ev_n", "doc", "doc_n", "task", "task_n",
+                "sr", "sr_n", "ver", "mov", "grafo", "partes_n", "prof_n",
+            )
+            .first()
+        )
+    except (TypeError, ValueError):  # pk no numérico
+        return None
+    if fila is None:
+        return None
+    extra = version(GRUPO_CAUSAS, request.user.pk) if getattr(settings, "API_CACHE", False) else None
+    return _recordar(request, etag_de(fila, extra))
+
+
+def etag_conversacion(request, conversation_id=None, **kwargs):
+    """Conversación con mensajes (ConversationDetailView.get). Los mensajes no se editan."""
+    if not request.user.is_authenticated:
+        return None
+    fila = (
+        Conversation.objects.filter(pk=conversation_id, user=request.user)
+        .annotate(ultimo=_ultimo(Message, "created_at", fk="conversation"),
+                  n=_cuantos(Message, fk="conversation"))
+        .values_list("title", "updated_at", "last_message_at", "ultimo", "n")
+        .first()
+    )
+    return None if fila is None else _recordar(request, etag_de(fila))
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 from pathlib import Path
 
 import environ
+import json
 import os
 import dj_database_url
 import openai
@@ -132,6 +133,84 @@ DATABASES = {
     }
  }
 
+# === Conexiones a la BD (ver tesis_api/db.py) ===
+# Con psycopg 3 + psycopg_pool: pool por proceso (Django >= 5.1). Dimensionarlo por
+# worker: hilos del servidor + hilos del asistente (ASISTENTE_MAX_WORKERS) que
+# consultan en paralelo; con N workers el total es N × DB_POOL_MAX_SIZE.
+# Sin psycopg 3: conexiones persistentes (CONN_MAX_AGE) con health check.
+# DB_PGBOUNCER=true: detrás de PgBouncer en modo transaction (sin cursores del lado
+# del servidor ni prepared statements, el pool lo hace PgBouncer).
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() == "true"
+try:
+    import psycopg  # noqa: F401
+    _PSYCOPG3 = True
+except ImportError:
+    _PSYCOPG3 = False
+
+DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+if DB_PGBOUNCER:
+    DATABASES["default"]["CONN_MAX_AGE"] = int(os.getenv("DB_CONN_MAX_AGE", "0"))
+    DATABASES["default"]["DISABLE_SERVER_SIDE_CURSORS"] = True
+    if _PSYCOPG3:
+        DATABASES["default"]["OPTIONS"] = {"prepare_threshold": None}
+elif _PSYCOPG3:
+    # Prepared statements automáticos para las queries que se repiten (las búsquedas
+    # vectoriales). DB_SERVER_SIDE_BINDING=true (opt-in: Django advierte que algunas
+    # queries fallan con parámetros ligados en el servidor) además manda los embeddings
+    # en binario vía el adaptador de pgvector (ver ia/apps.py).
+    DATABASES["default"]["OPTIONS"] = {
+        "server_side_binding": os.getenv("DB_SERVER_SIDE_BINDING", "false").lower() == "true",
+        "prepare_threshold": int(os.getenv("DB_PREPARE_THRESHOLD", "5")),
+    }
+    try:
+        from psycopg_pool import ConnectionPool
+
+        if os.getenv("DB_POOL", "true").lower() == "true":
+            DATABASES["default"]["OPTIONS"]["pool"] = {
+                "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+                "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "12")),
+                "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),   # espera máx. por una conexión
+                "max_idle": float(os.getenv("DB_POOL_MAX_IDLE", "300")),
+                "max_lifetime": float(os.getenv("DB_POOL_MAX_LIFETIME", "1800")),
+                "check": ConnectionPool.check_connection,              # health check al prestar
+            }
+    except ImportError:
+        pass
+if "pool" not in DATABASES["default"].get("OPTIONS", {}) and not DB_PGBOUNCER:
+    # Django no admite CONN_MAX_AGE junto con el pool
+    DATABASES["default"]["CONN_MAX_AGE"] = int(os.getenv("DB_CONN_MAX_AGE", "60"))
+# Soltar la conexión mientras responde el LLM: solo conviene si vuelve a un pool
+# (psycopg_pool o PgBouncer); con conexiones persistentes se cerraría y reabriría
+_DB_CON_POOL = "pool" in DATABASES["default"].get("OPTIONS", {}) or DB_PGBOUNCER
+DB_LIBERAR_EN_LLM = os.getenv("DB_LIBERAR_EN_LLM", "true" if _DB_CON_POOL else "false").lower() == "true"
+
+# === Cache (ver tesis_api/cache.py) ===
+# "default": compartido entre procesos (Redis si CACHE_REDIS_URL, requiere el paquete
+# `redis`; si no, memoria local: desarrollo y tests). "local": memoria del proceso,
+# primer nivel del cache de respuestas de la API.
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "")
+CACHES = {
+    "default": (
+        {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": CACHE_REDIS_URL, "KEY_PREFIX": "tesis"}
+        if CACHE_REDIS_URL else
+        {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "tesis-default"}
+    ),
+    "local": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "tesis-local",
+        "OPTIONS": {"MAX_ENTRIES": int(os.getenv("CACHE_LOCAL_MAX_ENTRIES", "2000"))},
+    },
+}
+# El cache de respuestas se invalida subiendo una versión en "default": con memoria
+# local cada worker tendría la suya y los demás seguirían sirviendo datos viejos.
+# Por eso solo se activa con Redis (los tests lo prenden con override_settings).
+API_CACHE = os.getenv("API_CACHE", "true" if CACHE_REDIS_URL else "false").lower() == "true"
+if API_CACHE and not CACHE_REDIS_URL:
+    from django.core.exceptions import ImproperlyConfigured
+    raise ImproperlyConfigured("API_CACHE=true requiere CACHE_REDIS_URL (cache compartido entre procesos)")
+API_CACHE_TTL = int(os.getenv("API_CACHE_TTL", "300"))             # segundos en L2
+API_CACHE_LOCAL_TTL = int(os.getenv("API_CACHE_LOCAL_TTL", "30"))  # segundos en L1
+
 # DATABASES = {"default": env.db("DATABASE_URL")}
 # DATABASES["default"]["CONN_MAX_AGE"] = 600
 # # Asegurar SSL en Render
@@ -272,12 +351,15 @@ app.config_from_object("django.conf:settings", namespace="CELERY")
 # Auto-descubre tasks en las apps (ej: ia/tasks.py)
 app.autodiscover_tasks()
 
-# Configuración Celery en modo "eager" (sin broker)
-CELERY_BROKER_URL = "memory://"
-CELERY_RESULT_BACKEND = "cache+memory://"
+# Configuración Celery: sin CELERY_BROKER_URL, modo "eager" (sin broker): las tareas
+# (.delay / on_commit) corren en el mismo proceso y el request las espera
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "memory://")
+CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", "cache+memory://")
 
-# Fuerza ejecución inmediata
-CELERY_TASK_ALWAYS_EAGER = True
+# Fuerza ejecución inmediata (salvo que haya broker y workers)
+CELERY_TASK_ALWAYS_EAGER = os.getenv(
+    "CELERY_TASK_ALWAYS_EAGER", "true" if CELERY_BROKER_URL == "memory://" else "false"
+).lower() == "true"
 CELERY_TASK_EAGER_PROPAGATES = True
 # === IA: proveedor LOCAL por defecto (no usa internet) ===
 SUMMARIZER_PROVIDER = os.getenv("SUMMARIZER_PROVIDER", "LOCAL")  # LOCAL | HF | OLLAMA
@@ -313,6 +395,20 @@ GPT_GRAMMAR_MODEL = os.getenv("GPT_GRAMMAR_MODEL", "gpt-4o-mini")
 GRAMMAR_MAX_TOKENS = int(os.getenv("GRAMMAR_MAX_TOKENS", "800"))
 GRAMMAR_MAX_LINES_PER_PAGE = int(os.getenv("GRAMMAR_MAX_LINES_PER_PAGE", "400"))
 
+# === Calendario judicial (días hábiles, ver causa/calendario.py) ===
+# Días inhábiles puntuales además de feriados y ferias (ISO, separados por coma), p.ej. asuetos por acordada
+FERIADOS_EXTRA = [d.strip() for d in os.getenv("FERIADOS_EXTRA", "").split(",") if d.strip()]
+
+# === Clasificador ML de etapas (ver causa/clasificador.py) ===
+# Cargar los modelos al arrancar el servidor: solo lo miran tesis_api/wsgi.py y asgi.py,
+# así manage.py y celery no los cargan (con gunicorn --preload se comparten entre
+# workers). En false se cargan en la primera clasificación.
+CLASIFICADOR_PRECARGAR = os.getenv("CLASIFICADOR_PRECARGAR", "true").lower() == "true"
+CLASIFICADOR_CACHE_SIZE = int(os.getenv("CLASIFICADOR_CACHE_SIZE", "4096"))  # resultados cacheados por hash de texto
+ML_MODELS_DIR = os.getenv("ML_MODELS_DIR", "")  # raíz del registro de modelos (default: causa/ml_models)
+ML_RECARGA_SEGUNDOS = float(os.getenv("ML_RECARGA_SEGUNDOS", "10"))  # cada cuánto se relee CURRENT/SHADOW
+ML_METRICAS_SEGUNDOS = float(os.getenv("ML_METRICAS_SEGUNDOS", "300"))  # cada cuánto se vuelcan métricas a la BD
+
 
 # Credenciales de AWS
 AWS_ACCESS_KEY_ID = env('AWS_ACCESS_KEY_ID')
@@ -338,4 +434,56 @@ AWS_QUERYSTRING_AUTH = False
 
 
 #Credenciales Tavily
-TAVILY_API_KEY = env('TAVILY_API_KEY')
\ No newline at end of file
+TAVILY_API_KEY = env('TAVILY_API_KEY')
+
+# === Búsqueda web (ver ia/web_search.py) ===
+WEB_SEARCH_BACKEND = os.getenv("WEB_SEARCH_BACKEND", "tavily")  # "tavily" | "stub" | dotted path
+WEB_SEARCH_CACHE_ALIAS = os.getenv("WEB_SEARCH_CACHE_ALIAS", "default")
+WEB_SEARCH_CACHE_TTL = int(os.getenv("WEB_SEARCH_CACHE_TTL", str(6 * 3600)))  # segundos
+WEB_SEARCH_PARALELO = os.getenv("WEB_SEARCH_PARALELO", "false").lower() == "true"  # restringida y abierta a la vez (2 llamadas)
+WEB_SEARCH_MAX_WORKERS = int(os.getenv("WEB_SEARCH_MAX_WORKERS", "8"))
+
+# === Asistente de jurisprudencia: fan-out de fuentes (ver ia/orquestador.py) ===
+ASISTENTE_DEADLINE = float(os.getenv("ASISTENTE_DEADLINE", "20"))  # segundos para todas las fuentes
+ASISTENTE_MAX_WORKERS = int(os.getenv("ASISTENTE_MAX_WORKERS", "8"))
+# Lanzar de entrada las búsquedas de respaldo (suave / vector-only) en vez de esperar a que falle la
+# estricta: menos latencia cuando la estricta no alcanza, a costo de triplicar las búsquedas vectoriales
+ASISTENTE_FANOUT_ESPECULATIVO = os.getenv("ASISTENTE_FANOUT_ESPECULATIVO", "false").lower() == "true"
+# Timeouts por fuente, p.ej. '{"web": 5, "historial": 8}'
+ASISTENTE_TIMEOUTS = json.loads(os.getenv("ASISTENTE_TIMEOUTS", "{}"))
+
+# Historial de conversaciones: mensajes completos recientes + resumen incremental
+CONVERSATION_RECENT_WINDOW = int(os.getenv("CONVERSATION_RECENT_WINDOW", "5"))
+CONVERSATION_SUMMARY_BATCH = int(os.getenv("CONVERSATION_SUMMARY_BATCH", "4"))  # mensajes por llamada de resumen
+CONVERSATION_SUMMARY_MODEL = os.getenv("CONVERSATION_SUMMARY_MODEL", "gpt-4o-mini")
+# Presupuesto de tokens de entrada por request del asistente (ver ia/qa.py: assemble_prompt)
+PROMPT_MAX_INPUT_TOKENS = int(os.getenv("PROMPT_MAX_INPUT_TOKENS", "8000"))
+
+# === Rerank local de candidatos (ver ia/rerank.py) ===
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "50"))      # candidatos a sobre-pedir
+RERANK_MIN_SCORE = float(os.getenv("RERANK_MIN_SCORE", "0.65"))    # umbral coseno del sobre-pedido
+RERANK_SCORER = os.getenv("RERANK_SCORER", "features")             # "features" | "onnx"
+RERANK_ONNX_MODEL = os.getenv("RERANK_ONNX_MODEL", "")             # .onnx con tokenizer.json al lado
+RERANK_ONNX_THREADS = int(os.getenv("RERANK_ONNX_THREADS", "0"))   # 0 = lo que decida onnxruntime
+RERANK_WEIGHTS = json.loads(os.getenv("RERANK_WEIGHTS", "{}"))     # p.ej. '{"bm25": 0.4}'
+
+# === Embeddings (ver ia/embeddings.py) ===
+EMBEDDINGS_PROVIDER = os.getenv("EMBEDDINGS_PROVIDER", "openai")  # "openai" | "fake" | dotted path
+# Proveedor local en CPU (EMBEDDINGS_PROVIDER=local): ONNX si hay ruta, si no sentence-transformers
+EMBEDDINGS_ONNX_MODEL = os.getenv("EMBEDDINGS_ONNX_MODEL", "")  # .onnx con tokenizer.json al lado
+EMBEDDINGS_LOCAL_MODEL = os.getenv("EMBEDDINGS_LOCAL_MODEL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+EMBEDDINGS_LOCAL_NAME = os.getenv("EMBEDDINGS_LOCAL_NAME", "")  # nombre guardado por chunk (default: derivado del modelo)
+EMBEDDINGS_LOCAL_DIM = int(os.getenv("EMBEDDINGS_LOCAL_DIM", "384"))
+EMBEDDINGS_LOCAL_BATCH = int(os.getenv("EMBEDDINGS_LOCAL_BATCH", "32"))
+EMBEDDINGS_THREADS = int(os.getenv("EMBEDDINGS_THREADS", "4"))
+
+# === Búsqueda vectorial (ver ia/retrieval.py: _knn_sql) ===
+RETRIEVAL_MODO = os.getenv("RETRIEVAL_MODO", "exacto")  # "exacto" | "compacto" | "binario" (dos etapas)
+RETRIEVAL_FACTOR_CANDIDATOS = int(os.getenv("RETRIEVAL_FACTOR_CANDIDATOS", "4"))  # candidatos de la etapa gruesa
+RETRIEVAL_FACTOR_BINARIO = int(os.getenv("RETRIEVAL_FACTOR_BINARIO", "10"))  # idem con Hamming (más ruidosa)
+EMBEDDINGS_COMPACT_DIM = int(os.getenv("EMBEDDINGS_COMPACT_DIM", "512"))  # 0 = mismo largo que el embedding
+RETRIEVAL_EF_SEARCH = int(os.getenv("RETRIEVAL_EF_SEARCH", "100"))  # mínimo de hnsw.ef_search por búsqueda
+# pgvector >= 0.8: "relaxed_order" | "strict_order" | "off" (búsquedas filtradas que no se quedan cortas)
+RETRIEVAL_ITERATIVE_SCAN = os.getenv("RETRIEVAL_ITERATIVE_SCAN", "relaxed_order")
+RETRIEVAL_MAX_SCAN_TUPLES = int(os.getenv("RETRIEVAL_MAX_SCAN_TUPLES", "20000"))
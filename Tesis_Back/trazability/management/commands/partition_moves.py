@@ -0,0 +1,122 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from trazability.models import Move
+
+
+def _mes(d, delta=0):
+    """Primer día del mes de `d` desplazado `delta` meses."""
+    idx = d.year * 12 + (d.month - 1) + delta
+    return date(idx // 12, idx % 12 + 1, 1)
+
+
+class Command(BaseCommand):
+    help = (
+        "Particiona la tabla `move` por mes (RANGE sobre timestamp) y/o crea las particiones "
+        "de los próximos meses. Las lecturas newest-first solo tocan las particiones recientes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ahead", type=int, default=3,
+                            help="Meses futuros a crear por adelantado (default 3).")
+        parser.add_argument("--keep-legacy", action="store_true",
+                            help="No borrar la tabla original (queda como move_legacy).")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Solo imprime el SQL.")
+
+    def handle(self, *args, **opts):
+        if connection.vendor != "postgresql":
+            raise CommandError("El particionado solo está soportado en PostgreSQL.")
+
+        table = Move._meta.db_table
+        with connection.cursor() as cur:
+            cur.execute(
+                "SELECT c.relkind FROM pg_class c "
+                "JOIN pg_namespace n ON n.oid = c.relnamespace "
+                "WHERE c.relname = %s AND n.nspname = current_schema()",
+                [table],
+            )
+            row = cur.fetchone()
+            if row is None:
+                raise CommandError(f"No existe la tabla {table}.")
+            ya_particionada = row[0] == "p"
+
+            desde = _mes(date.today())
+            if not ya_particionada:
+                cur.execute(f'SELECT MIN("timestamp") FROM {table}')
+                minimo = cur.fetchone()[0]
+                if minimo is not None:
+                    desde = _mes(minimo.date())
+
+        sql = [] if ya_particionada else self._sql_conversion(table)
+        sql += self._sql_particiones(table, desde, _mes(date.today(), opts["ahead"]))
+        if not ya_particionada:
+            sql.append(f'INSERT INTO {table} SELECT * FROM {table}_legacy')
+            if not opts["keep_legacy"]:
+                sql.append(f'DROP TABLE {table}_legacy')
+
+        if opts["dry_run"]:
+            for stmt in sql:
+                self.stdout.write(stmt + ";")
+            return
+
+        with transaction.atomic(), connection.cursor() as cur:
+            for stmt in sql:
+                cur.execute(stmt)
+
+        estado = "particiones actualizadas" if ya_particionada else "tabla convertida a particionada"
+        self.stdout.write(self.style.SUCCESS(f"Listo. {table}: {estado} ({len(sql)} sentencias)."))
+
+    def _sql_conversion(self, table):
+        """Renombra la tabla actual y crea la tabla padre particionada con el mismo esquema."""
+        fks = {
+            "trazability_id": Move._meta.get_field("trazability").related_model._meta.db_table,
+            "causa_id": Move._meta.get_field("causa").related_model._meta.db_table,
+            "user_id": Move._meta.get_field("user").related_model._meta.db_table,
+        }
+        sql = [
+            f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE",
+            f"ALTER TABLE {table} RENAME TO {table}_legacy",
+        ]
+        # Los índices declarados en Meta conservan su nombre en la tabla nueva
+        for idx in Move._meta.indexes:
+            sql.append(f'ALTER INDEX IF EXISTS "{idx.name}" RENAME TO "{idx.name[:20]}_legacy"')
+        sql += [
+            f'CREATE TABLE {table} (LIKE {table}_legacy INCLUDING DEFAULTS) PARTITION BY RANGE ("timestamp")',
+            # La PK de una tabla particionada debe incluir la clave de partición
+            f'ALTER TABLE {table} ADD PRIMARY KEY (id, "timestamp")',
+        ]
+        for col, ref in fks.items():
+            sql.append(
+                f'ALTER TABLE {table} ADD FOREIGN KEY ({col}) REFERENCES "{ref}" (id) '
+                f"DEFERRABLE INITIALLY DEFERRED"
+            )
+        for idx in Move._meta.indexes:
+            cols = ", ".join(
+                f'"{Move._meta.get_field(f.lstrip("-")).column}"' + (" DESC" if f.startswith("-") else "")
+                for f in idx.fields
+            )
+            sql.append(f'CREATE INDEX "{idx.name}" ON {table} ({cols})')
+        sql += [
+            # Orden exacto de la paginación por cursor (-timestamp, id)
+            f'CREATE INDEX "{table}_traz_ts_id_idx" ON {table} (trazability_id, "timestamp" DESC, id)',
+            f'CREATE INDEX "{table}_causa_id_idx" ON {table} (causa_id)',
+            f'CREATE INDEX "{table}_user_id_idx" ON {table} (user_id)',
+            f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT",
+        ]
+        return sql
+
+    def _sql_particiones(self, table, desde, hasta):
+        """Una partición por mes en [desde, hasta]."""
+        sql = []
+        mes = desde
+        while mes <= hasta:
+            sig = _mes(mes, 1)
+            sql.append(
+                f"CREATE TABLE IF NOT EXISTS {table}_p{mes:%Y_%m} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{mes.isoformat()}') TO ('{sig.isoformat()}')"
+            )
+            mes = sig
+        return sql
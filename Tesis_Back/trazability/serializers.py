@@ -2,9 +2,11 @@ from rest_framework import serializers
 from .models import Trazability, Move
 
 class MoveSerializer(serializers.ModelSerializer):
-    user_id = serializers.IntegerField(source='user.id', read_only=True)
-    causa_id = serializers.IntegerField(source='causa.id', read_only=True)
-    trazability_id = serializers.CharField(source='trazability.id', read_only=True)
+    # Se leen las columnas FK (user_id, causa_id, trazability_id) directamente:
+    # no hace falta traer el usuario, la causa ni la trazabilidad por cada fila.
+    user_id = serializers.IntegerField(read_only=True)
+    causa_id = serializers.IntegerField(read_only=True)
+    trazability_id = serializers.CharField(read_only=True)
 
     class Meta:
         model = Move
@@ -24,7 +26,7 @@ class MoveSerializer(serializers.ModelSerializer):
 
 
 class TrazabilitySerializer(serializers.ModelSerializer):
-    causa_id = serializers.IntegerField(source='causa.id', read_only=True)
+    causa_id = serializers.IntegerField(read_only=True)
     moves = serializers.SerializerMethodField()
 
     class Meta:
@@ -33,16 +35,20 @@ class TrazabilitySerializer(serializers.ModelSerializer):
 
     def get_moves(self, obj):
         """Retorna los últimos 10 movimientos por defecto"""
-        limit = self.context.get('moves_limit', 10)
-        recent_moves = obj.get_recent_moves(limit=limit)
+        recent_moves = getattr(obj, 'recent_moves', None)  # prefetch del listado (una query para todas)
+        if recent_moves is None:
+            limit = self.context.get('moves_limit', 10)
+            recent_moves = obj.get_recent_moves(limit=limit)
         return MoveSerializer(recent_moves, many=True).data
 
 
 class TrazabilityDetailSerializer(serializers.ModelSerializer):
-    """Para el endpoint que trae todos los movimientos"""
-    causa_id = serializers.IntegerField(source='causa.id', read_only=True)
+    """Para el endpoint de historial: `moves` es una página (cursor) de movimientos"""
+    causa_id = serializers.IntegerField(read_only=True)
     moves = MoveSerializer(many=True, read_only=True)
+    next = serializers.CharField(read_only=True, allow_null=True)
+    previous = serializers.CharField(read_only=True, allow_null=True)
 
     class Meta:
         model = Trazability
-        fields = ['id', 'causa_id', 'moves']
\ No newline at end of file
+        fields = ['id', 'causa_id', 'moves', 'next', 'previous']
@@ -68,6 +68,37 @@ class TrazabilityHelper:
             summary=f"Se creó la causa {causa.numero_expediente}"
         )
 
+    @staticmethod
+    def register_causa_create_bulk(causas, user):
+        """
+        Registra la creación de muchas causas (importación masiva) con 3 queries
+        en total en lugar de 2 por causa.
+        """
+        causas = list(causas)
+        if not causas:
+            return []
+        Trazability.objects.bulk_create(
+            [Trazability(causa=c) for c in causas], ignore_conflicts=True
+        )
+        traz_ids = dict(
+            Trazability.objects.filter(causa__in=causas).values_list('causa_id', 'id')
+        )
+        user_name = user.get_full_name() or user.username if user else 'Sistema'
+        ahora = timezone.now()
+        return Move.objects.bulk_create([
+            Move(
+                trazability_id=traz_ids[c.pk],
+                causa=c,
+                user=user,
+                user_name=user_name,
+                timestamp=ahora,
+                action=Move.MoveAction.CREATE,
+                entity_type=Move.MoveEntityType.CAUSA,
+                summary=f"Se creó la causa {c.numero_expediente} (importación)"
+            )
+            for c in causas
+        ], batch_size=500)
+
     @staticmethod
     def register_causa_update(causa, user, field_name, old_value, new_value):
         """Registra actualización de un campo de la causa"""
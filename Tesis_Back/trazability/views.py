@@ -4,9 +4,38 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.pagination import CursorPagination
 from django.shortcuts import get_object_or_404
+from django_filters import rest_framework as dj_filters
+from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiTypes
+from django.db.models import Prefetch
 from .models import Trazability, Move
 from .serializers import TrazabilitySerializer, TrazabilityDetailSerializer, MoveSerializer
+from tesis_api.cache import GRUPO_CAUSAS, cachear_respuesta
+
+
+# ---------- Paginación / filtros del historial ----------
+class MoveCursorPagination(CursorPagination):
+    """
+    Paginación por cursor sobre (-timestamp, id).
+    A diferencia de OFFSET, el costo de pedir la página N no crece con N:
+    cada página es un range scan sobre el índice (trazability, -timestamp).
+    """
+    ordering = ("-timestamp", "id")
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
+
+class MoveFilter(dj_filters.FilterSet):
+    # ?entity_type=documento&action=update&desde=2025-01-01T00:00:00Z
+    desde = dj_filters.IsoDateTimeFilter(field_name="timestamp", lookup_expr="gte")
+    hasta = dj_filters.IsoDateTimeFilter(field_name="timestamp", lookup_expr="lte")
+
+    class Meta:
+        model = Move
+        fields = ["entity_type", "action"]
+
 
 class TrazabilityViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -15,17 +44,69 @@ class TrazabilityViewSet(viewsets.ReadOnlyModelViewSet):
     """
     permission_classes = [IsAuthenticated]
     serializer_class = TrazabilityDetailSerializer
-    
+
+    # Movimientos que trae cada trazabilidad en `list` (el historial completo se pagina en `retrieve`)
+    MOVES_EN_LISTADO = 10
+
     def get_queryset(self):
-        return Trazability.objects.filter(
-            causa__creado_por=self.request.user 
-        ).prefetch_related('moves', 'moves__user')
+        qs = Trazability.objects.filter(
+            causa__creado_por=self.request.user
+        )
+        if self.action == "list":
+            # Últimos N por trazabilidad en una sola query (ventana ROW_NUMBER), no una por fila
+            recientes = Move.objects.order_by("-timestamp", "id")[:self.MOVES_EN_LISTADO]
+            qs = qs.prefetch_related(Prefetch("moves", queryset=recientes, to_attr="recent_moves"))
+        return qs
+
+    def get_serializer_class(self):
+        if self.action == "list":
+            return TrazabilitySerializer
+        return super().get_serializer_class()
+
+    @cachear_respuesta(GRUPO_CAUSAS)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
+    @extend_schema(
+        summary="Historial de trazabilidad",
+        description=(
+            "Historial de movimientos de la causa, del más nuevo al más viejo, paginado por cursor. "
+            "Filtros opcionales: `entity_type`, `action`, `desde`, `hasta`. "
+            "Usar el link `next` para pedir la página siguiente."
+        ),
+        parameters=[
+            OpenApiParameter("entity_type", OpenApiTypes.STR, OpenApiParameter.QUERY,
+                             enum=[c for c, _ in Move.MoveEntityType.choices]),
+            OpenApiParameter("action", OpenApiTypes.STR, OpenApiParameter.QUERY,
+                             enum=[c for c, _ in Move.MoveAction.choices]),
+            OpenApiParameter("desde", OpenApiTypes.DATETIME, OpenApiParameter.QUERY),
+            OpenApiParameter("hasta", OpenApiTypes.DATETIME, OpenApiParameter.QUERY),
+            OpenApiParameter("cursor", OpenApiTypes.STR, OpenApiParameter.QUERY),
+            OpenApiParameter("page_size", OpenApiTypes.INT, OpenApiParameter.QUERY),
+        ],
+        responses=TrazabilityDetailSerializer,
+        tags=["Trazabilidad"],
+    )
+    @cachear_respuesta(GRUPO_CAUSAS)
     def retrieve(self, request, pk=None):
         """
         GET /api/trazability/{trazabilityId}/
-        Retorna todo el historial de movimientos
+        Retorna una página del historial de movimientos
         """
         trazability = get_object_or_404(self.get_queryset(), pk=pk)
-        serializer = self.get_serializer(trazability)
-        return Response(serializer.data)
+
+        moves = Move.objects.filter(trazability_id=trazability.pk)
+        filtro = MoveFilter(request.query_params, queryset=moves)
+        if not filtro.is_valid():
+            return Response(filtro.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = MoveCursorPagination()
+        page = paginator.paginate_queryset(filtro.qs, request, view=self)
+
+        return Response({
+            "id": str(trazability.id),
+            "causa_id": trazability.causa_id,
+            "moves": MoveSerializer(page, many=True).data,
+            "next": paginator.get_next_link(),
+            "previous": paginator.get_previous_link(),
+        })